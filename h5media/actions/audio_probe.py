@@ -0,0 +1,319 @@
+"""Reads the duration and bitrate of audio files from their headers.  Only
+the few pages of the file holding the headers are read (through mmap) so
+probing doesn't depend on the length of the file.  Supports MP3 (Xing,
+Info, VBRI and LAME headers or constant bitrate), M4A/M4B (the mvhd atom)
+and Ogg Vorbis/Opus (the first and last pages)."""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from mmap import ACCESS_READ, mmap
+from os import fstat
+from struct import error as StructError, unpack_from
+from typing import Dict, Iterable, Optional, Tuple
+
+
+@dataclass
+class AudioInfo:
+    size: int
+    # Seconds
+    duration: Optional[float] = None
+    # Kilobits per second
+    bitrate: Optional[int] = None
+
+
+# Number of bytes searched for the first MP3 frame after the ID3v2 tag
+MP3_SYNC_SEARCH_BYTES = 64 * 1024
+
+# Number of bytes at the end of an Ogg file searched for the last page
+OGG_LAST_PAGE_SEARCH_BYTES = 64 * 1024
+
+# Kilobits per second by bitrate index for (MPEG 1, layer) and
+# (MPEG 2/2.5, layer)
+MP3_BITRATES = {
+    (1, 1): (
+        0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448,
+    ),
+    (1, 2): (
+        0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384,
+    ),
+    (1, 3): (
+        0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320,
+    ),
+    (2, 1): (
+        0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256,
+    ),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Sample rates by MPEG version bits
+MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG 1
+    2: (22050, 24000, 16000),  # MPEG 2
+    0: (11025, 12000, 8000),  # MPEG 2.5
+}
+
+
+@dataclass
+class Mp3Frame:
+    offset: int
+    version: int
+    layer: int
+    bitrate: int
+    sample_rate: int
+    samples: int
+    length: int
+    mono: bool
+
+
+def parse_mp3_frame(data, offset: int) -> Optional[Mp3Frame]:
+    """Parses the four byte MPEG audio frame header at offset"""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset:offset + 4]
+    if b0 != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+
+    version_bits = (b1 >> 3) & 3
+    layer = 4 - ((b1 >> 1) & 3)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 3
+    if (
+            version_bits == 1
+            or layer == 4
+            or bitrate_index in (0, 15)
+            or sample_rate_index == 3
+    ):
+        return None
+
+    version = 1 if version_bits == 3 else 2
+    bitrate = MP3_BITRATES[version, layer][bitrate_index]
+    sample_rate = MP3_SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or version == 1 else 576
+        length = samples // 8 * bitrate * 1000 // sample_rate + padding
+
+    return Mp3Frame(
+        offset=offset,
+        version=version,
+        layer=layer,
+        bitrate=bitrate,
+        sample_rate=sample_rate,
+        samples=samples,
+        length=length,
+        mono=b3 >> 6 == 3,
+    )
+
+
+def find_mp3_frame(data, start: int) -> Optional[Mp3Frame]:
+    """Finds the first frame header at or after start that is followed by
+    another frame header, which rules out sync bytes in album art and other
+    junk"""
+    end = min(len(data), start + MP3_SYNC_SEARCH_BYTES)
+    offset = data.find(b'\xff', start, end)
+    while offset != -1:
+        frame = parse_mp3_frame(data, offset)
+        if frame:
+            next_offset = offset + frame.length
+            if next_offset + 4 > len(data) or parse_mp3_frame(
+                    data,
+                    next_offset,
+            ):
+                return frame
+        offset = data.find(b'\xff', offset + 1, end)
+    return None
+
+
+def get_id3v2_size(data) -> int:
+    if data[:3] != b'ID3' or len(data) < 10:
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def probe_mp3(data, size: int) -> AudioInfo:
+    frame = find_mp3_frame(data, get_id3v2_size(data))
+    if not frame:
+        return AudioInfo(size)
+
+    audio_end = size
+    if size >= 128 and data[size - 128:size - 125] == b'TAG':
+        audio_end -= 128
+    audio_bytes = audio_end - frame.offset
+
+    # The Xing (variable bitrate) or Info (constant bitrate) header sits
+    # after the side information of the first frame
+    if frame.version == 1:
+        side_info = 17 if frame.mono else 32
+    else:
+        side_info = 9 if frame.mono else 17
+    xing_offset = frame.offset + 4 + side_info
+    frame_count = None
+    encoder_samples = 0
+    if data[xing_offset:xing_offset + 4] in (b'Xing', b'Info'):
+        flags, = unpack_from('>I', data, xing_offset + 4)
+        field_offset = xing_offset + 8
+        if flags & 1:
+            frame_count, = unpack_from('>I', data, field_offset)
+            field_offset += 4
+        if flags & 2:
+            audio_bytes, = unpack_from('>I', data, field_offset)
+            field_offset += 4
+        if flags & 4:
+            field_offset += 100
+        if flags & 8:
+            field_offset += 4
+        # The LAME extension records the encoder delay and padding which
+        # aren't part of the audio
+        lame_offset = field_offset
+        if data[lame_offset:lame_offset + 4] in (b'LAME', b'Lavf', b'Lavc'):
+            b0, b1, b2 = data[lame_offset + 21:lame_offset + 24]
+            delay = (b0 << 4) | (b1 >> 4)
+            padding = ((b1 & 0xF) << 8) | b2
+            encoder_samples = delay + padding
+    elif data[frame.offset + 36:frame.offset + 40] == b'VBRI':
+        audio_bytes, frame_count = unpack_from(
+            '>II',
+            data,
+            frame.offset + 36 + 10,
+        )
+
+    if frame_count:
+        samples = max(frame_count * frame.samples - encoder_samples, 0)
+        duration = samples / frame.sample_rate
+        bitrate = (
+            round(audio_bytes * 8 / duration / 1000)
+            if duration
+            else frame.bitrate
+        )
+        return AudioInfo(size, duration, bitrate)
+
+    return AudioInfo(
+        size,
+        audio_bytes * 8 / (frame.bitrate * 1000),
+        frame.bitrate,
+    )
+
+
+def find_atom(
+        data,
+        start: int,
+        end: int,
+        atom_type: bytes,
+) -> Optional[Tuple[int, int]]:
+    """Returns the offsets of the start of the body and of the end of the
+    first atom of atom_type between start and end.  Only the atom headers
+    are read."""
+    offset = start
+    while offset + 8 <= end:
+        atom_size, = unpack_from('>I', data, offset)
+        header_size = 8
+        if atom_size == 1:
+            atom_size, = unpack_from('>Q', data, offset + 8)
+            header_size = 16
+        elif atom_size == 0:
+            atom_size = end - offset
+        if atom_size < header_size:
+            return None
+        if data[offset + 4:offset + 8] == atom_type:
+            return offset + header_size, offset + atom_size
+        offset += atom_size
+    return None
+
+
+def probe_mp4(data, size: int) -> AudioInfo:
+    moov = find_atom(data, 0, size, b'moov')
+    if moov is None:
+        return AudioInfo(size)
+    found = find_atom(data, *moov, b'mvhd')
+    if found is None:
+        return AudioInfo(size)
+    mvhd, _ = found
+
+    if data[mvhd] == 1:
+        timescale, duration = unpack_from('>IQ', data, mvhd + 20)
+    else:
+        timescale, duration = unpack_from('>II', data, mvhd + 12)
+    if not timescale:
+        return AudioInfo(size)
+    seconds = duration / timescale
+    return AudioInfo(
+        size,
+        seconds,
+        round(size * 8 / seconds / 1000) if seconds else None,
+    )
+
+
+def probe_ogg(data, size: int) -> AudioInfo:
+    # The first packet, which identifies the codec, follows the first
+    # page's header and segment table
+    segment_count = data[26]
+    packet = 27 + segment_count
+    pre_skip = 0
+    if data[packet:packet + 7] == b'\x01vorbis':
+        sample_rate, = unpack_from('<I', data, packet + 12)
+    elif data[packet:packet + 8] == b'OpusHead':
+        # Opus granule positions always count 48 kHz samples
+        sample_rate = 48000
+        pre_skip, = unpack_from('<H', data, packet + 10)
+    else:
+        return AudioInfo(size)
+
+    last_page = data.rfind(
+        b'OggS',
+        max(0, size - OGG_LAST_PAGE_SEARCH_BYTES),
+    )
+    if last_page == -1 or last_page + 14 > size or not sample_rate:
+        return AudioInfo(size)
+    granule_position, = unpack_from('<q', data, last_page + 6)
+    seconds = max(granule_position - pre_skip, 0) / sample_rate
+    return AudioInfo(
+        size,
+        seconds,
+        round(size * 8 / seconds / 1000) if seconds else None,
+    )
+
+
+def probe_audio(path: str) -> Optional[AudioInfo]:
+    """Returns the size, duration and bitrate of an audio file.  duration
+    and bitrate are None if the format isn't recognized.  Returns None if
+    the file can't be read."""
+    try:
+        file = open(path, 'rb')
+    except OSError:
+        return None
+
+    with file:
+        size = fstat(file.fileno()).st_size
+        if not size:
+            return AudioInfo(size)
+        try:
+            with mmap(file.fileno(), 0, access=ACCESS_READ) as data:
+                if data[4:8] == b'ftyp':
+                    return probe_mp4(data, size)
+                if data[:4] == b'OggS':
+                    return probe_ogg(data, size)
+                return probe_mp3(data, size)
+        except OSError:
+            return None
+        except (IndexError, StructError, ValueError):
+            # Truncated or corrupt headers
+            return AudioInfo(size)
+
+
+def probe_audio_files(
+        paths: Iterable[str],
+        threads: int = 8,
+) -> Dict[str, Optional[AudioInfo]]:
+    """Probes files in a thread pool.  Probing is mostly waiting on the disk
+    so threads help even though they share the interpreter."""
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        return dict(zip(paths, executor.map(probe_audio, paths)))
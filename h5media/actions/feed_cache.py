@@ -0,0 +1,266 @@
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from gzip import GzipFile
+from hashlib import sha256
+from json import dumps, loads
+from os import replace, utime
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from h5media.url_keys import normalize_url
+
+
+# Shared by all FeedCache instances since the refresh_feeds workers may store
+# downloads at the same time
+EVICTION_LOCK = Lock()
+
+# Size in bytes of each cache directory as of the last eviction plus the
+# entries added since, so add() only scans the directory once it's too large.
+# Guarded by EVICTION_LOCK.
+DIRECTORY_BYTES: Dict[Path, int] = {}
+
+# Eviction shrinks a cache that grew past max_bytes to this fraction of
+# max_bytes so the next entries added don't have to evict again
+EVICT_TO_FRACTION = 0.9
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    fetched: datetime
+    size: int
+    etag: str = ''
+    last_modified: str = ''
+    # hash_rss() of the content so a refresh can tell the file is the one it
+    # loaded last time without reading it
+    rss_hash: str = ''
+
+
+class FeedCache:
+    """On-disk cache of downloaded rss files.  Entries are keyed by a digest
+    of the normalized feed url and stored gzip compressed next to a json file
+    of metadata.  Once the cache grows past max_bytes the least recently
+    used entries are removed."""
+
+    CONTENT_SUFFIX = '.rss.gz'
+    METADATA_SUFFIX = '.json'
+
+    def __init__(
+            self,
+            directory: Path,
+            max_bytes: int,
+            max_age: Optional[timedelta] = None,
+    ):
+        """Entries younger than max_age are used without contacting the
+        server.  When max_age is None entries are always revalidated."""
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @staticmethod
+    def get_key(url: str) -> str:
+        return sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def get_paths(self, url: str) -> Tuple[Path, Path]:
+        key = self.get_key(url)
+        return (
+            self.directory / f'{key}{self.CONTENT_SUFFIX}',
+            self.directory / f'{key}{self.METADATA_SUFFIX}',
+        )
+
+    def open(self, url: str) -> Optional[Tuple[CacheEntry, BinaryIO]]:
+        """Returns the cached entry for a url and a file its content is read
+        from, or None.  The caller closes the file."""
+        content_path, metadata_path = self.get_paths(url)
+        try:
+            metadata = loads(metadata_path.read_text())
+            metadata['fetched'] = datetime.fromisoformat(metadata['fetched'])
+            entry = CacheEntry(**metadata)
+            # The metadata file's modification time records when the entry
+            # was last used
+            utime(metadata_path)
+            content_file = GzipFile(content_path)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        return entry, content_file
+
+    def get(self, url: str) -> Optional[Tuple[CacheEntry, bytes]]:
+        """Returns the cached entry and content for a url or None"""
+        opened = self.open(url)
+        if opened is None:
+            return None
+        entry, content_file = opened
+        try:
+            with content_file:
+                content = content_file.read()
+        except (OSError, EOFError):
+            return None
+        return entry, content
+
+    def open_writer(
+            self,
+            url: str,
+            etag: str = '',
+            last_modified: str = '',
+    ) -> 'CacheWriter':
+        return CacheWriter(self, url, etag, last_modified)
+
+    def put(
+            self,
+            url: str,
+            content: bytes,
+            etag: str = '',
+            last_modified: str = '',
+    ) -> CacheEntry:
+        writer = self.open_writer(url, etag, last_modified)
+        writer.write(content)
+        return writer.commit()
+
+    def add(self, entry: CacheEntry, temporary_path: Path) -> None:
+        """Moves the compressed content written by a CacheWriter into place
+        next to the entry's metadata"""
+        metadata = asdict(entry)
+        metadata['fetched'] = entry.fetched.isoformat()
+
+        content_path, metadata_path = self.get_paths(entry.url)
+        metadata_temporary_path = metadata_path.with_name(
+            f'{metadata_path.name}.tmp'
+        )
+        metadata_temporary_path.write_text(dumps(metadata))
+
+        added_bytes = 0
+        # Both files are complete before they are moved into place so
+        # readers never see a partial entry
+        for source_path, path in (
+                (temporary_path, content_path),
+                (metadata_temporary_path, metadata_path),
+        ):
+            try:
+                added_bytes -= path.stat().st_size
+            except OSError:
+                pass
+            added_bytes += source_path.stat().st_size
+            replace(source_path, path)
+
+        with EVICTION_LOCK:
+            total_bytes = DIRECTORY_BYTES.get(self.directory)
+            if total_bytes is not None:
+                total_bytes += added_bytes
+                DIRECTORY_BYTES[self.directory] = total_bytes
+        if total_bytes is None or total_bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TO_FRACTION))
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        if self.max_age is None:
+            return False
+        return now() - entry.fetched < self.max_age
+
+    def evict(self, target_bytes: Optional[int] = None) -> int:
+        """Removes the least recently used entries until the cache is no
+        larger than target_bytes, max_bytes by default.  Returns the number of
+        entries removed."""
+        if target_bytes is None:
+            target_bytes = self.max_bytes
+        with EVICTION_LOCK:
+            entries: List[Tuple[float, int, Path, Path]] = []
+            total_bytes = 0
+            for metadata_path in self.directory.glob(
+                    f'*{self.METADATA_SUFFIX}'
+            ):
+                content_path = metadata_path.with_name(
+                    metadata_path.name.replace(
+                        self.METADATA_SUFFIX,
+                        self.CONTENT_SUFFIX,
+                    )
+                )
+                try:
+                    last_used = metadata_path.stat().st_mtime
+                    entry_bytes = (
+                        metadata_path.stat().st_size
+                        + content_path.stat().st_size
+                    )
+                except OSError:
+                    continue
+                total_bytes += entry_bytes
+                entries.append(
+                    (last_used, entry_bytes, metadata_path, content_path)
+                )
+
+            removed_count = 0
+            entries.sort()
+            for _, entry_bytes, metadata_path, content_path in entries:
+                if total_bytes <= target_bytes:
+                    break
+                metadata_path.unlink(missing_ok=True)
+                content_path.unlink(missing_ok=True)
+                total_bytes -= entry_bytes
+                removed_count += 1
+            DIRECTORY_BYTES[self.directory] = total_bytes
+            return removed_count
+
+
+class CacheWriter:
+    """Compresses the content of a cache entry chunk by chunk as it's
+    downloaded.  The entry is only added to the cache by commit(), once the
+    whole file has been written."""
+
+    def __init__(
+            self,
+            cache: FeedCache,
+            url: str,
+            etag: str = '',
+            last_modified: str = '',
+    ):
+        self.cache = cache
+        self.entry = CacheEntry(
+            url=url,
+            fetched=now(),
+            size=0,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        cache.directory.mkdir(parents=True, exist_ok=True)
+        self.temporary_file = NamedTemporaryFile(
+            dir=cache.directory,
+            suffix='.tmp',
+            delete=False,
+        )
+        self.gzip_file = GzipFile(fileobj=self.temporary_file, mode='wb')
+
+    def write(self, chunk: bytes) -> None:
+        self.gzip_file.write(chunk)
+        self.entry.size += len(chunk)
+
+    def close(self) -> None:
+        self.gzip_file.close()
+        self.temporary_file.close()
+
+    def commit(self, rss_hash: str = '') -> CacheEntry:
+        self.entry.rss_hash = rss_hash
+        self.close()
+        self.cache.add(self.entry, Path(self.temporary_file.name))
+        return self.entry
+
+    def discard(self) -> None:
+        """Drops a partly written entry, e.g. when the download failed"""
+        self.close()
+        Path(self.temporary_file.name).unlink(missing_ok=True)
+
+
+def get_default_cache() -> Optional[FeedCache]:
+    """The cache configured by the RSS_CACHE_* settings or None if
+    settings.RSS_CACHE_DIR isn't set"""
+    directory = settings.RSS_CACHE_DIR
+    if not directory:
+        return None
+    max_age_minutes = settings.RSS_CACHE_MAX_AGE_MINUTES
+    return FeedCache(
+        directory,
+        int(settings.RSS_CACHE_MAX_MB * 2**20),
+        timedelta(minutes=max_age_minutes) if max_age_minutes else None,
+    )
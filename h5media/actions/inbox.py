@@ -0,0 +1,125 @@
+"""The newest episodes of the podcasts a user subscribes to, newest first.
+Rather than sorting every episode of every subscription, each podcast's
+episodes are read newest first through the (podcast, pub_date) index and the
+podcasts are merged with a heap until a page is full.  A podcast's episodes
+are only read once its newest unread episode reaches the top of the heap, so
+a page reads the episodes of at most page_size + 1 podcasts however many
+there are."""
+
+from dataclasses import dataclass
+from datetime import datetime
+from heapq import heapify, heappop, heappush
+from typing import Iterator, List, Optional, Tuple
+
+from django.contrib.auth.models import User
+from django.db.models import OuterRef, Q, QuerySet, Subquery
+
+from h5media.models import Podcast, PodcastEpisode
+
+
+# Position of an episode in the inbox: its pub_date and primary key
+InboxCursor = Tuple[datetime, int]
+
+
+@dataclass
+class InboxPage:
+    episodes: List[PodcastEpisode]
+    # Passed as before to get the next page.  None on the last page.
+    next_cursor: Optional[InboxCursor] = None
+
+
+def filter_before(
+        episodes: QuerySet,
+        before: Optional[InboxCursor],
+) -> QuerySet:
+    """Limits episodes to those after before in the inbox"""
+    episodes = episodes.filter(pub_date__isnull=False)
+    if before is None:
+        return episodes
+    pub_date, pk = before
+    return episodes.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+    )
+
+
+def iter_episodes(
+        podcast_id: int,
+        before: Optional[InboxCursor],
+        batch_size: int,
+) -> Iterator[PodcastEpisode]:
+    """Yields the podcast's episodes newest first, reading batch_size at a
+    time"""
+    while True:
+        batch = list(
+            filter_before(
+                PodcastEpisode.objects.filter(podcast_id=podcast_id),
+                before,
+            ).select_related('podcast').order_by('-pub_date', '-pk')[
+                :batch_size
+            ]
+        )
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        before = (batch[-1].pub_date, batch[-1].pk)
+
+
+def get_inbox_page(
+        user: User,
+        page_size: int = 25,
+        before: Optional[InboxCursor] = None,
+) -> InboxPage:
+    """Returns page_size episodes of the user's subscriptions published
+    before `before`, newest first"""
+    newest_episodes = filter_before(
+        PodcastEpisode.objects.filter(podcast_id=OuterRef('pk')),
+        before,
+    ).order_by('-pub_date', '-pk')
+    newest_keys = Podcast.objects.filter(
+        subscribers=user,
+    ).annotate(
+        newest_pub_date=Subquery(newest_episodes.values('pub_date')[:1]),
+        newest_pk=Subquery(newest_episodes.values('pk')[:1]),
+    ).filter(
+        newest_pk__isnull=False,
+    ).values_list('pk', 'newest_pub_date', 'newest_pk')
+
+    # Entries sort newest first.  A podcast whose episodes haven't been read
+    # yet is keyed by its newest episode, so its episodes are only read when
+    # that episode is the next one on the page.
+    heap = [
+        (-pub_date.timestamp(), -pk, podcast_id, None, None)
+        for podcast_id, pub_date, pk in newest_keys
+    ]
+    heapify(heap)
+
+    episodes = []
+    # One more episode than the page is merged to tell if there's a next
+    # page
+    while heap and len(episodes) <= page_size:
+        _, _, podcast_id, podcast_episodes, episode = heappop(heap)
+        if podcast_episodes is None:
+            podcast_episodes = iter_episodes(
+                podcast_id,
+                before,
+                page_size + 1,
+            )
+        else:
+            episodes.append(episode)
+        episode = next(podcast_episodes, None)
+        if episode is not None:
+            heappush(heap, (
+                -episode.pub_date.timestamp(),
+                -episode.pk,
+                podcast_id,
+                podcast_episodes,
+                episode,
+            ))
+
+    if len(episodes) <= page_size:
+        return InboxPage(episodes)
+    episodes = episodes[:page_size]
+    return InboxPage(
+        episodes,
+        (episodes[-1].pub_date, episodes[-1].pk),
+    )
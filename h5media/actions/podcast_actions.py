@@ -1,44 +1,346 @@
 
 from collections import Counter
-from datetime import datetime
+from dataclasses import dataclass, field
+from functools import partial
+from logging import getLogger
 from enum import Enum
-from re import compile as re_compile, IGNORECASE
-from typing import List, Optional
-from xml.sax import parseString
+from hashlib import sha256
+from typing import (
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+)
+from xml.sax import make_parser
 from xml.sax.handler import ContentHandler
 
-from requests import codes, get
-from requests.exceptions import Timeout
+from requests import Response, Session, codes, get
+from requests.exceptions import RequestException, Timeout
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.transaction import atomic
+from django.utils.timezone import now
 
 from h5media.actions.actions import Action
+from h5media.actions.feed_cache import (
+    CacheWriter,
+    FeedCache,
+    get_default_cache,
+)
+from h5media.actions.podcast_schedule import set_next_check
+from h5media.actions.rss_dates import parse_rss_date
 from h5media.models import (
     Podcast,
     PodcastEpisode,
-    profile_queue_default,
     Profile,
+    QueueItem,
 )
-from h5media.serializers import PodcastEpisodeSerializer
+from h5media.url_keys import normalize_url
+
+
+logger = getLogger('web')
+
+CHUNK_SIZE = 64 * 2**10
 
 
 class DownloadException(RuntimeError):
     pass
 
 
-def download_rss(rss_url) -> bytes:
+def get_max_rss_bytes() -> int:
+    return int(settings.MAX_RSS_MB * 2**20)
+
+
+def limit_size(rss_url: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Passes chunks through until more than settings.MAX_RSS_MB have been
+    read at which point a DownloadException is raised"""
+    max_bytes = get_max_rss_bytes()
+    total_bytes = 0
+    for chunk in chunks:
+        total_bytes += len(chunk)
+        if total_bytes > max_bytes:
+            raise DownloadException(
+                f"{rss_url} is larger than {settings.MAX_RSS_MB}MB"
+            )
+        yield chunk
+
+
+@dataclass
+class FeedResponse:
+    url: str
+    status: int
+    content: bytes = b''
+    final_url: str = ''
+    etag: str = ''
+    last_modified: str = ''
+
+    # Set when the feed has permanently moved (301/308)
+    permanent_url: str = ''
+
+    # The open response while the body is read from the network
+    response: Optional[Response] = field(default=None, repr=False)
+
+    # The open file while the body is read from the feed cache
+    cached_file: Optional[BinaryIO] = field(default=None, repr=False)
+
+    # Stores the body in the feed cache as it's read
+    cache_writer: Optional[CacheWriter] = field(default=None, repr=False)
+
+    # True when the content came from the feed cache
+    from_cache: bool = False
+
+    # hash_rss() of the body.  Known up front for content and cached files,
+    # otherwise set once the whole body has been read.
+    rss_hash: str = ''
+
+    def __post_init__(self):
+        if self.content and not self.rss_hash:
+            self.rss_hash = hash_rss(self.content)
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == codes.not_modified
+
+    def iter_content(self) -> Iterator[bytes]:
+        """Yields the body of the rss file in chunks.  While the response or
+        cached file is open the chunks are read as they are consumed, so
+        only one chunk is in memory at a time.  The digest of the body and
+        the feed cache entry are written as the chunks go by."""
+        if self.response is not None:
+            chunks = self.iter_response()
+        elif self.cached_file is not None:
+            chunks = iter(partial(self.cached_file.read, CHUNK_SIZE), b'')
+        else:
+            chunks = iter([self.content])
+
+        rss_hash = RssHash()
+        for chunk in limit_size(self.url, chunks):
+            rss_hash.update(chunk)
+            if self.cache_writer is not None:
+                self.cache_writer.write(chunk)
+            yield chunk
+
+        self.rss_hash = rss_hash.hexdigest()
+        if self.cache_writer is not None:
+            self.cache_writer.commit(self.rss_hash)
+            self.cache_writer = None
+
+    def iter_response(self) -> Iterator[bytes]:
+        content_length = self.response.headers.get('Content-Length') or ''
+        if content_length.isdigit() and (
+                int(content_length) > get_max_rss_bytes()
+        ):
+            raise DownloadException(
+                f"{self.url} is {int(content_length) / 2**20:.2f}MB max is "
+                f"{settings.MAX_RSS_MB}MB"
+            )
+        try:
+            yield from self.response.iter_content(CHUNK_SIZE)
+        except RequestException as error:
+            raise DownloadException(f"Download of {self.url} failed: {error}")
+
+    def read(self) -> bytes:
+        """Reads the whole body into content and closes the response"""
+        try:
+            self.content = b''.join(self.iter_content())
+        finally:
+            self.close()
+        return self.content
+
+    def close(self) -> None:
+        """Closes the response or cached file.  A cache entry that wasn't
+        read to the end is dropped."""
+        if self.response is not None:
+            self.response.close()
+            self.response = None
+        if self.cached_file is not None:
+            self.cached_file.close()
+            self.cached_file = None
+        if self.cache_writer is not None:
+            self.cache_writer.discard()
+            self.cache_writer = None
+
+
+PERMANENT_REDIRECT_STATUSES = {
+    codes.moved_permanently,
+    codes.permanent_redirect,
+}
+
+
+def get_permanent_url(response: Response) -> str:
+    """Returns the url that the feed has permanently moved to.  Only the
+    leading 301/308 hops of the redirect chain count since the target of a
+    temporary redirect shouldn't be remembered."""
+    permanent_url = ''
+    hops = response.history
+    next_urls = [hop.url for hop in hops[1:]] + [response.url]
+    for hop, next_url in zip(hops, next_urls):
+        if hop.status_code not in PERMANENT_REDIRECT_STATUSES:
+            break
+        permanent_url = next_url
+    return permanent_url
+
+
+def download_rss(
+        rss_url: str,
+        etag: str = '',
+        last_modified: str = '',
+        stream: bool = False,
+        session: Optional[Session] = None,
+        cache: Optional[FeedCache] = None,
+) -> FeedResponse:
+    """Downloads an rss file.  When etag or last_modified from a previous
+    download are provided a conditional GET is made and a FeedResponse with
+    a status of 304 and no content is returned if the feed hasn't changed.
+
+    When stream is True the body isn't read.  The caller reads it with
+    FeedResponse.iter_content(), which abandons the download as soon as it
+    grows past settings.MAX_RSS_MB, and must call FeedResponse.close().
+
+    Passing a session lets many downloads share its connection pool.
+
+    Downloads go through the feed cache (the one configured in settings
+    unless cache is given).  A fresh cached file is returned without
+    contacting the server, the cached file's validators are used when the
+    caller has none, and the cached file is returned if the server can't be
+    reached.  A downloaded file is added to the cache once it has been read
+    to the end."""
+    feed_response = open_rss(rss_url, etag, last_modified, session, cache)
+    if not stream:
+        feed_response.read()
+    return feed_response
+
+
+def open_rss(
+        rss_url: str,
+        etag: str = '',
+        last_modified: str = '',
+        session: Optional[Session] = None,
+        cache: Optional[FeedCache] = None,
+) -> FeedResponse:
+    """Makes the request of download_rss() without reading the body"""
+    if cache is None:
+        cache = get_default_cache()
+    if cache is None:
+        return request_rss(rss_url, etag, last_modified, session)
+
+    cached = cache.open(rss_url)
+    if cached is None:
+        feed_response = request_rss(
+            rss_url,
+            etag,
+            last_modified,
+            session=session,
+        )
+    else:
+        entry, cached_file = cached
+        cached_response = FeedResponse(
+            url=rss_url,
+            status=codes.ok,
+            final_url=rss_url,
+            etag=entry.etag,
+            last_modified=entry.last_modified,
+            cached_file=cached_file,
+            from_cache=True,
+            rss_hash=entry.rss_hash,
+        )
+        if cache.is_fresh(entry):
+            return cached_response
+
+        use_cached_validators = not (etag or last_modified)
+        if use_cached_validators:
+            etag = entry.etag
+            last_modified = entry.last_modified
+        try:
+            feed_response = request_rss(
+                rss_url,
+                etag,
+                last_modified,
+                session=session,
+            )
+        except DownloadException as error:
+            logger.warning(f"{error}. Using the cached file.")
+            return cached_response
+
+        if feed_response.not_modified and use_cached_validators:
+            # The server confirmed the cached file is current
+            feed_response.close()
+            feed_response.status = codes.ok
+            feed_response.cached_file = cached_file
+            feed_response.from_cache = True
+            feed_response.rss_hash = entry.rss_hash
+            return feed_response
+        cached_file.close()
+
+    if not feed_response.not_modified:
+        feed_response.cache_writer = cache.open_writer(
+            rss_url,
+            feed_response.etag,
+            feed_response.last_modified,
+        )
+    return feed_response
+
+
+def request_rss(
+        rss_url: str,
+        etag: str = '',
+        last_modified: str = '',
+        session: Optional[Session] = None,
+) -> FeedResponse:
+    """Requests an rss file without the feed cache.  The body is read from
+    the returned FeedResponse, see download_rss()."""
+
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
     timeout_seconds = 30
     try:
-        response = get(rss_url, timeout=timeout_seconds)
+        response = (session.get if session else get)(
+            rss_url,
+            headers=headers,
+            timeout=timeout_seconds,
+            stream=True,
+        )
     except Timeout:
         raise DownloadException(
             f"Download of {rss_url} timed out after {timeout_seconds} seconds"
         )
-    else:
-        if not response.status_code == codes.ok:
-            raise DownloadException(f"{rss_url} returned status {response.status_code}")
-        return response.content
+    except RequestException as error:
+        raise DownloadException(f"Download of {rss_url} failed: {error}")
+
+    status = response.status_code
+    if status not in (codes.ok, codes.not_modified):
+        response.close()
+        raise DownloadException(f"{rss_url} returned status {status}")
+
+    feed_response = FeedResponse(
+        url=rss_url,
+        status=status,
+        final_url=response.url,
+        etag=response.headers.get('ETag') or etag,
+        last_modified=(
+            response.headers.get('Last-Modified') or last_modified
+        ),
+        permanent_url=get_permanent_url(response),
+        response=response,
+    )
+    if feed_response.not_modified:
+        # There's no body to read
+        feed_response.close()
+    return feed_response
+
+
+class StopParsing(Exception):
+    """Raised by RssHandler once the rest of the rss file doesn't need to be
+    read"""
+    pass
 
 
 class RssHandler(ContentHandler):
@@ -70,33 +372,40 @@ class RssHandler(ContentHandler):
 
     elements_of_interest = regular_elements | special_elements
 
-    DATE_FORMATS = [
-        "%a, %d %b %Y %H:%M:%S %z",
-        "%a, %d %b %Y %H:%M:%S %Z",
-    ]
+    batch_size = 500
 
-    def __init__(self, rss_file_url: str):
+    def __init__(self, rss_file_url: str, stop_after_known: int = 0):
+        """When stop_after_known is greater than 0, parsing stops after that
+        many consecutive items for episodes that are already in the
+        database.  Feeds list the newest items first so the rest of the items
+        will be known as well."""
         super().__init__()
 
         self.rss_file_url = rss_file_url
+        self.stop_after_known = stop_after_known
+        self.known_urls: Set[str] = set()
+        self.consecutive_known_count = 0
+        self.stopped_early = False
 
         self.path_stack = []
+        self.text_parts: List[str] = []
         self.errors: List[str] = []
 
         self.podcast: Optional[Podcast] = None
         self.episode: Optional[PodcastEpisode] = None
         self.podcast_episodes: List[PodcastEpisode] = []
-
-        # self.date_regex = re_compile(
-        #     r"([a-z]{3}), (\d{2}) (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) (\d{4})",
-        #     IGNORECASE,
-        # )
+        self.saved_urls: Set[str] = set()
+        # Items read before parsing finished or stopped
+        self.item_count = 0
+        self.inserted_count = 0
+        self.updated_count = 0
 
     def startElement(self, name, attrs):
         if len(self.path_stack) == 0 and name != 'rss':
             raise ValueError("Not an rss document")
 
         self.path_stack.append(name)
+        self.text_parts = []
         if name not in self.elements_of_interest:
             return
 
@@ -114,6 +423,9 @@ class RssHandler(ContentHandler):
         return
 
     def endElement(self, name):
+        if name in self.regular_elements:
+            self.set_text(''.join(self.text_parts).strip())
+        self.text_parts = []
         self.path_stack.pop()
 
         if name not in self.elements_of_interest:
@@ -125,10 +437,18 @@ class RssHandler(ContentHandler):
             self.end_channel()
         elif name == 'item':
             self.end_item()
+        elif name == 'enclosure':
+            pass
         else:
             self.errors.append(f"Unsupported end tag {name}")
 
     def characters(self, content):
+        # The parser may deliver the text of an element in several pieces
+        # (e.g. when it spans two chunks of a download) so the text is
+        # collected here and used when the element ends.
+        self.text_parts.append(content)
+
+    def set_text(self, content: str):
 
         if len(self.path_stack) < 2:
             return
@@ -146,18 +466,19 @@ class RssHandler(ContentHandler):
                 return
             return
 
-        if second_to_last_tag == 'item':
+        if second_to_last_tag == 'item' and self.episode is not None:
             if last_tag == 'title':
                 self.episode.title = content
                 return
+            if last_tag == 'description':
+                self.episode.description = content
+                return
             if last_tag == 'pubDate':
-                for date_format in self.DATE_FORMATS:
-                    try:
-                        pub_date = datetime.strptime(content, date_format)
-                    except ValueError:
-                        pass
-                    else:
-                        self.episode.pub_date = pub_date
+                pub_date = parse_rss_date(content)
+                if pub_date:
+                    self.episode.pub_date = pub_date
+                else:
+                    self.errors.append(f"Unsupported pubDate {content}")
                 return
 
     def start_channel(self, attrs) -> None:
@@ -165,33 +486,113 @@ class RssHandler(ContentHandler):
         podcast = podcast.fetch() or podcast
         self.podcast = podcast
 
+        if self.stop_after_known > 0 and podcast.pk:
+            self.known_urls = set(
+                PodcastEpisode.objects.filter(
+                    podcast=podcast,
+                    url_key__isnull=False,
+                ).values_list(
+                    'url_key',
+                    flat=True,
+                )
+            )
+
     def end_channel(self) -> None:
-        self.podcast.save()
+        with atomic():
+            self.podcast.save()
+            self.save_episodes()
 
     def start_item(self, attrs) -> None:
         if not self.podcast:
             self.errors.append("self.podcast not set")
             return
 
-        if not self.podcast.pk:
-            self.podcast.save()
-
-        episode = PodcastEpisode(
+        self.episode = PodcastEpisode(
             podcast=self.podcast,
+            type=PodcastEpisode.TYPE_PODCAST_EPISODE,
         )
-        episode = episode.fetch() or episode
-        self.episode = episode
 
     def end_item(self) -> None:
-        db_episode: Optional[PodcastEpisode] = self.episode.fetch()
-        if db_episode:
-            db_episode.update(self.episode)
+        if self.episode is None:
             return
-        self.episode.save()
+        self.item_count += 1
+        url = self.episode.url
+        if url:
+            self.podcast_episodes.append(self.episode)
+        else:
+            self.errors.append("item without enclosure url")
         self.episode = None
 
+        if len(self.podcast_episodes) >= self.batch_size:
+            with atomic():
+                self.podcast.save()
+                self.save_episodes()
+
+        if not self.known_urls:
+            return
+        if normalize_url(url) in self.known_urls:
+            self.consecutive_known_count += 1
+        else:
+            self.consecutive_known_count = 0
+        if self.consecutive_known_count >= self.stop_after_known:
+            self.stopped_early = True
+            raise StopParsing()
+
     def start_enclosure(self, attrs):
-        self.episode.url = attrs.get('url')
+        if self.episode is None:
+            return
+        self.episode.url = attrs.get('url') or ''
+
+    def save_episodes(self) -> None:
+        """Writes the batch of episodes collected while parsing.  Existing
+        episodes are resolved with a single query and the inserts and updates
+        are done in bulk so the number of queries grows with the number of
+        batches rather than the number of items in the feed."""
+
+        episodes: Dict[str, PodcastEpisode] = {}
+        for episode in self.podcast_episodes:
+            episode.set_keys()
+            key = episode.url_key
+            if key in self.saved_urls:
+                continue
+            self.saved_urls.add(key)
+            episode.podcast = self.podcast
+            episodes[key] = episode
+        self.podcast_episodes = []
+
+        db_episodes: Dict[str, PodcastEpisode] = {
+            db_episode.url_key: db_episode
+            for db_episode in PodcastEpisode.objects.filter(
+                url_key__in=list(episodes)
+            )
+        }
+
+        new_episodes: List[PodcastEpisode] = []
+        changed_episodes: List[PodcastEpisode] = []
+        for key, episode in episodes.items():
+            db_episode = db_episodes.get(key)
+            if not db_episode:
+                new_episodes.append(episode)
+                continue
+
+            db_episode.update(episode, defer_save=True)
+            db_episode.set_keys()
+            if db_episode.get_changed_fields():
+                changed_episodes.append(db_episode)
+
+        PodcastEpisode.objects.bulk_create(
+            new_episodes,
+            batch_size=self.batch_size,
+        )
+        if changed_episodes:
+            PodcastEpisode.objects.bulk_update(
+                changed_episodes,
+                PodcastEpisode.update_fields + ('url_key',),
+                batch_size=self.batch_size,
+            )
+
+        self.inserted_count += len(new_episodes)
+        self.updated_count += len(changed_episodes)
 
 
 class LoadEpisodesAction(Action):
@@ -200,7 +601,15 @@ class LoadEpisodesAction(Action):
         pass
 
 
-def load_episodes(rss_file_url: str, content: bytes, user: User) -> None:
+def load_episodes(
+        rss_file_url: str,
+        content: bytes,
+        user: Optional[User],
+        full_rescan: bool = False,
+) -> Optional[RssHandler]:
+    """Loads the episodes from an rss file.  Unless full_rescan is True,
+    None is returned without parsing when the file is identical to the last
+    one loaded for the podcast."""
 
     content_mb = len(content) / 2**20
     if content_mb > settings.MAX_RSS_MB:
@@ -208,28 +617,290 @@ def load_episodes(rss_file_url: str, content: bytes, user: User) -> None:
             f"rss file is {content_mb:.2f}MB max is {settings.MAX_RSS_MB}MB"
         )
 
-    handler = RssHandler(rss_file_url, user)
-    parseString(content, handler)
-    for value in Counter(handler.errors).most_common():
-        print(value)
-
-
-class AddEpisodeToQueueAction(Action):
-
-    def run(self, episode: PodcastEpisode, profile: Profile):
-        queue = profile.queue
-        if not queue:
-            queue = profile_queue_default()
-        queue.append(
-            PodcastEpisodeSerializer(episode).data,
+    rss_hash = hash_rss(content)
+    podcast: Optional[Podcast] = Podcast(rss=rss_file_url).fetch()
+    if podcast and podcast.rss_hash == rss_hash and not full_rescan:
+        return None
+
+    handler = parse_rss(rss_file_url, [content], full_rescan)
+    if handler.podcast and handler.podcast.pk:
+        Podcast.objects.filter(
+            pk=handler.podcast.pk,
+        ).update(
+            rss_hash=rss_hash,
         )
-        profile.queue = queue
-        profile.save()
-
-
-
-
+    return handler
+
+
+def parse_rss(
+        rss_file_url: str,
+        chunks: Iterable[bytes],
+        full_rescan: bool = False,
+) -> RssHandler:
+    """Feeds the chunks of an rss file to an incremental parser so the whole
+    file never has to be held in memory.  The episodes are written in a
+    single transaction so an exception while reading the chunks (e.g. the
+    size limit being exceeded) leaves the database untouched.
+
+    Unless full_rescan is True, reading stops once
+    settings.RSS_STOP_AFTER_KNOWN_ITEMS consecutive items are already in the
+    database."""
+    stop_after_known = settings.RSS_STOP_AFTER_KNOWN_ITEMS
+    if full_rescan:
+        stop_after_known = 0
+    handler = RssHandler(rss_file_url, stop_after_known)
+    parser = make_parser()
+    parser.setContentHandler(handler)
+    with atomic():
+        try:
+            for chunk in chunks:
+                parser.feed(chunk)
+            parser.close()
+        except StopParsing:
+            handler.end_channel()
+
+    for error, count in Counter(handler.errors).most_common():
+        logger.warning(f"{rss_file_url}: {error} ({count} times)")
+    return handler
+
+
+# Channel elements that change every time some feed generators run even
+# though the channel and its items haven't changed
+CHANNEL_VOLATILE_TAGS = (b'lastBuildDate', b'pubDate', b'ttl', b'generator')
+
+ITEM_VOLATILE_TAGS = (b'lastBuildDate',)
+
+# Bytes of a tag that tell whether it's one of the volatile tags
+LONGEST_VOLATILE_TAG = 2 + max(len(tag) for tag in CHANNEL_VOLATILE_TAGS)
+
+
+class RssHash:
+    """Incremental digest of an rss file used to detect that a feed returned
+    the same file as the last refresh.  When settings.RSS_HASH_STRIP_VOLATILE
+    is True volatile elements like <lastBuildDate>...</lastBuildDate> and the
+    whitespace after them are left out so only the content of the channel
+    and its items is compared.
+
+    The file is split before each '<' into pieces.  A volatile element is a
+    piece made of its start tag and text followed by a piece starting with
+    its end tag, so apart from a volatile start tag waiting for the next
+    piece, only the first bytes of the current piece are held back."""
+
+    # States of the current piece
+    UNDECIDED = 'undecided'
+    PLAIN = 'plain'
+    VOLATILE = 'volatile'
+    # After a volatile end tag, until the whitespace after it ends
+    END_TAG = 'end_tag'
+
+    def __init__(self):
+        self.strip_volatile = settings.RSS_HASH_STRIP_VOLATILE
+        self.digest = sha256()
+        self.volatile_tags = CHANNEL_VOLATILE_TAGS
+        self.state = self.PLAIN
+        self.piece = b''
+        self.tag = b''
+        # A complete volatile start tag and text, dropped if the next piece
+        # is its end tag
+        self.held = b''
+        self.held_tag = b''
+
+    def update(self, chunk: bytes) -> None:
+        if not self.strip_volatile:
+            self.digest.update(chunk)
+            return
+        while True:
+            index = chunk.find(b'<')
+            if index == -1:
+                self.add_to_piece(chunk)
+                return
+            self.add_to_piece(chunk[:index])
+            self.end_piece()
+            self.state = self.UNDECIDED
+            self.piece = b''
+            self.add_to_piece(b'<')
+            chunk = chunk[index + 1:]
+
+    def add_to_piece(self, data: bytes) -> None:
+        if not data:
+            return
+        if self.state == self.PLAIN:
+            self.digest.update(data)
+        elif self.state == self.END_TAG:
+            data = data.lstrip()
+            if data:
+                self.state = self.PLAIN
+                self.digest.update(data)
+        else:
+            self.piece += data
+            if self.state == self.UNDECIDED and (
+                    b'>' in self.piece
+                    or len(self.piece) > LONGEST_VOLATILE_TAG
+            ):
+                self.classify_piece()
+
+    def classify_piece(self) -> None:
+        piece = self.piece
+        self.piece = b''
+        held = self.held
+        self.held = b''
+        if held:
+            end_tag = b'</' + self.held_tag + b'>'
+            if piece.startswith(end_tag):
+                self.state = self.END_TAG
+                self.add_to_piece(piece[len(end_tag):])
+                return
+            self.digest.update(held)
+
+        if piece.startswith(b'<item'):
+            self.volatile_tags = ITEM_VOLATILE_TAGS
+        for tag in self.volatile_tags:
+            if piece.startswith(b'<' + tag + b'>'):
+                self.state = self.VOLATILE
+                self.tag = tag
+                self.piece = piece
+                return
+        self.state = self.PLAIN
+        self.digest.update(piece)
+
+    def end_piece(self) -> None:
+        if self.state == self.UNDECIDED:
+            self.classify_piece()
+        if self.state == self.VOLATILE:
+            self.held = self.piece
+            self.held_tag = self.tag
+            self.piece = b''
+
+    def hexdigest(self) -> str:
+        if self.strip_volatile:
+            self.end_piece()
+            self.state = self.PLAIN
+            self.digest.update(self.held)
+            self.held = b''
+        return self.digest.hexdigest()
+
+
+def hash_rss(content: bytes) -> str:
+    """Returns the RssHash digest of a whole rss file"""
+    rss_hash = RssHash()
+    rss_hash.update(content)
+    return rss_hash.hexdigest()
+
+
+class RefreshResult(Enum):
+    UPDATED = 'updated'
+
+    # The server answered 304 Not Modified
+    NOT_MODIFIED = 'not_modified'
+
+    # The server sent the same rss file as the last refresh
+    UNCHANGED = 'unchanged'
+
+
+def record_fetch_state(
+        podcast: Podcast,
+        response: FeedResponse,
+        result: RefreshResult,
+        rss_hash: str = '',
+) -> None:
+    """Stores the validators and status of a download so the next refresh of
+    the podcast can make a conditional GET and schedules the next refresh.
+    When the feed has permanently moved the podcast's rss url is updated so
+    later refreshes skip the redirect."""
+    podcast.rss_etag = response.etag
+    podcast.rss_last_modified = response.last_modified
+    podcast.rss_final_url = response.final_url
+    podcast.rss_status = response.status
+    podcast.rss_checked = now()
+    update_fields = [
+        'rss_etag',
+        'rss_last_modified',
+        'rss_final_url',
+        'rss_status',
+        'rss_checked',
+    ]
 
+    if not response.not_modified:
+        podcast.rss_hash = rss_hash
+        update_fields.append('rss_hash')
+
+    update_fields += set_next_check(
+        podcast,
+        result == RefreshResult.UPDATED,
+    )
+
+    permanent_url = response.permanent_url
+    if permanent_url and permanent_url != podcast.rss:
+        if Podcast.objects.filter(
+            rss_key=normalize_url(permanent_url),
+        ).exclude(
+            pk=podcast.pk,
+        ).exists():
+            logger.warning(
+                f"{podcast.rss} moved to {permanent_url} which belongs to "
+                f"another podcast"
+            )
+        else:
+            logger.info(f"{podcast.rss} moved to {permanent_url}")
+            podcast.rss = permanent_url
+            update_fields.append('rss')
+
+    podcast.save(update_fields=update_fields)
+
+
+def store_feed_response(
+        podcast: Podcast,
+        response: FeedResponse,
+        full_rescan: bool = False,
+) -> RefreshResult:
+    """Loads the episodes from a download of the podcast's rss file as its
+    body is read, records the fetch state and closes the response.
+
+    Unless full_rescan is True, parsing is skipped when the digest of the
+    body is known up front (e.g. for a file from the feed cache) and is the
+    digest of the file loaded by the last refresh.  A digest is only recorded
+    when the whole body was read, which it isn't when parsing stops at known
+    episodes unless the body is being stored in the feed cache."""
+    try:
+        if response.not_modified:
+            record_fetch_state(podcast, response, RefreshResult.NOT_MODIFIED)
+            return RefreshResult.NOT_MODIFIED
+
+        if (
+                response.rss_hash
+                and response.rss_hash == podcast.rss_hash
+                and not full_rescan
+        ):
+            record_fetch_state(
+                podcast,
+                response,
+                RefreshResult.UNCHANGED,
+                response.rss_hash,
+            )
+            return RefreshResult.UNCHANGED
+
+        chunks = response.iter_content()
+        handler = parse_rss(podcast.rss, chunks, full_rescan)
+        if handler.stopped_early and response.cache_writer is not None:
+            # Only whole files are cached
+            for _ in chunks:
+                pass
+    finally:
+        response.close()
+
+    podcast.refresh_from_db()
+    record_fetch_state(
+        podcast,
+        response,
+        RefreshResult.UPDATED,
+        response.rss_hash,
+    )
+    return RefreshResult.UPDATED
 
 
+class AddEpisodeToQueueAction(Action):
 
+    def run(self, episode: PodcastEpisode, profile: Profile) -> QueueItem:
+        """Adds episode to the end of the profile's queue unless it's
+        already queued.  Only the new QueueItem row is written."""
+        return profile.queue.insert(episode)
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from statistics import median
+from typing import List, Optional
+
+from django.db.models import Q, QuerySet
+from django.utils.timezone import now
+
+from h5media.models import Podcast, PodcastEpisode
+
+
+MIN_CHECK_INTERVAL = timedelta(hours=1)
+
+MAX_CHECK_INTERVAL = timedelta(days=7)
+
+# Interval for podcasts without enough episodes to learn from
+DEFAULT_CHECK_INTERVAL = timedelta(hours=6)
+
+# Podcasts without an episode for this long are checked at
+# MAX_CHECK_INTERVAL
+DORMANT_AGE = timedelta(days=90)
+
+# Number of times a podcast is checked in the usual time between episodes
+CHECKS_PER_EPISODE = 24
+
+# Number of recent episodes used to learn how often a podcast publishes
+PUBLISH_HISTORY_SIZE = 10
+
+
+def get_recent_pub_dates(podcast: Podcast) -> List[datetime]:
+    return list(
+        PodcastEpisode.objects.filter(
+            podcast=podcast,
+            pub_date__isnull=False,
+        ).order_by(
+            '-pub_date',
+        ).values_list(
+            'pub_date',
+            flat=True,
+        )[:PUBLISH_HISTORY_SIZE]
+    )
+
+
+def get_check_interval(
+        podcast: Podcast,
+        pub_dates: List[datetime],
+        current_time: datetime,
+) -> timedelta:
+    """Returns the time to wait before checking the podcast's feed again.
+    The interval is a fraction of the median time between the podcast's
+    recent episodes (or of the time since its last episode, once that is
+    longer) and is stretched for each check in a row that found nothing
+    new."""
+    if len(pub_dates) < 2:
+        interval = DEFAULT_CHECK_INTERVAL
+    elif current_time - pub_dates[0] > DORMANT_AGE:
+        return MAX_CHECK_INTERVAL
+    else:
+        gaps = [
+            newer - older
+            for newer, older in zip(pub_dates, pub_dates[1:])
+        ]
+        expected_gap = max(median(gaps), current_time - pub_dates[0])
+        interval = expected_gap / CHECKS_PER_EPISODE
+
+    interval *= 1 + podcast.rss_unchanged_count / CHECKS_PER_EPISODE
+    return min(max(interval, MIN_CHECK_INTERVAL), MAX_CHECK_INTERVAL)
+
+
+def set_next_check(podcast: Podcast, changed: Optional[bool]) -> List[str]:
+    """Sets when the podcast's feed is next due to be checked.  changed is
+    None if the check failed.  Returns the names of the fields that were set
+    so the caller can include them when saving the podcast."""
+    if changed:
+        podcast.rss_unchanged_count = 0
+    else:
+        podcast.rss_unchanged_count += 1
+
+    current_time = now()
+    podcast.rss_next_check = current_time + get_check_interval(
+        podcast,
+        get_recent_pub_dates(podcast),
+        current_time,
+    )
+    return ['rss_unchanged_count', 'rss_next_check']
+
+
+def get_due_podcasts() -> QuerySet:
+    """Podcasts whose feeds are due to be checked"""
+    return Podcast.objects.filter(
+        Q(rss_next_check__isnull=True) | Q(rss_next_check__lte=now())
+    )
@@ -0,0 +1,50 @@
+"""Adds whole podcasts, albums and audiobooks to a profile's queue.  Each add
+is a single INSERT ... SELECT however many media files it adds, see
+QueueManager.extend()."""
+
+from datetime import datetime
+from typing import Optional
+
+from h5media.actions.actions import Action
+from h5media.models import Album, Audiobook, Podcast, Profile
+
+
+class AddPodcastEpisodesToQueueAction(Action):
+
+    def run(
+            self,
+            podcast: Podcast,
+            profile: Profile,
+            since: Optional[datetime] = None,
+    ) -> int:
+        """Adds the episodes of podcast published after since, oldest
+        first.  Returns the number of episodes added."""
+        episodes = podcast.episodes.all()
+        if since:
+            episodes = episodes.filter(pub_date__gt=since)
+        return profile.queue.extend(episodes.order_by('pub_date', 'pk'))
+
+
+class AddAlbumToQueueAction(Action):
+
+    def run(self, album: Album, profile: Profile) -> int:
+        """Adds the tracks of album in disc and track order"""
+        return profile.queue.extend(
+            album.tracks.order_by('disc', 'track', 'pk')
+        )
+
+
+class AddAudiobookToQueueAction(Action):
+
+    def run(
+            self,
+            audiobook: Audiobook,
+            profile: Profile,
+            first_chapter: int = 0,
+    ) -> int:
+        """Adds the chapters of audiobook starting at first_chapter"""
+        return profile.queue.extend(
+            audiobook.chapters.filter(
+                chapter__gte=first_chapter,
+            ).order_by('chapter')
+        )
@@ -0,0 +1,147 @@
+"""Parsing of the dates found in rss files.  Feeds are supposed to use RFC 822
+dates (e.g. "Mon, 01 Jan 2024 10:00:00 +0000") but real feeds contain many
+variants of them (single digit days, named time zones, missing seconds) and
+some use ISO 8601 instead."""
+
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from re import compile as re_compile, IGNORECASE, VERBOSE
+from typing import Optional
+
+
+RFC_822_REGEX = re_compile(
+    r"""
+    ^\s*
+    (?:[a-z]+\.?,?\s*)?                 # optional day of week
+    (?P<day>\d{1,2})[\s-]+
+    (?P<month>[a-z]{3,9})\.?[\s-]+
+    (?P<year>\d{4}|\d{2})\s+
+    (?P<hour>\d{1,2}):(?P<minute>\d{2})
+    (?::(?P<second>\d{2})(?:\.\d+)?)?
+    \s*(?P<zone>[a-z]{1,5}|[+-]\d{2}:?\d{2})?
+    \s*$
+    """,
+    IGNORECASE | VERBOSE,
+)
+
+ISO_8601_REGEX = re_compile(
+    r"""
+    ^\s*
+    (?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})
+    (?:[t\s]
+        (?P<hour>\d{2}):(?P<minute>\d{2})
+        (?::(?P<second>\d{2})(?:\.\d+)?)?
+    )?
+    \s*(?P<zone>z|[+-]\d{2}:?\d{2})?
+    \s*$
+    """,
+    IGNORECASE | VERBOSE,
+)
+
+MONTHS = {
+    name: number
+    for number, name in enumerate(
+        (
+            'jan', 'feb', 'mar', 'apr', 'may', 'jun',
+            'jul', 'aug', 'sep', 'oct', 'nov', 'dec',
+        ),
+        1,
+    )
+}
+
+# Hours from UTC of the zone names defined by RFC 822 and a few others seen
+# in feeds.  Unknown names are treated as UTC as RFC 822 recommends.
+ZONE_OFFSETS = {
+    'ut': 0,
+    'utc': 0,
+    'gmt': 0,
+    'z': 0,
+    'est': -5,
+    'edt': -4,
+    'cst': -6,
+    'cdt': -5,
+    'mst': -7,
+    'mdt': -6,
+    'pst': -8,
+    'pdt': -7,
+    'bst': 1,
+    'cet': 1,
+    'cest': 2,
+}
+
+
+def get_timezone(zone: Optional[str]) -> timezone:
+    if not zone:
+        return timezone.utc
+
+    if zone[0] in '+-':
+        digits = zone[1:].replace(':', '')
+        offset = timedelta(hours=int(digits[:2]), minutes=int(digits[2:]))
+        if zone[0] == '-':
+            offset = -offset
+        return timezone(offset)
+
+    return timezone(timedelta(hours=ZONE_OFFSETS.get(zone.lower(), 0)))
+
+
+def build_datetime(
+        year: int,
+        month: int,
+        day: int,
+        hour: Optional[str],
+        minute: Optional[str],
+        second: Optional[str],
+        zone: Optional[str],
+) -> Optional[datetime]:
+    try:
+        return datetime(
+            year,
+            month,
+            day,
+            int(hour or 0),
+            int(minute or 0),
+            min(int(second or 0), 59),  # leap seconds
+            tzinfo=get_timezone(zone),
+        )
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def parse_rss_date(text: str) -> Optional[datetime]:
+    """Returns the timezone aware datetime for an RFC 822 or ISO 8601 date or
+    None if the text isn't a date.  Dates without a time zone are assumed to
+    be UTC.  The results are cached since the items of a feed often share
+    the same dates."""
+
+    match = RFC_822_REGEX.match(text)
+    if match:
+        month = MONTHS.get(match['month'][:3].lower())
+        if not month:
+            return None
+        year = int(match['year'])
+        if len(match['year']) == 2:
+            year += 2000 if year < 50 else 1900
+        return build_datetime(
+            year,
+            month,
+            int(match['day']),
+            match['hour'],
+            match['minute'],
+            match['second'],
+            match['zone'],
+        )
+
+    match = ISO_8601_REGEX.match(text)
+    if match:
+        return build_datetime(
+            int(match['year']),
+            int(match['month']),
+            int(match['day']),
+            match['hour'],
+            match['minute'],
+            match['second'],
+            match['zone'],
+        )
+
+    return None
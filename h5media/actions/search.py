@@ -0,0 +1,162 @@
+"""Full-text search of podcasts and episodes.  On SQLite the FTS5 indexes
+created by migration 0012 are searched and the results are ranked by BM25
+with the titles weighted above the descriptions.  Other databases fall back
+to LIKE on the same columns."""
+
+import re
+from typing import List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+from django.utils.text import Truncator
+
+from h5media.models import Podcast, PodcastEpisode
+
+
+# Weight of a match in the title relative to one in the description
+TITLE_WEIGHT = 10.0
+
+# Number of words in a snippet
+SNIPPET_WORDS = 16
+
+# Mark the start and end of matches in FTS5 snippets before they are
+# escaped
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+# Shortest last word matched as a prefix.  Shorter prefixes match so many
+# words that ranking the matches takes too long.
+MIN_PREFIX_LENGTH = 3
+
+WORD_REGEX = re.compile(r'\w+')
+
+
+def build_match_query(search: str) -> str:
+    """Turns what the user typed into an FTS5 query that finds rows with
+    every word.  The last word also matches words it's the start of, so
+    results show up while the user types."""
+    words = WORD_REGEX.findall(search)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) >= MIN_PREFIX_LENGTH:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def format_snippet(snippet: str) -> SafeString:
+    return mark_safe(
+        escape(snippet).replace(
+            MATCH_START,
+            '<mark>',
+        ).replace(
+            MATCH_END,
+            '</mark>',
+        )
+    )
+
+
+def has_fts_table(table: str) -> bool:
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def match(table: str, search: str, limit: int) -> List[Tuple[int, str]]:
+    """Returns the rowids and snippets of the best matches in table"""
+    match_query = build_match_query(search)
+    if not match_query:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT
+                rowid,
+                snippet({table}, -1, %s, %s, '…', %s)
+            FROM {table}
+            WHERE {table} MATCH %s
+            ORDER BY bm25({table}, %s, 1.0)
+            LIMIT %s
+            """,
+            [
+                MATCH_START,
+                MATCH_END,
+                SNIPPET_WORDS,
+                match_query,
+                TITLE_WEIGHT,
+                limit,
+            ],
+        )
+        return cursor.fetchall()
+
+
+def search_fts(
+        table: str,
+        queryset: QuerySet,
+        search: str,
+        limit: int,
+) -> List:
+    """Loads the objects in queryset matching search in the order of
+    their rank and sets their search_snippet"""
+    matches = match(table, search, limit)
+    objects = queryset.in_bulk([pk for pk, _ in matches])
+    results = []
+    for pk, snippet in matches:
+        obj = objects.get(pk)
+        if obj is not None:
+            obj.search_snippet = format_snippet(snippet)
+            results.append(obj)
+    return results
+
+
+def search_like(queryset: QuerySet, search: str, limit: int) -> List:
+    """Fallback for databases without FTS5.  Title matches come first."""
+    words = WORD_REGEX.findall(search)
+    if not words:
+        return []
+    title_q = Q()
+    text_q = Q()
+    for word in words:
+        title_q &= Q(title__icontains=word)
+        text_q &= Q(title__icontains=word) | Q(description__icontains=word)
+
+    results = list(queryset.filter(title_q).order_by('title')[:limit])
+    if len(results) < limit:
+        results += queryset.filter(text_q).exclude(
+            pk__in=[obj.pk for obj in results],
+        ).order_by('title')[:limit - len(results)]
+    for obj in results:
+        obj.search_snippet = escape(
+            Truncator(obj.description).words(SNIPPET_WORDS)
+        )
+    return results
+
+
+def search_podcasts(
+        search: str,
+        limit: int = 50,
+        queryset: Optional[QuerySet] = None,
+) -> List[Podcast]:
+    """Returns the podcasts whose title or description match search, best
+    first.  queryset can add annotations to the podcasts."""
+    if queryset is None:
+        queryset = Podcast.objects.all()
+    if has_fts_table('h5media_podcast_fts'):
+        return search_fts('h5media_podcast_fts', queryset, search, limit)
+    return search_like(queryset, search, limit)
+
+
+def search_episodes(search: str, limit: int = 50) -> List[PodcastEpisode]:
+    """Returns the episodes whose title or description match search, best
+    first"""
+    queryset = PodcastEpisode.objects.select_related('podcast')
+    if has_fts_table('h5media_episode_fts'):
+        return search_fts('h5media_episode_fts', queryset, search, limit)
+    return search_like(queryset, search, limit)
@@ -0,0 +1,141 @@
+from pathlib import Path
+from struct import pack
+from tempfile import TemporaryDirectory
+
+from django.test import SimpleTestCase
+
+from h5media.actions.audio_probe import (
+    AudioInfo,
+    probe_audio,
+    probe_audio_files,
+)
+
+
+# MPEG 1 layer III, 128 kbps, 44.1 kHz, stereo
+MP3_FRAME_HEADER = b'\xff\xfb\x90\x00'
+
+MP3_FRAME_LENGTH = 417
+
+
+def build_mp3(frame_count: int, first_frame: bytes = b'') -> bytes:
+    id3_tag = b'ID3\x04\x00\x00\x00\x00\x00\x0a' + b'\x00' * 10
+    frames = []
+    for i in range(frame_count):
+        body = first_frame if i == 0 else b''
+        frames.append(
+            MP3_FRAME_HEADER
+            + body.ljust(MP3_FRAME_LENGTH - 4, b'\x00')
+        )
+    return id3_tag + b''.join(frames)
+
+
+def build_atom(atom_type: bytes, body: bytes) -> bytes:
+    return pack('>I', len(body) + 8) + atom_type + body
+
+
+def build_ogg_page(granule_position: int, packet: bytes) -> bytes:
+    return (
+        b'OggS\x00\x02'
+        + pack('<qIII', granule_position, 1, 0, 0)
+        + bytes([1, len(packet)])
+        + packet
+    )
+
+
+class ProbeAudioTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name: str, content: bytes) -> str:
+        path = Path(self.directory.name) / name
+        path.write_bytes(content)
+        return str(path)
+
+    def test_mp3_constant_bitrate(self):
+        content = build_mp3(100)
+        info = probe_audio(self.write('cbr.mp3', content))
+        self.assertEqual(len(content), info.size)
+        self.assertAlmostEqual(100 * 417 * 8 / 128_000, info.duration)
+        self.assertEqual(128, info.bitrate)
+
+    def test_mp3_xing(self):
+        xing = (
+            b'\x00' * 32
+            + b'Xing'
+            + pack('>III', 3, 1000, 500_000)
+        )
+        info = probe_audio(self.write('vbr.mp3', build_mp3(3, xing)))
+        self.assertAlmostEqual(1000 * 1152 / 44100, info.duration)
+        self.assertEqual(153, info.bitrate)
+
+    def test_mp3_lame_encoder_delay(self):
+        # 576 samples of delay and 1728 of padding
+        lame = b'LAME3.100' + b'\x00' * 12 + bytes([0x24, 0x06, 0xC0])
+        xing = b'\x00' * 32 + b'Xing' + pack('>II', 1, 1000) + lame
+        info = probe_audio(self.write('lame.mp3', build_mp3(3, xing)))
+        self.assertAlmostEqual(
+            (1000 * 1152 - 576 - 1728) / 44100,
+            info.duration,
+        )
+
+    def test_mp3_vbri(self):
+        vbri = b'\x00' * 32 + b'VBRI' + pack('>HHHII', 1, 0, 75, 400_000, 500)
+        info = probe_audio(self.write('vbri.mp3', build_mp3(3, vbri)))
+        self.assertAlmostEqual(500 * 1152 / 44100, info.duration)
+
+    def test_m4a(self):
+        mvhd = build_atom(
+            b'mvhd',
+            b'\x00\x00\x00\x00' + pack('>IIII', 0, 0, 1000, 90_500),
+        )
+        content = (
+            build_atom(b'ftyp', b'M4A \x00\x00\x00\x00')
+            + build_atom(b'mdat', b'\x00' * 1000)
+            + build_atom(b'moov', build_atom(b'udta', b'') + mvhd)
+        )
+        info = probe_audio(self.write('book.m4b', content))
+        self.assertAlmostEqual(90.5, info.duration)
+
+    def test_opus(self):
+        opus_head = b'OpusHead\x01\x02' + pack('<HIHB', 312, 48000, 0, 0)
+        content = (
+            build_ogg_page(0, opus_head)
+            + build_ogg_page(48000 * 10 + 312, b'\x00' * 100)
+        )
+        info = probe_audio(self.write('episode.opus', content))
+        self.assertAlmostEqual(10, info.duration)
+
+    def test_vorbis(self):
+        vorbis_id = b'\x01vorbis' + pack('<IBIiii', 0, 2, 44100, 0, 0, 0)
+        content = (
+            build_ogg_page(0, vorbis_id)
+            + build_ogg_page(44100 * 3, b'\x00' * 100)
+        )
+        info = probe_audio(self.write('song.ogg', content))
+        self.assertAlmostEqual(3, info.duration)
+
+    def test_unrecognized(self):
+        for name, content in (
+                ('empty.mp3', b''),
+                ('text.mp3', b'not audio at all'),
+                ('truncated.m4a', b'\x00\x00\x00\x20ftypM4A '),
+        ):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    AudioInfo(len(content)),
+                    probe_audio(self.write(name, content)),
+                )
+        self.assertIsNone(probe_audio(self.write('x', b'') + '.missing'))
+
+    def test_probe_audio_files(self):
+        paths = [
+            self.write(f'{i}.mp3', build_mp3(10 * (i + 1)))
+            for i in range(3)
+        ]
+        results = probe_audio_files(paths, threads=2)
+        self.assertEqual(paths, list(results))
+        self.assertLess(results[paths[0]].duration, results[paths[2]].duration)
@@ -0,0 +1,152 @@
+from datetime import timedelta
+from os import utime
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from h5media.actions.feed_cache import FeedCache
+from h5media.actions.podcast_actions import (
+    DownloadException,
+    FeedResponse,
+    download_rss,
+    hash_rss,
+)
+
+
+RSS_URL = 'https://example.com/feed.rss'
+
+
+class FeedCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.temporary_directory = TemporaryDirectory()
+        self.directory = self.temporary_directory.name
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_put_and_get(self):
+        cache = FeedCache(self.directory, 2**20)
+        self.assertIsNone(cache.get(RSS_URL))
+
+        cache.put(RSS_URL, b'<rss/>', etag='"abc"')
+
+        entry, content = cache.get('HTTP://Example.com/feed.rss')
+        self.assertEqual(b'<rss/>', content)
+        self.assertEqual('"abc"', entry.etag)
+        self.assertEqual(6, entry.size)
+        self.assertIsNone(cache.get('https://example.com/other.rss'))
+
+    def test_evict_least_recently_used(self):
+        content = bytes(range(256)) * 40
+        urls = [f'https://example.com/{i}.rss' for i in range(3)]
+        cache = FeedCache(self.directory, 10**9)
+        for i, url in enumerate(urls):
+            cache.put(url, content)
+            utime(cache.get_paths(url)[1], (i, i))
+
+        # Using the oldest entry makes the second one the least recently used
+        cache.get(urls[0])
+        entry_bytes = sum(
+            path.stat().st_size for path in cache.get_paths(urls[0])
+        )
+        cache.max_bytes = entry_bytes * 2
+        self.assertEqual(1, cache.evict())
+
+        self.assertIsNotNone(cache.get(urls[0]))
+        self.assertIsNone(cache.get(urls[1]))
+        self.assertIsNotNone(cache.get(urls[2]))
+
+    def test_put_evicts_only_when_too_large(self):
+        content = bytes(range(256)) * 40
+        cache = FeedCache(self.directory, 10**9)
+        with patch.object(cache, 'evict', wraps=cache.evict) as mock_evict:
+            for i in range(3):
+                cache.put(f'https://example.com/{i}.rss', content)
+            # Only the first put scans the directory for its size
+            self.assertEqual(1, mock_evict.call_count)
+
+            entry_bytes = sum(
+                path.stat().st_size
+                for path in cache.get_paths('https://example.com/0.rss')
+            )
+            cache.max_bytes = entry_bytes * 3
+            cache.put('https://example.com/3.rss', content)
+            self.assertEqual(2, mock_evict.call_count)
+        # Shrunk to below max_bytes leaving room for the next puts
+        self.assertEqual(2, len(list(cache.directory.glob('*.rss.gz'))))
+
+    def test_download_rss(self):
+        cache = FeedCache(self.directory, 2**20)
+        request_rss = 'h5media.actions.podcast_actions.request_rss'
+
+        with patch(request_rss) as mock_request_rss:
+            mock_request_rss.return_value = FeedResponse(
+                url=RSS_URL,
+                status=200,
+                content=b'<rss/>',
+                etag='"abc"',
+            )
+            response = download_rss(RSS_URL, cache=cache)
+        self.assertFalse(response.from_cache)
+
+        with patch(request_rss) as mock_request_rss:
+            mock_request_rss.return_value = FeedResponse(
+                url=RSS_URL,
+                status=304,
+                etag='"abc"',
+            )
+            response = download_rss(RSS_URL, cache=cache)
+        self.assertEqual('"abc"', mock_request_rss.call_args.args[1])
+        self.assertTrue(response.from_cache)
+        self.assertEqual(200, response.status)
+        self.assertEqual(b'<rss/>', response.content)
+
+        with patch(request_rss) as mock_request_rss:
+            mock_request_rss.side_effect = DownloadException('offline')
+            response = download_rss(RSS_URL, cache=cache)
+        self.assertEqual(b'<rss/>', response.content)
+
+        cache.max_age = timedelta(hours=1)
+        with patch(request_rss) as mock_request_rss:
+            response = download_rss(RSS_URL, cache=cache)
+        mock_request_rss.assert_not_called()
+        self.assertEqual(b'<rss/>', response.content)
+
+    def test_streamed_download(self):
+        cache = FeedCache(self.directory, 2**20)
+        content = b'<rss>' + b' ' * 100 + b'</rss>'
+
+        def download() -> FeedResponse:
+            with patch(
+                    'h5media.actions.podcast_actions.request_rss',
+                    return_value=FeedResponse(
+                        url=RSS_URL,
+                        status=200,
+                        content=content,
+                    ),
+            ):
+                return download_rss(RSS_URL, stream=True, cache=cache)
+
+        # Closing the response before reading the body to the end leaves
+        # nothing in the cache
+        response = download()
+        response.close()
+        self.assertIsNone(cache.get(RSS_URL))
+        self.assertEqual([], list(cache.directory.iterdir()))
+
+        response = download()
+        self.assertEqual(content, b''.join(response.iter_content()))
+        response.close()
+        entry, cached_content = cache.get(RSS_URL)
+        self.assertEqual(content, cached_content)
+        self.assertEqual(hash_rss(content), entry.rss_hash)
+
+        # A cached file is read in chunks with its digest known up front
+        cache.max_age = timedelta(hours=1)
+        response = download_rss(RSS_URL, stream=True, cache=cache)
+        self.assertTrue(response.from_cache)
+        self.assertEqual(hash_rss(content), response.rss_hash)
+        self.assertEqual(content, b''.join(response.iter_content()))
+        response.close()
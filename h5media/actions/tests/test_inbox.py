@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, timezone
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from h5media.actions.inbox import get_inbox_page
+from h5media.models import Podcast, PodcastEpisode
+from h5media.tests.test_utilities import create_user
+
+
+START_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class InboxTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+
+    def create_podcasts(self, podcast_count: int, episode_count: int):
+        episodes = []
+        for i in range(podcast_count):
+            podcast = Podcast.objects.create(
+                title=f'Podcast {i}',
+                rss=f'https://example.com/{i}/feed',
+            )
+            podcast.subscribers.add(self.user)
+            for j in range(episode_count):
+                episodes.append(PodcastEpisode(
+                    podcast=podcast,
+                    title=f'Episode {i}-{j}',
+                    url=f'https://example.com/{i}/{j}.mp3',
+                    # Some episodes of different podcasts share a pub_date
+                    pub_date=START_DATE + timedelta(
+                        hours=(i * 7 + j * 5) % 40,
+                    ),
+                ))
+        PodcastEpisode.objects.bulk_create(episodes)
+
+    def get_expected_pks(self):
+        return list(
+            PodcastEpisode.objects.filter(
+                podcast__subscribers=self.user,
+                pub_date__isnull=False,
+            ).order_by('-pub_date', '-pk').values_list('pk', flat=True)
+        )
+
+    def test_pages(self):
+        self.create_podcasts(6, 8)
+        unsubscribed = Podcast.objects.create(title='Unsubscribed')
+        PodcastEpisode.objects.create(
+            podcast=unsubscribed,
+            url='https://example.com/unsubscribed.mp3',
+            pub_date=START_DATE + timedelta(days=10),
+        )
+        PodcastEpisode.objects.create(
+            podcast=Podcast.objects.get(title='Podcast 0'),
+            url='https://example.com/undated.mp3',
+        )
+
+        pks = []
+        before = None
+        while True:
+            page = get_inbox_page(self.user, 10, before)
+            pks += [episode.pk for episode in page.episodes]
+            if not page.next_cursor:
+                break
+            self.assertEqual(10, len(page.episodes))
+            before = page.next_cursor
+        self.assertEqual(self.get_expected_pks(), pks)
+
+    def test_queries_independent_of_subscriptions(self):
+        self.create_podcasts(200, 3)
+        with CaptureQueriesContext(connection) as context:
+            page = get_inbox_page(self.user, 25)
+        self.assertEqual(self.get_expected_pks()[:25], [
+            episode.pk for episode in page.episodes
+        ])
+        self.assertLessEqual(len(context.captured_queries), 1 + 26)
+
+        # The podcast is loaded with the episodes
+        with CaptureQueriesContext(connection) as context:
+            for episode in page.episodes:
+                str(episode.podcast)
+        self.assertEqual([], context.captured_queries)
+
+    def test_no_subscriptions(self):
+        page = get_inbox_page(self.user)
+        self.assertEqual([], page.episodes)
+        self.assertIsNone(page.next_cursor)
+
+    def test_api(self):
+        self.create_podcasts(2, 2)
+        self.client.force_login(self.user)
+        url = reverse('inbox_api')
+
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(self.get_expected_pks(), [
+            episode['pk'] for episode in data['episodes']
+        ])
+        self.assertIsNone(data['next'])
+        self.assertEqual('Podcast 1', data['episodes'][0]['podcast_title'])
+
+        expected_pks = self.get_expected_pks()
+        before = PodcastEpisode.objects.get(pk=expected_pks[1])
+        response = self.client.get(url, {
+            'before': before.pub_date.isoformat(),
+            'before_pk': before.pk,
+        })
+        self.assertEqual(expected_pks[2:], [
+            episode['pk'] for episode in response.json()['episodes']
+        ])
+
+        response = self.client.get(url, {'before': 'yesterday'})
+        self.assertEqual(400, response.status_code)
+
+        response = self.client.get(reverse('inbox'))
+        self.assertContains(response, 'Episode 1-1')
@@ -1,44 +1,453 @@
+from re import sub as re_sub
 
-from django.test import TestCase
+from threading import Thread
+from typing import List, Tuple
+from unittest.mock import patch
 
-from h5media.actions.podcast_actions import AddEpisodeToQueueAction
+from requests import Response
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from h5media.actions.podcast_actions import (
+    AddEpisodeToQueueAction,
+    DownloadException,
+    FeedResponse,
+    RefreshResult,
+    RssHash,
+    download_rss,
+    hash_rss,
+    load_episodes,
+    parse_rss,
+    store_feed_response,
+)
+from h5media.actions.search import search_episodes
 from h5media.models import Podcast, PodcastEpisode, Profile
-from h5media.serializers import PodcastEpisodeSerializer
 from h5media.tests.test_utilities import create_user
 
 
+# Number of threads adding to the same queue at once and how many adds each
+# makes
+DEVICE_COUNT = 4
+ADDS_PER_DEVICE = 25
+
+
 class AddEpisodeToQueueActionTest(TestCase):
 
-    def test_run(self):
+    def setUp(self):
         podcast = Podcast.objects.create(
             title="Even Truer Crime"
         )
-        episode = PodcastEpisode.objects.create(
-            podcast=podcast,
-            title="Murderizing in Memphis",
-        )
-        profile = Profile.objects.create(
+        self.episodes = [
+            PodcastEpisode.objects.create(
+                podcast=podcast,
+                title=title,
+                url=f'https://example.com/{i}.mp3',
+            )
+            for i, title in enumerate((
+                "Murderizing in Memphis",
+                "Larceny in Louisville",
+            ))
+        ]
+        self.profile = Profile.objects.create(
             user=create_user(),
         )
-        self.assertEqual(profile.queue, [])
 
-        AddEpisodeToQueueAction().run(episode, profile)
+    def test_run(self):
+        self.assertFalse(self.profile.queue.exists())
+
+        with CaptureQueriesContext(connection) as context:
+            AddEpisodeToQueueAction().run(self.episodes[0], self.profile)
+        writes = [
+            query['sql']
+            for query in context.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertEqual(1, len(writes))
+        self.assertIn('"h5media_queueitem"', writes[0])
+
+        AddEpisodeToQueueAction().run(self.episodes[1], self.profile)
+        self.assertEqual(
+            [episode.pk for episode in self.episodes],
+            list(
+                self.profile.queue.order_by('order').values_list(
+                    'media_file_id',
+                    flat=True,
+                )
+            ),
+        )
+
+
+class AddEpisodeToQueueConcurrencyTest(TransactionTestCase):
+
+    def test_concurrent_adds(self):
+        podcast = Podcast.objects.create(title="Even Truer Crime")
+        episodes = [
+            PodcastEpisode.objects.create(
+                podcast=podcast,
+                title=f"Murderizing in Memphis {i}",
+                url=f'https://example.com/{i}.mp3',
+            )
+            for i in range(DEVICE_COUNT * ADDS_PER_DEVICE)
+        ]
+        profile = Profile.objects.create(user=create_user())
+
+        errors = []
+
+        def add_episodes(device_episodes):
+            # Each thread stands for a device with its own connection
+            try:
+                device_profile = Profile.objects.get(pk=profile.pk)
+                for episode in device_episodes:
+                    AddEpisodeToQueueAction().run(episode, device_profile)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            Thread(
+                target=add_episodes,
+                args=(episodes[device::DEVICE_COUNT],),
+            )
+            for device in range(DEVICE_COUNT)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(
+            DEVICE_COUNT * ADDS_PER_DEVICE,
+            profile.queue.count(),
+        )
+
+
+RSS_URL = 'https://example.com/feed.rss'
+
+
+def build_rss(
+        item_count: int,
+        title_prefix: str = 'Episode',
+        host: str = 'example.com',
+) -> bytes:
+    items = "".join(
+        f"""
+        <item>
+            <title>{title_prefix} {i}</title>
+            <description>About &lt;b&gt;episode&lt;/b&gt; {i}</description>
+            <pubDate>Mon, 0{1 + i % 9} Jan 2024 10:00:00 +0000</pubDate>
+            <enclosure url="https://{host}/episodes/{i}.mp3"/>
+        </item>"""
+        for i in range(item_count)
+    )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    <rss version="2.0">
+        <channel>
+            <title>{host} Podcast</title>
+            <link>https://{host}/</link>
+            <description>An example</description>
+            {items}
+        </channel>
+    </rss>""".encode('utf-8')
+
+
+class LoadEpisodesTest(TestCase):
+
+    def test_load_episodes(self):
+        load_episodes(RSS_URL, build_rss(3), None)
+
+        podcast = Podcast.objects.get(rss=RSS_URL)
+        self.assertEqual(podcast.title, 'example.com Podcast')
+        self.assertEqual(
+            ['Episode 0', 'Episode 1', 'Episode 2'],
+            list(
+                podcast.episodes.order_by('url').values_list(
+                    'title',
+                    flat=True,
+                )
+            ),
+        )
+        self.assertTrue(
+            all(
+                episode.type == PodcastEpisode.TYPE_PODCAST_EPISODE
+                for episode in podcast.episodes.all()
+            )
+        )
+        self.assertEqual(
+            'About <b>episode</b> 1',
+            podcast.episodes.get(title='Episode 1').description,
+        )
+        self.assertEqual(
+            ['Episode 2'],
+            [episode.title for episode in search_episodes('about episode 2')],
+        )
+
+        load_episodes(RSS_URL, build_rss(4, 'Renamed'), None)
+        self.assertEqual(4, podcast.episodes.count())
+        self.assertEqual(
+            4,
+            podcast.episodes.filter(title__startswith='Renamed').count(),
+        )
+
+    def test_query_count_independent_of_item_count(self):
+
+        def count_queries(item_count: int, host: str) -> int:
+            with CaptureQueriesContext(connection) as context:
+                load_episodes(
+                    f'https://{host}/feed.rss',
+                    build_rss(item_count, host=host),
+                    None,
+                )
+            return len(context.captured_queries)
+
+        self.assertEqual(
+            count_queries(2, 'small.example.com'),
+            count_queries(50, 'large.example.com'),
+        )
+        # Refreshing an unchanged feed
+        self.assertEqual(
+            count_queries(2, 'small.example.com'),
+            count_queries(50, 'large.example.com'),
+        )
+
+    def test_parse_rss_chunks(self):
+        content = build_rss(5)
+        chunks = [content[i:i + 7] for i in range(0, len(content), 7)]
+        parse_rss(RSS_URL, chunks)
 
-        profile.refresh_from_db()
+        podcast = Podcast.objects.get(rss=RSS_URL)
+        self.assertEqual(podcast.title, 'example.com Podcast')
         self.assertEqual(
-            profile.queue,
-            [
-                PodcastEpisodeSerializer(episode).data
-            ],
+            {f'Episode {i}' for i in range(5)},
+            set(podcast.episodes.values_list('title', flat=True)),
         )
 
+    def test_parse_errors_logged(self):
+        content = re_sub(rb'<enclosure [^>]*>', b'', build_rss(3))
+        with self.assertLogs('web', 'WARNING') as logs:
+            parse_rss(RSS_URL, [content])
+        self.assertEqual(
+            [f'{RSS_URL}: item without enclosure url (3 times)'],
+            [record.getMessage() for record in logs.records],
+        )
+
+    @override_settings(RSS_STOP_AFTER_KNOWN_ITEMS=3)
+    def test_stop_after_known_items(self):
+        load_episodes(RSS_URL, build_rss(10), None)
+
+        handler = load_episodes(RSS_URL, build_rss(10, 'Renamed'), None)
+        self.assertTrue(handler.stopped_early)
+        self.assertEqual(
+            3,
+            PodcastEpisode.objects.filter(title__startswith='Renamed').count(),
+        )
+
+        handler = load_episodes(
+            RSS_URL,
+            build_rss(10, 'Renamed'),
+            None,
+            full_rescan=True,
+        )
+        self.assertFalse(handler.stopped_early)
+        self.assertEqual(
+            10,
+            PodcastEpisode.objects.filter(title__startswith='Renamed').count(),
+        )
+
+    @override_settings(RSS_HASH_STRIP_VOLATILE=True)
+    def test_hash_rss_strip_volatile(self):
+        content = build_rss(2).replace(
+            b'<description>An example</description>',
+            b'<description>An example</description>'
+            b'<lastBuildDate>Mon, 01 Jan 2024 10:00:00 +0000</lastBuildDate>',
+        )
+        rebuilt = content.replace(b'Mon, 01 Jan 2024', b'Tue, 02 Jan 2024', 1)
+        self.assertNotEqual(content, rebuilt)
+        self.assertEqual(hash_rss(content), hash_rss(rebuilt))
+        self.assertNotEqual(
+            hash_rss(content),
+            hash_rss(content.replace(b'Episode 1', b'Episode One')),
+        )
+
+        # Volatile elements split across chunks are left out as well
+        for chunk_size in (1, 7, 64):
+            rss_hash = RssHash()
+            for i in range(0, len(rebuilt), chunk_size):
+                rss_hash.update(rebuilt[i:i + chunk_size])
+            self.assertEqual(hash_rss(content), rss_hash.hexdigest())
+
+
+def build_response(
+        url: str,
+        status: int,
+        content: bytes = b'',
+        headers: dict = None,
+        history: list = None,
+) -> Response:
+    response = Response()
+    response.url = url
+    response.status_code = status
+    response._content = content
+    response._content_consumed = True
+    response.headers.update(headers or {})
+    response.history = history or []
+    return response
+
+
+def build_chunked_response(url: str, content: bytes) -> Tuple[Response, List]:
+    """Returns a response whose body is read 100 bytes at a time and the
+    list of the chunks read so far"""
+    response = build_response(url, 200)
+    read_chunks = []
+
+    def iter_content(chunk_size):
+        for i in range(0, len(content), 100):
+            read_chunks.append(content[i:i + 100])
+            yield read_chunks[-1]
+
+    response.iter_content = iter_content
+    return response, read_chunks
+
+
+def refresh_podcast(podcast: Podcast) -> RefreshResult:
+    """Refreshes the podcast the way the refresh_feeds command does"""
+    response = download_rss(
+        podcast.rss,
+        etag=podcast.rss_etag,
+        last_modified=podcast.rss_last_modified,
+        stream=True,
+    )
+    return store_feed_response(podcast, response)
+
 
+class RefreshPodcastTest(TestCase):
 
+    def test_not_modified(self):
+        podcast = Podcast.objects.create(
+            title='Example',
+            rss=RSS_URL,
+            rss_etag='"abc"',
+            rss_last_modified='Mon, 01 Jan 2024 10:00:00 GMT',
+        )
+
+        # A 304 has no body.  Even if the server sent one it mustn't be read.
+        with patch('h5media.actions.podcast_actions.get') as mock_get, \
+                patch('h5media.actions.podcast_actions.parse_rss') \
+                as mock_parse_rss:
+            mock_get.return_value = build_response(
+                RSS_URL,
+                304,
+                build_rss(1),
+            )
+            self.assertEqual(
+                RefreshResult.NOT_MODIFIED,
+                refresh_podcast(podcast),
+            )
+
+        headers = mock_get.call_args.kwargs['headers']
+        self.assertEqual(headers['If-None-Match'], '"abc"')
+        self.assertEqual(
+            headers['If-Modified-Since'],
+            'Mon, 01 Jan 2024 10:00:00 GMT',
+        )
+        mock_parse_rss.assert_not_called()
+
+        podcast.refresh_from_db()
+        self.assertEqual(podcast.rss_status, 304)
+        self.assertEqual(podcast.rss_etag, '"abc"')
+        self.assertEqual(
+            podcast.rss_last_modified,
+            'Mon, 01 Jan 2024 10:00:00 GMT',
+        )
+        self.assertIsNotNone(podcast.rss_checked)
+        self.assertFalse(PodcastEpisode.objects.exists())
+
+    def test_permanent_redirect(self):
+        podcast = Podcast.objects.create(title='Example', rss=RSS_URL)
+        moved_url = 'https://cdn.example.com/feed.rss'
+        temporary_url = 'https://cdn2.example.com/feed.rss'
+
+        with patch('h5media.actions.podcast_actions.get') as mock_get:
+            mock_get.return_value = build_response(
+                temporary_url,
+                200,
+                build_rss(1),
+                headers={'ETag': '"def"'},
+                history=[
+                    build_response(RSS_URL, 301),
+                    build_response(moved_url, 302),
+                ],
+            )
+            self.assertEqual(
+                RefreshResult.UPDATED,
+                refresh_podcast(podcast),
+            )
+
+        podcast.refresh_from_db()
+        self.assertEqual(podcast.rss, moved_url)
+        self.assertEqual(podcast.rss_final_url, temporary_url)
+        self.assertEqual(podcast.rss_etag, '"def"')
+        self.assertEqual(podcast.rss_status, 200)
+        self.assertEqual(podcast.episodes.count(), 1)
+
+    @override_settings(MAX_RSS_MB=0.001)
+    def test_refresh_podcast_size_limit(self):
+        podcast = Podcast.objects.create(title='Example', rss=RSS_URL)
+
+        with patch('h5media.actions.podcast_actions.get') as mock_get:
+            mock_get.return_value = build_response(
+                RSS_URL,
+                200,
+                build_rss(100),
+            )
+            with self.assertRaises(DownloadException):
+                refresh_podcast(podcast)
+
+        self.assertEqual(0, PodcastEpisode.objects.count())
+
+    @override_settings(RSS_STOP_AFTER_KNOWN_ITEMS=3)
+    def test_streamed(self):
+        podcast = Podcast.objects.create(title='Example', rss=RSS_URL)
+        content = build_rss(50)
+
+        with patch('h5media.actions.podcast_actions.get') as mock_get:
+            response, read_chunks = build_chunked_response(RSS_URL, content)
+            mock_get.return_value = response
+            self.assertEqual(RefreshResult.UPDATED, refresh_podcast(podcast))
+        self.assertEqual(content, b''.join(read_chunks))
+        self.assertEqual(50, podcast.episodes.count())
+        self.assertEqual(hash_rss(content), podcast.rss_hash)
+
+        # The rest of the file isn't downloaded once the known episodes
+        # are reached, so its digest is unknown
+        with patch('h5media.actions.podcast_actions.get') as mock_get:
+            response, read_chunks = build_chunked_response(RSS_URL, content)
+            mock_get.return_value = response
+            self.assertEqual(RefreshResult.UPDATED, refresh_podcast(podcast))
+        self.assertLess(len(read_chunks), len(content) / 100 / 2)
+        self.assertEqual('', podcast.rss_hash)
+
+    def test_store_feed_response_unchanged(self):
+        podcast = Podcast.objects.create(title='Example', rss=RSS_URL)
+        content = build_rss(2)
+
+        def store() -> RefreshResult:
+            return store_feed_response(
+                podcast,
+                FeedResponse(url=RSS_URL, status=200, content=content),
+            )
+
+        self.assertEqual(RefreshResult.UPDATED, store())
+        self.assertEqual(hash_rss(content), podcast.rss_hash)
+        with patch('h5media.actions.podcast_actions.parse_rss') as mock_parse:
+            self.assertEqual(RefreshResult.UNCHANGED, store())
+        mock_parse.assert_not_called()
 
 
 class RssHandlerTest(TestCase):
 
     def test_stack_ends_with(self):
         self.fail()
-
-
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import TestCase
+
+from h5media.actions.podcast_schedule import (
+    MAX_CHECK_INTERVAL,
+    MIN_CHECK_INTERVAL,
+    get_check_interval,
+    get_due_podcasts,
+    set_next_check,
+)
+from h5media.models import Podcast, PodcastEpisode
+
+
+CURRENT_TIME = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+
+
+def get_pub_dates(gap: timedelta, count: int = 10) -> list:
+    return [CURRENT_TIME - gap * i for i in range(count)]
+
+
+class PodcastScheduleTest(TestCase):
+
+    def test_get_check_interval(self):
+        podcast = Podcast(title='Example')
+
+        self.assertEqual(
+            MIN_CHECK_INTERVAL,
+            get_check_interval(
+                podcast,
+                get_pub_dates(timedelta(days=1)),
+                CURRENT_TIME,
+            ),
+        )
+        self.assertEqual(
+            timedelta(hours=7),
+            get_check_interval(
+                podcast,
+                get_pub_dates(timedelta(days=7)),
+                CURRENT_TIME,
+            ),
+        )
+
+        dormant_pub_dates = [
+            pub_date - timedelta(days=100)
+            for pub_date in get_pub_dates(timedelta(days=1))
+        ]
+        self.assertEqual(
+            MAX_CHECK_INTERVAL,
+            get_check_interval(podcast, dormant_pub_dates, CURRENT_TIME),
+        )
+
+        podcast.rss_unchanged_count = 24
+        self.assertEqual(
+            timedelta(hours=14),
+            get_check_interval(
+                podcast,
+                get_pub_dates(timedelta(days=7)),
+                CURRENT_TIME,
+            ),
+        )
+
+    def test_set_next_check(self):
+        podcast = Podcast.objects.create(title='Example', rss_unchanged_count=3)
+        for pub_date in get_pub_dates(timedelta(days=1), 3):
+            PodcastEpisode.objects.create(
+                podcast=podcast,
+                url=f'https://example.com/{pub_date.day}.mp3',
+                pub_date=pub_date,
+            )
+        self.assertIn(podcast, get_due_podcasts())
+
+        podcast.save(update_fields=set_next_check(podcast, True))
+
+        self.assertEqual(0, podcast.rss_unchanged_count)
+        self.assertIsNotNone(podcast.rss_next_check)
+        self.assertNotIn(podcast, get_due_podcasts())
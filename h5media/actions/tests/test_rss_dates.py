@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import SimpleTestCase
+
+from h5media.actions.rss_dates import parse_rss_date
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class ParseRssDateTest(SimpleTestCase):
+
+    def test_parse_rss_date(self):
+        eastern = timezone(timedelta(hours=-5))
+        test_sets = (
+            ('Mon, 01 Jan 2024 10:00:00 +0000', utc(2024, 1, 1, 10)),
+            ('Mon, 1 Jan 2024 10:00:00 GMT', utc(2024, 1, 1, 10)),
+            ('Mon, 01 Jan 2024 10:00 GMT', utc(2024, 1, 1, 10)),
+            ('01 Jan 2024 10:00:00 UT', utc(2024, 1, 1, 10)),
+            ('Mon, 01 January 2024 10:00:00', utc(2024, 1, 1, 10)),
+            ('Mon 01 Jan 24 10:00:05 Z', utc(2024, 1, 1, 10, 0, 5)),
+            (
+                'Mon, 01 Jan 2024 10:00:00 EST',
+                datetime(2024, 1, 1, 10, tzinfo=eastern),
+            ),
+            (
+                'Mon, 01 Jan 2024 10:00:00 -05:00',
+                datetime(2024, 1, 1, 10, tzinfo=eastern),
+            ),
+            ('2024-01-01T10:00:00Z', utc(2024, 1, 1, 10)),
+            ('2024-01-01 10:00:00.123+00:00', utc(2024, 1, 1, 10)),
+            ('2024-01-01', utc(2024, 1, 1)),
+            ('Mon, 31 Feb 2024 10:00:00 GMT', None),
+            ('Mon, 01 Foo 2024 10:00:00 GMT', None),
+            ('yesterday', None),
+            ('', None),
+        )
+        for text, expected in test_sets:
+            with self.subTest(text=text):
+                self.assertEqual(expected, parse_rss_date(text))
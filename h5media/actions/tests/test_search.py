@@ -0,0 +1,131 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from h5media.actions.search import (
+    build_match_query,
+    search_episodes,
+    search_podcasts,
+)
+from h5media.models import Podcast, PodcastEpisode
+from h5media.tests.test_utilities import create_user
+from h5media.views import PodcastSearchView
+
+
+class BuildMatchQueryTest(TestCase):
+
+    def test_build_match_query(self):
+        for search, expected in (
+                ('', ''),
+                ('"*', ''),
+                ('django', '"django"*'),
+                ('Talk "Python" OR', '"Talk" "Python" "OR"'),
+                ('talk pyt', '"talk" "pyt"*'),
+        ):
+            with self.subTest(search=search):
+                self.assertEqual(expected, build_match_query(search))
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        self.python = Podcast.objects.create(
+            title='Talk Python',
+            rss='https://example.com/python',
+            description='Interviews about <b>software</b>',
+        )
+        self.science = Podcast.objects.create(
+            title='Science Weekly',
+            rss='https://example.com/science',
+            description='Sometimes about python snakes',
+        )
+        PodcastEpisode.objects.bulk_create([
+            PodcastEpisode(
+                podcast=self.python,
+                title='Django deployments',
+                url='https://example.com/python/1.mp3',
+                description='Running web apps',
+            ),
+            PodcastEpisode(
+                podcast=self.science,
+                title='Reptiles',
+                url='https://example.com/science/1.mp3',
+                description='Pythons and other snakes of the world',
+            ),
+        ])
+
+    def test_podcasts_ranked(self):
+        podcasts = search_podcasts('python')
+        self.assertEqual([self.python, self.science], podcasts)
+        self.assertIn('<mark>python</mark>', podcasts[1].search_snippet)
+        self.assertEqual([], search_podcasts('!!!'))
+
+    def test_snippets_escaped(self):
+        podcast, = search_podcasts('software')
+        self.assertIn(
+            '&lt;b&gt;<mark>software</mark>&lt;/b&gt;',
+            podcast.search_snippet,
+        )
+
+    def test_episodes(self):
+        episode, = search_episodes('snake')
+        self.assertEqual('Reptiles', episode.title)
+        self.assertEqual('Science Weekly', episode.podcast.title)
+
+        # Words that start with the last word match
+        self.assertEqual(
+            ['Django deployments'],
+            [episode.title for episode in search_episodes('dep')],
+        )
+
+    def test_kept_in_sync(self):
+        episode = PodcastEpisode.objects.get(title='Reptiles')
+        episode.title = 'Amphibians'
+        episode.description = 'Frogs'
+        episode.save()
+        self.assertEqual([], search_episodes('snakes'))
+        self.assertEqual([episode], search_episodes('amphibians'))
+        self.assertEqual([episode], search_episodes('frogs'))
+
+        self.python.title = 'Talk Rust'
+        self.python.save()
+        self.assertEqual([self.python], search_podcasts('rust'))
+
+        episode.delete()
+        self.assertEqual([], search_episodes('frogs'))
+        self.science.delete()
+        self.assertEqual([], search_podcasts('weekly'))
+
+    def test_like_fallback(self):
+        with patch(
+                'h5media.actions.search.has_fts_table',
+                return_value=False,
+        ):
+            podcasts = search_podcasts('python')
+            episodes = search_episodes('snakes world')
+        self.assertEqual([self.python, self.science], podcasts)
+        self.assertEqual(
+            'Sometimes about python snakes',
+            podcasts[1].search_snippet,
+        )
+        self.assertEqual(['Reptiles'], [episode.title for episode in episodes])
+
+    def test_view(self):
+        user = create_user()
+        self.science.subscribers.add(user)
+        context = PodcastSearchView.get_context_data_inner(
+            {},
+            'python',
+            user,
+        )
+        self.assertEqual(
+            [(self.python, False), (self.science, True)],
+            [
+                (podcast, podcast.subscribed)
+                for podcast in context['podcasts']
+            ],
+        )
+        self.assertEqual(
+            ['Reptiles'],
+            [episode.title for episode in context['episodes']],
+        )
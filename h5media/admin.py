@@ -6,6 +6,7 @@ from h5media.models import (
     AlbumTrack,
     Audiobook,
     AudiobookChapter,
+    LibrarySource,
     MediaFile,
     PlayList,
     Podcast,
@@ -53,12 +54,22 @@ class AudiobookChapterAdmin(ModelAdmin):
     )
 
 
+@register(LibrarySource)
+class LibrarySourceAdmin(ModelAdmin):
+    list_display = (
+        'pk',
+        'path',
+        'synced',
+    )
+
+
 @register(MediaFile)
 class MediaFileAdmin(ModelAdmin):
     list_display = (
         'pk',
         'title',
         'type',
+        'missing_since',
     )
 
 
@@ -0,0 +1,98 @@
+"""Micro-benchmark comparing parse_rss_date() with the strptime() loop it
+replaced.  Run with:
+
+    python -m h5media.benchmarks.rss_dates
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
+from json import dumps
+from timeit import timeit
+from typing import List
+
+from h5media.actions.rss_dates import parse_rss_date
+
+
+STRPTIME_FORMATS = [
+    "%a, %d %b %Y %H:%M:%S %z",
+    "%a, %d %b %Y %H:%M:%S %Z",
+]
+
+
+def parse_with_strptime(text: str):
+    pub_date = None
+    for date_format in STRPTIME_FORMATS:
+        try:
+            pub_date = datetime.strptime(text, date_format)
+        except ValueError:
+            pass
+    return pub_date
+
+
+def build_dates(count: int, distinct: int) -> List[str]:
+    """Returns count dates in the formats seen in feeds.  Only distinct of
+    them are different since feeds often repeat the same date."""
+    start = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+    formats = (
+        "%a, %d %b %Y %H:%M:%S +0000",
+        "%a, %d %b %Y %H:%M:%S GMT",
+        "%a, %d %b %Y %H:%M GMT",
+        "%Y-%m-%dT%H:%M:%SZ",
+    )
+    return [
+        (start - timedelta(hours=i % distinct)).strftime(
+            formats[i % len(formats)]
+        )
+        for i in range(count)
+    ]
+
+
+def run_benchmark(count: int, distinct: int, repeat: int) -> dict:
+    dates = build_dates(count, distinct)
+
+    def parse_all(parse):
+        for text in dates:
+            parse(text)
+
+    def parse_all_uncached():
+        parse_rss_date.cache_clear()
+        parse_all(parse_rss_date)
+
+    results = {
+        'dates': count,
+        'distinct_dates': distinct,
+        'strptime_seconds': timeit(
+            lambda: parse_all(parse_with_strptime),
+            number=repeat,
+        ) / repeat,
+        'parse_rss_date_seconds': timeit(
+            parse_all_uncached,
+            number=repeat,
+        ) / repeat,
+        'parse_rss_date_uncached_seconds': timeit(
+            lambda: parse_all(parse_rss_date.__wrapped__),
+            number=repeat,
+        ) / repeat,
+    }
+    results['speedup'] = (
+        results['strptime_seconds'] / results['parse_rss_date_seconds']
+    )
+    return results
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=10_000)
+    parser.add_argument('--distinct', type=int, default=1_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(
+        dumps(
+            run_benchmark(args.count, args.distinct, args.repeat),
+            indent=2,
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
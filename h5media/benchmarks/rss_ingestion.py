@@ -0,0 +1,229 @@
+"""Benchmark of loading podcast episodes from rss files.  Synthetic feeds of
+different sizes are generated with Faker and loaded into a temporary
+database.  Run with:
+
+    python -m h5media.benchmarks.rss_ingestion --items 100 1000 10000
+
+The results are printed (or written to --output) as JSON so runs can be
+compared across commits.
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
+from json import dumps
+from os import environ
+from platform import python_version
+from subprocess import CalledProcessError, check_output
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+from typing import Any, Callable, Iterator, List
+from xml.sax.saxutils import escape, quoteattr
+
+from faker import Faker
+
+
+DATE_FORMATS = (
+    "%a, %d %b %Y %H:%M:%S +0000",
+    "%a, %d %b %Y %H:%M:%S GMT",
+    "%a, %-d %b %Y %H:%M GMT",
+    "%Y-%m-%dT%H:%M:%SZ",
+)
+
+
+def build_rss(
+        faker: Faker,
+        host: str,
+        item_count: int,
+        description_chars: int,
+) -> bytes:
+    """Returns an rss file with item_count items, newest first.  The lengths
+    of the item descriptions vary up to description_chars."""
+    newest = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0">\n'
+        '<channel>\n'
+        f'<title>{escape(host)} {escape(faker.catch_phrase())}</title>\n'
+        f'<link>https://{host}/</link>\n'
+        f'<description>{escape(faker.paragraph())}</description>\n'
+        f'<lastBuildDate>{newest:%a, %d %b %Y %H:%M:%S +0000}</lastBuildDate>\n'
+    ]
+    for i in range(item_count):
+        pub_date = newest - timedelta(days=i)
+        description = faker.text(
+            max_nb_chars=max(5, faker.random_int(0, description_chars))
+        )
+        url = quoteattr(f'https://{host}/episodes/{i}.mp3')
+        parts.append(
+            '<item>\n'
+            f'<title>{escape(faker.sentence())}</title>\n'
+            f'<description>{escape(description)}</description>\n'
+            f'<pubDate>{pub_date.strftime(DATE_FORMATS[i % 4])}</pubDate>\n'
+            f'<guid>{faker.uuid4()}</guid>\n'
+            f'<enclosure url={url} length="{faker.random_int()}" '
+            f'type="audio/mpeg"/>\n'
+            '</item>\n'
+        )
+    parts.append('</channel>\n</rss>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def iter_chunks(content: bytes, chunk_size: int) -> Iterator[bytes]:
+    for start_index in range(0, len(content), chunk_size):
+        yield content[start_index:start_index + chunk_size]
+
+
+def measure(load: Callable[[], Any]) -> dict:
+    """Times load, which returns the RssHandler of the parse.  The rate is of
+    the items parsed, which is fewer than the feed's items when parsing
+    stopped at known episodes."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as context:
+        start_time = perf_counter()
+        handler = load()
+        seconds = perf_counter() - start_time
+    return {
+        'seconds': round(seconds, 4),
+        'items_parsed': handler.item_count,
+        'items_per_second': round(handler.item_count / seconds, 1),
+        'queries': len(context.captured_queries),
+    }
+
+
+def measure_peak_memory(load: Callable[[], None]) -> float:
+    """Peak memory allocated by Python in MB.  Measured on a separate load
+    since tracing slows everything down."""
+    start()
+    try:
+        load()
+        _, peak = get_traced_memory()
+    finally:
+        stop()
+    return round(peak / 2**20, 2)
+
+
+def run_benchmark(
+        item_counts: List[int],
+        description_chars: int,
+        seed: int,
+) -> List[dict]:
+    from h5media.actions.podcast_actions import CHUNK_SIZE, parse_rss
+
+    faker = Faker()
+    Faker.seed(seed)
+
+    results = []
+    for item_count in item_counts:
+        content = build_rss(
+            faker,
+            f'feed-{item_count}.example.com',
+            item_count,
+            description_chars,
+        )
+        rss_url = f'https://feed-{item_count}.example.com/rss'
+
+        def load(url: str = rss_url, full_rescan: bool = False):
+            return parse_rss(
+                url,
+                iter_chunks(content, CHUNK_SIZE),
+                full_rescan,
+            )
+
+        memory_content = content.replace(
+            b'feed-',
+            b'memory-feed-',
+        )
+
+        def load_for_memory():
+            parse_rss(
+                f'https://memory-feed-{item_count}.example.com/rss',
+                iter_chunks(memory_content, CHUNK_SIZE),
+            )
+
+        results.append({
+            'items': item_count,
+            'bytes': len(content),
+            'import': measure(load),
+            'refresh': measure(load),
+            'full_rescan': measure(lambda: load(full_rescan=True)),
+            'import_peak_memory_mb': measure_peak_memory(load_for_memory),
+        })
+    return results
+
+
+def get_commit() -> str:
+    try:
+        return check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            text=True,
+        ).strip()
+    except (CalledProcessError, OSError):
+        return ''
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--items',
+        type=int,
+        nargs='+',
+        default=[100, 1_000, 10_000],
+        help='Number of items in each generated feed (100 to 50,000)',
+    )
+    parser.add_argument(
+        '--description-chars',
+        type=int,
+        default=2_000,
+        help='Maximum length of the item descriptions',
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='File the JSON is written to')
+    args = parser.parse_args()
+
+    environ.setdefault('DJANGO_SETTINGS_MODULE', 'h5media.settings')
+    from django import setup
+    setup()
+
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=0,
+        autoclobber=True,
+        serialize=False,
+    )
+    try:
+        results = run_benchmark(
+            args.items,
+            args.description_chars,
+            args.seed,
+        )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    report = dumps(
+        {
+            'benchmark': 'rss_ingestion',
+            'commit': get_commit(),
+            'python': python_version(),
+            'time': datetime.now(timezone.utc).isoformat(),
+            'results': results,
+        },
+        indent=2,
+    )
+    if args.output:
+        with open(args.output, 'w') as out_file:
+            out_file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
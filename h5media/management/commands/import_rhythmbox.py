@@ -1,15 +1,57 @@
 
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Iterator, Optional
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 from urllib.parse import unquote, urlparse
 from xml.etree import ElementTree as ET
 from xml.etree.ElementTree import Element
 
 
 from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+from django.utils.timezone import now
 
-from h5media.models import Album, AlbumTrack, MediaFile
+from h5media.models import (
+    Album,
+    AlbumTrack,
+    LibrarySource,
+    MediaFile,
+    Podcast,
+    PodcastEpisode,
+    SkippedSaves,
+    count_skipped_saves,
+)
+from h5media.url_keys import normalize_url
+
+
+# Number of songs imported between progress lines
+PROGRESS_INTERVAL = 5000
+
+# Number of songs written to the database at a time
+BATCH_SIZE = 2000
+
+# Fields of existing podcasts and episodes updated from rhythmdb.xml
+PODCAST_UPDATE_FIELDS = ('title', 'description')
+
+EPISODE_UPDATE_FIELDS = (
+    'podcast',
+    'title',
+    'pub_date',
+    'description',
+    'file_path',
+)
 
 
 @dataclass
@@ -19,14 +61,96 @@ class SongEntry:
     location: Path
     disc: int
     track: int
+    # Seconds since the epoch, 0 when the entry doesn't have them
+    mtime: int = 0
+    last_seen: int = 0
+
+    @property
+    def modified(self) -> int:
+        return max(self.mtime, self.last_seen)
+
+
+def get_rhythmbox_file_path(
+        user_home_dir: str,
+        file_path: str,
+        option: str,
+        file_name: str,
+) -> Path:
+    """Returns the path of a Rhythmbox file given either the user's home
+    directory or the path of the file itself (passed with option)"""
+
+    if not any([user_home_dir, file_path]):
+        raise ValueError(
+            f'Please provide either --user-home-dir or {option}',
+        )
+
+    if all([user_home_dir, file_path]):
+        raise ValueError(
+            f'Please provide either --user-home-dir or {option}, not both',
+        )
+
+    if file_path:
+        return Path(file_path)
+
+    user_home_dir = Path(user_home_dir)
+    if not user_home_dir.exists():
+        raise ValueError(
+            f'User home directory {user_home_dir} does not exist',
+        )
+
+    rhythmdb_dir = user_home_dir / '.local/share/rhythmbox/'
+    if not rhythmdb_dir.exists():
+        raise ValueError(
+            f'Rhythmbox directory {rhythmdb_dir} does not exist',
+        )
+
+    return rhythmdb_dir / file_name
+
+
+def get_location_path(location: str) -> Path:
+    """Converts the file:// url Rhythmbox uses for locations to a path"""
+    if location.startswith('file://'):
+        parsed_url = urlparse(location)
+        location = unquote(parsed_url.path)
+    return Path(location)
+
+
+@dataclass
+class PodcastFeedEntry:
+    title: str
+    rss: str
+    description: str
+
+
+@dataclass
+class PodcastPostEntry:
+    title: str
+    # Title of the feed the post belongs to
+    podcast_title: str
+    url: str
+    pub_date: Optional[datetime]
+    description: str
+    # Local copy of the post if Rhythmbox downloaded it
+    file_path: str
+
+
+class TrackValues(NamedTuple):
+    pk: int
+    title: str
+    album_id: Optional[int]
+    disc: int
+    track: int
+    source_id: Optional[int]
+    missing: bool
 
 
 class ImportRhythmBoxCommand(BaseCommand):
-    """Import albums, tracks(songs) from rhythmdb.xml. I may also be able to
-    pull podcasts and their episodes from rhythmdb.xml. There is also a
-    playlists.xml file.  These files may be found in ~/.local/share/rhythmbox/"""
+    """Import albums, tracks(songs) and optionally podcasts and their
+    episodes from rhythmdb.xml.  Playlists are imported from playlists.xml by
+    import_rhythmbox_playlists.  These files may be found in
+    ~/.local/share/rhythmbox/"""
 
-    help = 'Imports songs and albums from rhythmdb.xml'
+    help = 'Imports songs, albums and podcasts from rhythmdb.xml'
 
     def __init__(
             self,
@@ -37,6 +161,17 @@ class ImportRhythmBoxCommand(BaseCommand):
     ):
         super().__init__(stdout, stderr, no_color, force_color)
         self.albums: Dict[str, Album] = {}
+        # Values of the tracks in the database keyed by file_path
+        self.tracks: Dict[str, TrackValues] = {}
+        self.song_entries: Dict[str, SongEntry] = {}
+        self.source: Optional[LibrarySource] = None
+        self.parse_failed = False
+        self.created_count = 0
+        self.updated_count = 0
+        self.unchanged_count = 0
+        self.skipped_count = 0
+        self.skipped_saves = SkippedSaves()
+        self.podcast_feed_entries: List[PodcastFeedEntry] = []
 
     def add_arguments(self, parser):
         ...
@@ -50,9 +185,23 @@ class ImportRhythmBoxCommand(BaseCommand):
             type=str,
             help='Path to rhythmdb.xml file'
         )
+        parser.add_argument(
+            '-s', '--sync',
+            action='store_true',
+            help='Only import the entries changed since the last import of '
+                 'the file.  Does nothing if the file itself is unchanged.',
+        )
+        parser.add_argument(
+            '-p', '--podcasts',
+            action='store_true',
+            help='Also import the podcasts and their episodes',
+        )
 
     def handle(self, *args, **options):
+        with count_skipped_saves() as self.skipped_saves:
+            self.import_library(options)
 
+    def import_library(self, options: Dict[str, Any]) -> None:
         user_home_dir = options.get('user_home_dir') or ''
         rhythmdb_xml = options.get('rhythmdb_xml') or ''
 
@@ -70,43 +219,78 @@ class ImportRhythmBoxCommand(BaseCommand):
             )
             return
 
-        for song_entry in self.get_song_entries(rhythmdb_xml_path):
-            self.process_entry(song_entry)
-
-        #
-        #         # 1. Create or get Album
-        #         album = None
-        #         if album_name:
-        #             album, created = Album.objects.get_or_create(title=album_name)
-        #
-        #         # 2. Create AlbumTrack (which inherits from MediaFile)
-        #         # Note: AlbumTrack inherits from MediaFile, but MediaFile is not abstract in models.py
-        #         # class AlbumTrack(MediaFile): ...
-        #
-        #         # Check if it already exists by location (file_path)
-        #         # Since MediaFile has file_path, and AlbumTrack inherits it.
-        #
-        #         track = AlbumTrack.objects.filter(file_path=file_path).first()
-        #         if not track:
-        #             track = AlbumTrack(
-        #                 title=title,
-        #                 file_path=file_path,
-        #                 type=MediaFile.TYPE_ALBUM_TRACK,
-        #                 album=album
-        #             )
-        #             track.save()
-        #             self.stdout.write(self.style.SUCCESS(f'Imported: {title}'))
-        #         else:
-        #             # Update if necessary
-        #             track.title = title
-        #             track.album = album
-        #             track.save()
-        #             self.stdout.write(f'Updated: {title}')
-        #
-        #     except Exception as e:
-        #         self.stdout.write(self.style.ERROR(f'Error importing entry: {e}'))
-        #
-        # self.stdout.write(self.style.SUCCESS('Import completed'))
+        sync = options.get('sync', False)
+        self.source, _ = LibrarySource.objects.get_or_create(
+            path=str(rhythmdb_xml_path.resolve()),
+        )
+        file_mtime = rhythmdb_xml_path.stat().st_mtime
+        if sync and self.source.file_mtime == file_mtime:
+            self.stdout.write(f'{rhythmdb_xml_path} unchanged since last sync')
+            return
+
+        self.load_library()
+
+        # Entries not modified since the last import are skipped when
+        # syncing but their locations are still recorded so that tracks
+        # missing from the file can be found.  Entries from the same second
+        # as the newest one seen are read again since more may have been
+        # modified in that second after the import, re-reading an unchanged
+        # entry writes nothing.
+        watermark = self.source.watermark if sync else 0
+        new_watermark = self.source.watermark
+        seen_paths: Set[str] = set()
+
+        builders: Dict[str, Callable[[Element], Any]] = {
+            'song': self.build_song_entry,
+        }
+        if options.get('podcasts'):
+            # There are few enough feeds to keep in memory until all are
+            # read, the episodes are read by a second pass
+            builders['podcast-feed'] = self.build_podcast_feed_entry
+
+        count = 0
+        start_time = perf_counter()
+        for song_entry in self.get_entries(rhythmdb_xml_path, builders):
+            if isinstance(song_entry, PodcastFeedEntry):
+                self.podcast_feed_entries.append(song_entry)
+                continue
+            count += 1
+            seen_paths.add(str(song_entry.location))
+            modified = song_entry.modified
+            new_watermark = max(new_watermark, modified)
+            if modified and modified < watermark:
+                self.skipped_count += 1
+            else:
+                self.process_entry(song_entry)
+            if count % PROGRESS_INTERVAL == 0:
+                self.write_progress(count, start_time)
+        self.save_batch()
+        self.write_progress(count, start_time)
+
+        if self.parse_failed:
+            # Tracks after the error weren't seen so nothing can be marked
+            # missing and the file will be imported again next time
+            return
+
+        missing_count = self.mark_missing(seen_paths)
+        if options.get('podcasts'):
+            self.import_podcasts(rhythmdb_xml_path)
+            if self.parse_failed:
+                return
+
+        self.source.file_mtime = file_mtime
+        self.source.watermark = new_watermark
+        self.source.synced = now()
+        self.source.save()
+
+        self.stdout.write(
+            f'{self.created_count} tracks created, '
+            f'{self.updated_count} updated, '
+            f'{self.unchanged_count} unchanged, '
+            f'{self.skipped_count} skipped, '
+            f'{missing_count} missing, '
+            f'{self.skipped_saves.count} unchanged saves skipped'
+        )
 
 
     def write_error(self, message):
@@ -117,57 +301,100 @@ class ImportRhythmBoxCommand(BaseCommand):
             user_home_dir: str,
             rhythmdb_xml: str,
     ) -> Path:
-
-        if not any([user_home_dir, rhythmdb_xml]):
-            raise ValueError(
-                'Please provide either --user-home-dir or --rhythmdb-xml',
-            )
-
-        if all([user_home_dir, rhythmdb_xml]):
-            raise ValueError(
-                'Please provide either --user-home-dir or --rhythmdb-xml, not both',
-            )
-
-        if rhythmdb_xml:
-            return Path(rhythmdb_xml)
-
-        user_home_dir = Path(user_home_dir)
-        if not user_home_dir.exists():
-            raise ValueError(
-                f'User home directory {user_home_dir} does not exist',
-            )
-
-        rhythmdb_dir = user_home_dir / '.local/share/rhythmbox/'
-        if not rhythmdb_dir.exists():
-            raise ValueError(
-                f'Rhythmbox directory {rhythmdb_dir} does not exist',
-            )
-
-        return rhythmdb_dir / 'rhythmdb.xml'
+        return get_rhythmbox_file_path(
+            user_home_dir,
+            rhythmdb_xml,
+            '--rhythmdb-xml',
+            'rhythmdb.xml',
+        )
 
     def get_song_entries(self, rhythmdb_xml: Path) -> Iterator[SongEntry]:
+        return self.get_entries(
+            rhythmdb_xml,
+            {'song': self.build_song_entry},
+        )
+
+    def get_entries(
+            self,
+            rhythmdb_xml: Path,
+            builders: Dict[str, Callable[[Element], Any]],
+    ) -> Iterator[Any]:
+        """Streams the entries of rhythmdb.xml whose types are in builders,
+        converted by the builder for their type.  Each entry is cleared once
+        it has been read so memory use doesn't grow with the size of the
+        library."""
         try:
-            tree = ET.parse(rhythmdb_xml)
-            root = tree.getroot()
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error parsing XML: {e}'))
-            return
+            root: Optional[Element] = None
+            for event, element in ET.iterparse(
+                    rhythmdb_xml,
+                    events=('start', 'end'),
+            ):
+                if event == 'start':
+                    if root is None:
+                        root = element
+                    continue
+                if element.tag != 'entry':
+                    continue
+
+                builder = builders.get(element.get('type'))
+                if builder:
+                    yield builder(element)
+                # Dropping the entries already read from the root keeps it
+                # from holding on to empty elements
+                element.clear()
+                root.clear()
+        except ET.ParseError as e:
+            self.parse_failed = True
+            self.write_error(f'Error parsing XML: {e}')
+
+    def build_song_entry(self, entry: Element) -> SongEntry:
+        title = self.get_element_text(entry, 'title', 'Unknown')
+        album_name = self.get_element_text(entry, 'album')
+        location = self.get_element_text(entry, 'location', '')
+        disc = self.get_element_text(entry, 'disc-number', '1')
+        track = self.get_element_text(entry, 'track-number', '1')
+        mtime = self.get_element_text(entry, 'mtime', '0')
+        last_seen = self.get_element_text(entry, 'last-seen', '0')
+
+        return SongEntry(
+            title,
+            album_name,
+            get_location_path(location),
+            int(disc),
+            int(track),
+            int(mtime),
+            int(last_seen),
+        )
 
-        for i, entry in enumerate(root.findall("entry[@type='song']"), 1):
-            title = self.get_element_text(entry, 'title', 'Unknown')
-            album_name = self.get_element_text(entry, 'album')
-            location = self.get_element_text(entry, 'location', '')
-            disc = self.get_element_text(entry, 'disc-number', '1')
-            track = self.get_element_text(entry, 'track-number', '1')
-            print(disc, track)
+    def build_podcast_feed_entry(self, entry: Element) -> PodcastFeedEntry:
+        return PodcastFeedEntry(
+            self.get_element_text(entry, 'title', ''),
+            self.get_element_text(entry, 'location', ''),
+            self.get_element_text(entry, 'description', ''),
+        )
 
-            # Convert file:// URL to local path
-            if location.startswith('file://'):
-                parsed_url = urlparse(location)
-                location = unquote(parsed_url.path)
-            location = Path(location)
+    def build_podcast_post_entry(self, entry: Element) -> PodcastPostEntry:
+        post_time = int(self.get_element_text(entry, 'post-time', '0'))
+        mountpoint = self.get_element_text(entry, 'mountpoint', '')
+        return PodcastPostEntry(
+            self.get_element_text(entry, 'title', ''),
+            self.get_element_text(entry, 'album', ''),
+            self.get_element_text(entry, 'location', ''),
+            (
+                datetime.fromtimestamp(post_time, timezone.utc)
+                if post_time > 0
+                else None
+            ),
+            self.get_element_text(entry, 'description', ''),
+            str(get_location_path(mountpoint)) if mountpoint else '',
+        )
 
-            yield SongEntry(title, album_name, location, int(disc), int(track))
+    def write_progress(self, count: int, start_time: float) -> None:
+        seconds = perf_counter() - start_time
+        rate = count / seconds if seconds else 0
+        self.stdout.write(
+            f'{count:,} songs in {seconds:.1f}s ({rate:,.0f} songs/s)'
+        )
 
     @staticmethod
     def get_element_text(
@@ -184,25 +411,275 @@ class ImportRhythmBoxCommand(BaseCommand):
             return default
         return element.text or default
 
+    def load_library(self) -> None:
+        """Loads the albums and tracks already in the database so entries
+        can be matched to them without a query per entry"""
+        self.albums = {
+            album.title: album
+            for album in Album.objects.all()
+        }
+        self.tracks = {
+            file_path: TrackValues(*values, missing_since is not None)
+            for file_path, missing_since, *values
+            in AlbumTrack.objects.values_list(
+                'file_path',
+                'missing_since',
+                'pk',
+                'title',
+                'album_id',
+                'disc',
+                'track',
+                'source_id',
+            )
+        }
+
     def process_entry(self, song_entry: SongEntry) -> None:
+        # Keyed by file_path so an entry repeated within a batch is only
+        # written once
+        self.song_entries[str(song_entry.location)] = song_entry
+        if len(self.song_entries) >= BATCH_SIZE:
+            self.save_batch()
+
+    def save_batch(self) -> None:
+        """Writes the batch of entries.  New albums and tracks are inserted
+        in bulk, tracks whose values changed are updated in bulk and
+        unchanged tracks aren't written at all."""
+        song_entries = self.song_entries
+        self.song_entries = {}
+        if not song_entries:
+            return
 
-        album_name: str = song_entry.album_name
-        if not album_name:
-            raise NotImplemented("missing album_name")
+        with atomic():
+            new_albums = [
+                Album(title=album_name)
+                for album_name in sorted({
+                    song_entry.album_name
+                    for song_entry in song_entries.values()
+                    if song_entry.album_name
+                    and song_entry.album_name not in self.albums
+                })
+            ]
+            Album.objects.bulk_create(new_albums, batch_size=BATCH_SIZE)
+            for album in new_albums:
+                self.albums[album.title] = album
+
+            new_tracks: List[AlbumTrack] = []
+            changed_tracks: List[AlbumTrack] = []
+            for file_path, song_entry in song_entries.items():
+                album = self.albums.get(song_entry.album_name)
+                track = AlbumTrack(
+                    title=song_entry.title,
+                    file_path=file_path,
+                    album=album,
+                    disc=song_entry.disc,
+                    track=song_entry.track,
+                    source=self.source,
+                )
+                values = self.tracks.get(file_path)
+                if values is None:
+                    new_tracks.append(track)
+                elif values != self.get_track_values(values.pk, track):
+                    track.pk = values.pk
+                    changed_tracks.append(track)
+                else:
+                    self.unchanged_count += 1
+
+            AlbumTrack.objects.bulk_create(new_tracks, batch_size=BATCH_SIZE)
+            if changed_tracks:
+                AlbumTrack.objects.bulk_update(
+                    changed_tracks,
+                    [
+                        'title',
+                        'album',
+                        'disc',
+                        'track',
+                        'source',
+                        'missing_since',
+                    ],
+                    batch_size=BATCH_SIZE,
+                )
+
+        for track in new_tracks + changed_tracks:
+            self.tracks[track.file_path] = self.get_track_values(
+                track.pk,
+                track,
+            )
+        self.created_count += len(new_tracks)
+        self.updated_count += len(changed_tracks)
 
-        album: Optional[Album] = self.albums.get(album_name)
-        if not album:
-            album = Album.objects.create(title=album_name)
-            self.albums[album_name] = album
+    @staticmethod
+    def get_track_values(pk: int, track: AlbumTrack) -> TrackValues:
+        return TrackValues(
+            pk,
+            track.title,
+            track.album_id,
+            track.disc,
+            track.track,
+            track.source_id,
+            track.missing_since is not None,
+        )
 
-        AlbumTrack.objects.create(
-            title=song_entry.title,
-            album=album,
-            file_path=song_entry.location,
-            disc=song_entry.disc,
-            track=song_entry.track,
+    def mark_missing(self, seen_paths: Set[str]) -> int:
+        """Marks the tracks from this file that are no longer in it as
+        missing and clears the mark from tracks that have come back.  Returns
+        the number of tracks marked missing."""
+        missing_pks = []
+        found_pks = []
+        for file_path, values in self.tracks.items():
+            if file_path in seen_paths:
+                if values.missing:
+                    found_pks.append(values.pk)
+            elif values.source_id == self.source.pk and not values.missing:
+                missing_pks.append(values.pk)
+
+        with atomic():
+            for pks, missing_since in (
+                    (missing_pks, now()),
+                    (found_pks, None),
+            ):
+                for start in range(0, len(pks), BATCH_SIZE):
+                    MediaFile.objects.filter(
+                        pk__in=pks[start:start + BATCH_SIZE],
+                    ).update(
+                        missing_since=missing_since,
+                    )
+        return len(missing_pks)
+
+    def import_podcasts(self, rhythmdb_xml: Path) -> None:
+        """Upserts the podcast feeds read with the songs and then streams
+        the podcast posts into episodes.  Podcasts are matched on their rss
+        url key and episodes on their enclosure url key."""
+        podcasts = self.save_podcasts(self.podcast_feed_entries)
+
+        post_entries: List[PodcastPostEntry] = []
+        created_count = 0
+        updated_count = 0
+        for post_entry in self.get_entries(
+                rhythmdb_xml,
+                {'podcast-post': self.build_podcast_post_entry},
+        ):
+            if post_entry.url and post_entry.podcast_title in podcasts:
+                post_entries.append(post_entry)
+            if len(post_entries) >= BATCH_SIZE:
+                created, updated = self.save_episodes(post_entries, podcasts)
+                created_count += created
+                updated_count += updated
+                post_entries = []
+        created, updated = self.save_episodes(post_entries, podcasts)
+        created_count += created
+        updated_count += updated
+
+        self.stdout.write(
+            f'{len(podcasts)} podcasts, {created_count} episodes created, '
+            f'{updated_count} updated'
         )
 
+    @staticmethod
+    def save_podcasts(
+            feed_entries: List[PodcastFeedEntry],
+    ) -> Dict[str, Podcast]:
+        """Returns the podcasts keyed by the feed titles the posts refer to
+        them by.  A feed whose url isn't known but whose title is already
+        taken is matched to the podcast with that title since titles are
+        unique."""
+        feeds: Dict[str, PodcastFeedEntry] = {
+            normalize_url(feed_entry.rss): feed_entry
+            for feed_entry in feed_entries
+            if feed_entry.rss and feed_entry.title
+        }
+        by_key: Dict[str, Podcast] = {
+            podcast.rss_key: podcast
+            for podcast in Podcast.objects.filter(rss_key__in=list(feeds))
+        }
+        by_title: Dict[str, Podcast] = {
+            podcast.title: podcast
+            for podcast in Podcast.objects.filter(
+                title__in=[feed_entry.title for feed_entry in feeds.values()]
+            )
+        }
+
+        podcasts: Dict[str, Podcast] = {}
+        new_podcasts: List[Podcast] = []
+        changed_podcasts: List[Podcast] = []
+        for key, feed_entry in feeds.items():
+            feed_podcast = Podcast(
+                title=feed_entry.title,
+                rss=feed_entry.rss,
+                description=feed_entry.description,
+            )
+            podcast = by_key.get(key)
+            if podcast:
+                podcast.update(feed_podcast, defer_save=True)
+                if podcast.get_changed_fields() & set(PODCAST_UPDATE_FIELDS):
+                    changed_podcasts.append(podcast)
+                else:
+                    podcast.count_skipped_save()
+            else:
+                podcast = by_title.get(feed_entry.title)
+            if not podcast:
+                podcast = feed_podcast
+                podcast.set_keys()
+                new_podcasts.append(podcast)
+                by_title[podcast.title] = podcast
+            podcasts[feed_entry.title] = podcast
+
+        with atomic():
+            Podcast.objects.bulk_create(new_podcasts, batch_size=BATCH_SIZE)
+            if changed_podcasts:
+                Podcast.objects.bulk_update(
+                    changed_podcasts,
+                    PODCAST_UPDATE_FIELDS,
+                    batch_size=BATCH_SIZE,
+                )
+        return podcasts
+
+    @staticmethod
+    def save_episodes(
+            post_entries: List[PodcastPostEntry],
+            podcasts: Dict[str, Podcast],
+    ) -> Tuple[int, int]:
+        """Upserts a batch of posts with one query to find the existing
+        episodes.  Returns the numbers of episodes created and updated."""
+        episodes: Dict[str, PodcastEpisode] = {}
+        for post_entry in post_entries:
+            episode = PodcastEpisode(
+                podcast=podcasts[post_entry.podcast_title],
+                title=post_entry.title,
+                url=post_entry.url,
+                pub_date=post_entry.pub_date,
+                description=post_entry.description,
+                file_path=post_entry.file_path,
+            )
+            episode.set_keys()
+            episodes[episode.url_key] = episode
+
+        new_episodes: List[PodcastEpisode] = []
+        changed_episodes: List[PodcastEpisode] = []
+        db_episodes = PodcastEpisode.objects.filter(
+            url_key__in=list(episodes),
+        )
+        for db_episode in db_episodes:
+            episode = episodes.pop(db_episode.url_key)
+            db_episode.update(episode, defer_save=True)
+            db_episode.file_path = episode.file_path or db_episode.file_path
+            if db_episode.get_changed_fields() & set(EPISODE_UPDATE_FIELDS):
+                changed_episodes.append(db_episode)
+            else:
+                db_episode.count_skipped_save()
+        new_episodes.extend(episodes.values())
+
+        with atomic():
+            PodcastEpisode.objects.bulk_create(
+                new_episodes,
+                batch_size=BATCH_SIZE,
+            )
+            if changed_episodes:
+                PodcastEpisode.objects.bulk_update(
+                    changed_episodes,
+                    EPISODE_UPDATE_FIELDS,
+                    batch_size=BATCH_SIZE,
+                )
+        return len(new_episodes), len(changed_episodes)
 
 
 Command = ImportRhythmBoxCommand
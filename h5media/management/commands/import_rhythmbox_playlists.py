@@ -0,0 +1,195 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional
+from xml.etree import ElementTree as ET
+from xml.etree.ElementTree import Element
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+
+from h5media.management.commands.import_rhythmbox import (
+    get_location_path,
+    get_rhythmbox_file_path,
+)
+from h5media.models import AlbumTrack, PlayList, PlayListItem
+
+
+# Number of playlist items inserted per query
+BATCH_SIZE = 2000
+
+
+@dataclass
+class PlayListEntry:
+    name: str
+    locations: List[Path] = field(default_factory=list)
+
+
+class ImportRhythmBoxPlayListsCommand(BaseCommand):
+    """Imports the static playlists in Rhythmbox's playlists.xml.  The tracks
+    have to be imported with import_rhythmbox first.  Importing a playlist
+    again replaces the items of the user's playlist with the same title."""
+
+    help = 'Imports playlists from Rhythmbox playlists.xml'
+
+    def __init__(
+            self,
+            stdout=None,
+            stderr=None,
+            no_color=False,
+            force_color=False,
+    ):
+        super().__init__(stdout, stderr, no_color, force_color)
+        # Primary keys of the tracks keyed by file_path
+        self.track_pks: Dict[str, int] = {}
+        self.unresolved_count = 0
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-u', '--user-home-dir',
+            type=str,
+            help="User's home directory",
+        )
+        parser.add_argument(
+            '-p', '--playlists-xml',
+            type=str,
+            help='Path to playlists.xml file'
+        )
+        parser.add_argument(
+            '-o', '--owner',
+            type=str,
+            required=True,
+            help='Username of the owner of the imported playlists',
+        )
+
+    def handle(self, *args, **options):
+
+        user_home_dir = options.get('user_home_dir') or ''
+        playlists_xml = options.get('playlists_xml') or ''
+
+        try:
+            playlists_xml_path = get_rhythmbox_file_path(
+                user_home_dir,
+                playlists_xml,
+                '--playlists-xml',
+                'playlists.xml',
+            )
+        except ValueError as e:
+            self.write_error(str(e))
+            return
+
+        if not playlists_xml_path.exists():
+            self.write_error(
+                f'Rhythmbox XML file {playlists_xml_path} does not exist',
+            )
+            return
+
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            self.write_error(f"User {options['owner']} does not exist")
+            return
+
+        self.track_pks = dict(
+            AlbumTrack.objects.values_list('file_path', 'pk')
+        )
+
+        start_time = perf_counter()
+        playlist_count = 0
+        item_count = 0
+        for playlist_entry in self.get_playlist_entries(playlists_xml_path):
+            item_count += self.save_playlist(owner, playlist_entry)
+            playlist_count += 1
+
+        self.stdout.write(
+            f'{playlist_count} playlists with {item_count} items imported in '
+            f'{perf_counter() - start_time:.1f}s, '
+            f'{self.unresolved_count} locations not found'
+        )
+
+    def write_error(self, message):
+        self.stderr.write(self.style.ERROR(message))
+
+    def get_playlist_entries(
+            self,
+            playlists_xml: Path,
+    ) -> Iterator[PlayListEntry]:
+        """Streams the static playlists.  Automatic playlists are skipped
+        since they are defined by conditions rather than locations."""
+        try:
+            root: Optional[Element] = None
+            playlist_entry: Optional[PlayListEntry] = None
+            for event, element in ET.iterparse(
+                    playlists_xml,
+                    events=('start', 'end'),
+            ):
+                if event == 'start':
+                    if root is None:
+                        root = element
+                    elif (
+                            element.tag == 'playlist'
+                            and element.get('type') == 'static'
+                    ):
+                        playlist_entry = PlayListEntry(
+                            element.get('name') or 'Untitled',
+                        )
+                    continue
+
+                if element.tag == 'location':
+                    if playlist_entry and element.text:
+                        playlist_entry.locations.append(
+                            get_location_path(element.text)
+                        )
+                elif element.tag == 'playlist':
+                    if playlist_entry:
+                        yield playlist_entry
+                    playlist_entry = None
+                    element.clear()
+                    root.clear()
+        except ET.ParseError as e:
+            self.write_error(f'Error parsing XML: {e}')
+
+    def save_playlist(
+            self,
+            owner: User,
+            playlist_entry: PlayListEntry,
+    ) -> int:
+        """Replaces the items of the owner's playlist with the tracks in
+        playlist_entry.  Returns the number of items written."""
+        track_pks = []
+        for location in playlist_entry.locations:
+            track_pk = self.track_pks.get(str(location))
+            if track_pk is None:
+                self.unresolved_count += 1
+            else:
+                track_pks.append(track_pk)
+
+        with atomic():
+            # Titles aren't unique so the owner may already have several
+            # playlists with this one.  The oldest is the one imported.
+            playlist = PlayList.objects.filter(
+                owner=owner,
+                title=playlist_entry.name,
+            ).order_by('pk').first()
+            if playlist is None:
+                playlist = PlayList.objects.create(
+                    owner=owner,
+                    title=playlist_entry.name,
+                )
+            playlist.items.all().delete()
+            PlayListItem.objects.bulk_create(
+                [
+                    PlayListItem(
+                        playlist=playlist,
+                        item_number=item_number,
+                        media_file_id=track_pk,
+                    )
+                    for item_number, track_pk in enumerate(track_pks, 1)
+                ],
+                batch_size=BATCH_SIZE,
+            )
+        return len(track_pks)
+
+
+Command = ImportRhythmBoxPlayListsCommand
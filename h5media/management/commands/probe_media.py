@@ -0,0 +1,81 @@
+from time import monotonic
+
+from django.core.management.base import BaseCommand
+
+from h5media.actions.audio_probe import probe_audio_files
+from h5media.models import MediaFile
+
+
+# Number of files probed and updated at a time
+BATCH_SIZE = 2000
+
+
+class ProbeMediaCommand(BaseCommand):
+    """Fills in the size, duration and bitrate of media files imported
+    without them, e.g. by import_rhythmbox.  Only the headers of the files
+    are read."""
+
+    help = 'Reads the duration and bitrate of media files from their headers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Probe files that already have a duration as well',
+        )
+        parser.add_argument(
+            '-t', '--threads',
+            type=int,
+            default=8,
+            help='Number of files probed at the same time',
+        )
+
+    def handle(self, *args, **options):
+        media_files = MediaFile.objects.exclude(file_path='')
+        if not options['all']:
+            media_files = media_files.filter(duration__isnull=True)
+        media_files = media_files.only('file_path').order_by('pk')
+
+        start_time = monotonic()
+        probed_count = 0
+        updated_count = 0
+        last_pk = 0
+        while True:
+            batch = list(media_files.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            audio_infos = probe_audio_files(
+                [media_file.file_path for media_file in batch],
+                options['threads'],
+            )
+            changed_files = []
+            for media_file in batch:
+                audio_info = audio_infos[media_file.file_path]
+                if audio_info is None:
+                    continue
+                media_file.file_size = audio_info.size
+                media_file.duration = audio_info.duration
+                media_file.bitrate = audio_info.bitrate
+                changed_files.append(media_file)
+            MediaFile.objects.bulk_update(
+                changed_files,
+                ['file_size', 'duration', 'bitrate'],
+            )
+
+            probed_count += len(batch)
+            updated_count += len(changed_files)
+            seconds = monotonic() - start_time
+            self.stdout.write(
+                f'{probed_count:,} files probed in {seconds:.1f}s '
+                f'({probed_count / seconds if seconds else 0:,.0f} files/s)'
+            )
+
+        self.stdout.write(
+            f'{updated_count} updated, '
+            f'{probed_count - updated_count} could not be read'
+        )
+
+
+Command = ProbeMediaCommand
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from h5media.models import QUEUE_ORDER_GAP, Profile, QueueItem
+
+
+class RebalanceQueuesCommand(BaseCommand):
+    """Renumbers the queues that have items crowded together, so inserts
+    and moves don't have to renumber a queue while a user waits.  Meant to
+    be run periodically, e.g. from cron."""
+
+    help = 'Spaces the items of crowded queues apart'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-g', '--min-gap',
+            type=int,
+            default=QUEUE_ORDER_GAP >> 10,
+            help='Rebalance queues with neighbours closer than this',
+        )
+
+    def handle(self, *args, **options):
+        min_gap = options['min_gap']
+        profile_pks = QueueItem.objects.values_list(
+            'profile_id',
+            flat=True,
+        ).distinct()
+
+        checked_count = 0
+        rebalanced_count = 0
+        for profile in Profile.objects.filter(pk__in=profile_pks):
+            checked_count += 1
+            orders = list(
+                profile.queue.order_by('order').values_list('order', flat=True)
+            )
+            if any(
+                    after - before < min_gap
+                    for before, after in zip(orders, orders[1:])
+            ):
+                profile.queue.rebalance()
+                rebalanced_count += 1
+
+        self.stdout.write(
+            f'{rebalanced_count} of {checked_count} queues rebalanced'
+        )
+
+
+Command = RebalanceQueuesCommand
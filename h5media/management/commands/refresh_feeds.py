@@ -0,0 +1,271 @@
+from collections import defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import chain, islice, zip_longest
+from threading import BoundedSemaphore, Lock
+from time import monotonic, sleep
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils.timezone import now
+
+from h5media.actions.podcast_actions import (
+    DownloadException,
+    FeedResponse,
+    RefreshResult,
+    download_rss,
+    store_feed_response,
+)
+from h5media.actions.podcast_schedule import get_due_podcasts, set_next_check
+from h5media.models import Podcast, count_skipped_saves
+
+
+# Downloads requested ahead of the main thread, per worker
+PENDING_PER_WORKER = 2
+
+
+def get_host(url: str) -> str:
+    return (urlparse(url).hostname or '').lower()
+
+
+class HostLimiter:
+    """Limits the number of concurrent requests made to each host and spaces
+    the requests to a host at least delay_seconds apart"""
+
+    def __init__(self, max_per_host: int, delay_seconds: float):
+        self.max_per_host = max_per_host
+        self.delay_seconds = delay_seconds
+        self.lock = Lock()
+        self.semaphores: Dict[str, BoundedSemaphore] = {}
+        self.next_request_times: Dict[str, float] = {}
+
+    @contextmanager
+    def limit(self, url: str) -> Iterator[None]:
+        host = get_host(url)
+        with self.lock:
+            semaphore = self.semaphores.setdefault(
+                host,
+                BoundedSemaphore(self.max_per_host),
+            )
+
+        with semaphore:
+            with self.lock:
+                current_time = monotonic()
+                request_time = max(
+                    current_time,
+                    self.next_request_times.get(host, current_time),
+                )
+                self.next_request_times[host] = (
+                    request_time + self.delay_seconds
+                )
+            sleep(request_time - current_time)
+            yield
+
+
+class RefreshFeedsCommand(BaseCommand):
+    """Refreshes the rss feeds of all podcasts.  Downloads run concurrently
+    in a thread pool sharing one requests.Session while the episodes are
+    written to the database by the main thread as downloads complete.
+
+    The workers only make the requests.  The main thread reads the body of
+    each feed chunk by chunk as it's parsed so the memory used doesn't grow
+    with the size of the feeds.  Only PENDING_PER_WORKER requests per worker
+    are made ahead of the main thread, which bounds the responses held open
+    waiting to be read."""
+
+    help = 'Downloads the rss files of podcasts and loads new episodes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-c', '--concurrency',
+            type=int,
+            default=8,
+            help='Number of feeds downloaded at the same time',
+        )
+        parser.add_argument(
+            '--per-host',
+            type=int,
+            default=2,
+            help='Number of feeds downloaded at the same time from one host',
+        )
+        parser.add_argument(
+            '--host-delay',
+            type=float,
+            default=1.0,
+            help='Minimum seconds between requests to the same host',
+        )
+        parser.add_argument(
+            '--only-stale',
+            action='store_true',
+            help=(
+                f'Only refresh podcasts not checked in the last '
+                f'{settings.RSS_STALE_MINUTES} minutes'
+            ),
+        )
+        parser.add_argument(
+            '--due',
+            action='store_true',
+            help='Only refresh podcasts that are due to be checked',
+        )
+        parser.add_argument(
+            '--full-rescan',
+            action='store_true',
+            help='Read every item of the feeds even if they are known',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the podcasts that would be refreshed',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+
+        podcasts = self.get_podcasts(options['only_stale'], options['due'])
+        if options['dry_run']:
+            for podcast in podcasts:
+                self.stdout.write(f'{podcast.pk} {podcast.rss}')
+            self.stdout.write(f'{len(podcasts)} podcasts would be refreshed')
+            return
+
+        limiter = HostLimiter(
+            max(1, options['per_host']),
+            max(0.0, options['host_delay']),
+        )
+        session = self.build_session(concurrency)
+
+        counts = defaultdict(int)
+        start_time = monotonic()
+        queued_podcasts = iter(podcasts)
+        futures: Dict[Future, Podcast] = {}
+        with count_skipped_saves() as skipped_saves:
+            with session, ThreadPoolExecutor(concurrency) as executor:
+                while True:
+                    for podcast in islice(
+                            queued_podcasts,
+                            PENDING_PER_WORKER * concurrency - len(futures),
+                    ):
+                        future = executor.submit(
+                            self.download,
+                            session,
+                            limiter,
+                            podcast,
+                        )
+                        futures[future] = podcast
+                    if not futures:
+                        break
+
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        podcast = futures.pop(future)
+                        result = self.store(
+                            podcast,
+                            future,
+                            options['full_rescan'],
+                        )
+                        counts[result] += 1
+
+        self.stdout.write(
+            f"{len(podcasts)} podcasts in {monotonic() - start_time:.1f}s: "
+            f"{counts[RefreshResult.UPDATED]} updated, "
+            f"{counts[RefreshResult.NOT_MODIFIED]} not modified, "
+            f"{counts[RefreshResult.UNCHANGED]} unchanged (parsing skipped), "
+            f"{counts[None]} failed, "
+            f"{skipped_saves.count} unchanged saves skipped"
+        )
+
+    @staticmethod
+    def get_podcasts(only_stale: bool, due: bool) -> List[Podcast]:
+        if due:
+            podcasts = get_due_podcasts()
+        else:
+            podcasts = Podcast.objects.all()
+        podcasts = podcasts.exclude(rss='')
+        if only_stale:
+            stale_time = now() - timedelta(minutes=settings.RSS_STALE_MINUTES)
+            podcasts = podcasts.filter(
+                Q(rss_checked__isnull=True) | Q(rss_checked__lt=stale_time)
+            )
+        return RefreshFeedsCommand.interleave_hosts(podcasts.order_by('pk'))
+
+    @staticmethod
+    def interleave_hosts(podcasts) -> List[Podcast]:
+        """Orders the podcasts round-robin by host so the workers in the pool
+        aren't all waiting on the same host"""
+        by_host: Dict[str, List[Podcast]] = defaultdict(list)
+        for podcast in podcasts:
+            by_host[get_host(podcast.rss)].append(podcast)
+        return [
+            podcast
+            for podcast in chain.from_iterable(zip_longest(*by_host.values()))
+            if podcast is not None
+        ]
+
+    @staticmethod
+    def build_session(concurrency: int) -> Session:
+        session = Session()
+        adapter = HTTPAdapter(
+            pool_connections=concurrency,
+            pool_maxsize=concurrency,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @staticmethod
+    def download(
+            session: Session,
+            limiter: HostLimiter,
+            podcast: Podcast,
+    ) -> FeedResponse:
+        """Runs in a worker thread so it mustn't touch the database.  The
+        body is left for the main thread to read."""
+        with limiter.limit(podcast.rss):
+            return download_rss(
+                podcast.rss,
+                etag=podcast.rss_etag,
+                last_modified=podcast.rss_last_modified,
+                stream=True,
+                session=session,
+            )
+
+    def store(
+            self,
+            podcast: Podcast,
+            future: Future,
+            full_rescan: bool,
+    ) -> Optional[RefreshResult]:
+        """Returns None if the podcast couldn't be refreshed"""
+        try:
+            response: FeedResponse = future.result()
+            result = store_feed_response(podcast, response, full_rescan)
+        except DownloadException as error:
+            self.write_error(str(error))
+        except Exception as error:
+            self.write_error(f'{podcast.rss}: {error!r}')
+        else:
+            if result == RefreshResult.UPDATED:
+                self.stdout.write(f'Refreshed {podcast}')
+            return result
+
+        # Failing feeds are backed off like unchanged ones
+        podcast.save(update_fields=set_next_check(podcast, None))
+        return None
+
+    def write_error(self, message):
+        self.stderr.write(self.style.ERROR(message))
+
+
+Command = RefreshFeedsCommand
@@ -0,0 +1,457 @@
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from os import scandir, sep
+from pathlib import Path
+from re import compile as re_compile, IGNORECASE
+from time import monotonic
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+from django.utils.timezone import now
+
+from h5media.actions.audio_probe import AudioInfo, probe_audio_files
+from h5media.models import (
+    Album,
+    AlbumTrack,
+    Audiobook,
+    AudiobookChapter,
+    LibrarySource,
+    MediaFile,
+)
+
+
+AUDIO_EXTENSIONS = {
+    '.aac',
+    '.flac',
+    '.m4a',
+    '.m4b',
+    '.mp3',
+    '.oga',
+    '.ogg',
+    '.opus',
+    '.wav',
+}
+
+# Number of files written to the database at a time
+BATCH_SIZE = 2000
+
+# Matches file names like "01 Title", "1-02 - Title" and "03. Title"
+TRACK_NAME_REGEX = re_compile(
+    r'^(?:(?P<disc>\d{1,2})-)?(?P<track>\d{1,3})[\s._-]+(?P<title>.+)$'
+)
+
+# Matches the directories albums are sometimes split into
+DISC_DIRECTORY_REGEX = re_compile(r'^(?:disc|cd)\s*(?P<disc>\d+)$', IGNORECASE)
+
+
+class ScannedFile(NamedTuple):
+    path: str
+    size: int
+    mtime: float
+
+
+class StoredFile(NamedTuple):
+    pk: int
+    size: Optional[int]
+    mtime: Optional[float]
+    source_id: Optional[int]
+    missing: bool
+
+
+def scan_directory(directory: str) -> Tuple[List[str], List[ScannedFile]]:
+    """Returns the subdirectories and the audio files of a directory.  Runs
+    in a worker thread so it mustn't touch the database."""
+    directories: List[str] = []
+    files: List[ScannedFile] = []
+    try:
+        with scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    # Symbolic links to directories aren't followed so a
+                    # link back up the tree can't loop forever
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif (
+                            entry.is_file()
+                            and Path(entry.name).suffix.lower()
+                            in AUDIO_EXTENSIONS
+                    ):
+                        stat = entry.stat()
+                        files.append(
+                            ScannedFile(
+                                entry.path,
+                                stat.st_size,
+                                stat.st_mtime,
+                            )
+                        )
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return directories, files
+
+
+def scan_tree(root: str, threads: int) -> Iterator[ScannedFile]:
+    """Yields the audio files under root.  Directories are scanned in a
+    thread pool so the stat calls of many directories are in flight at
+    once, which is what makes scanning network and spinning disks fast."""
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = {executor.submit(scan_directory, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                directories, files = future.result()
+                pending.update(
+                    executor.submit(scan_directory, directory)
+                    for directory in directories
+                )
+                yield from files
+
+
+def get_track_fields(path: Path) -> dict:
+    """Album, disc, track number and title of a music file guessed from its
+    path.  Albums are expected to be directories, optionally split into
+    disc directories."""
+    directory = path.parent
+    disc = 1
+    match = DISC_DIRECTORY_REGEX.match(directory.name)
+    if match:
+        disc = int(match['disc'])
+        directory = directory.parent
+
+    title = path.stem
+    track = 1
+    match = TRACK_NAME_REGEX.match(title)
+    if match:
+        title = match['title']
+        track = int(match['track'])
+        if match['disc']:
+            disc = int(match['disc'])
+
+    return {
+        'album_title': directory.name,
+        'disc': disc,
+        'track': track,
+        'title': title,
+    }
+
+
+class ScanLibraryCommand(BaseCommand):
+    """Imports music and audiobooks from directories rather than from a
+    Rhythmbox library.  Music directories are expected to be organized by
+    album and audiobook directories by book.  Only new files and files
+    whose size or modification time changed are written."""
+
+    help = 'Scans directories for music and audiobook files'
+
+    def __init__(
+            self,
+            stdout=None,
+            stderr=None,
+            no_color=False,
+            force_color=False,
+    ):
+        super().__init__(stdout, stderr, no_color, force_color)
+        self.albums: Dict[str, Album] = {}
+        self.audiobooks: Dict[str, Audiobook] = {}
+        # Highest chapter number of each audiobook keyed by audiobook pk
+        self.chapter_numbers: Dict[int, int] = defaultdict(int)
+        # Number of chapters of each audiobook written by the scan that
+        # haven't been numbered yet (see number_chapters)
+        self.unnumbered_counts: Dict[int, int] = defaultdict(int)
+        self.threads = 1
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-m', '--music',
+            nargs='+',
+            default=[],
+            help='Directories of music organized by album',
+        )
+        parser.add_argument(
+            '-a', '--audiobooks',
+            nargs='+',
+            default=[],
+            help='Directories of audiobooks organized by book',
+        )
+        parser.add_argument(
+            '-t', '--threads',
+            type=int,
+            default=16,
+            help='Number of directories scanned at the same time',
+        )
+
+    def handle(self, *args, **options):
+        if not options['music'] and not options['audiobooks']:
+            self.write_error('Please provide --music or --audiobooks')
+            return
+
+        self.albums = {album.title: album for album in Album.objects.all()}
+        self.audiobooks = {
+            audiobook.title: audiobook
+            for audiobook in Audiobook.objects.all()
+        }
+        for audiobook_id, chapter in AudiobookChapter.objects.values_list(
+                'audiobook_id',
+                'chapter',
+        ):
+            self.chapter_numbers[audiobook_id] = max(
+                self.chapter_numbers[audiobook_id],
+                chapter,
+            )
+
+        self.threads = max(1, options['threads'])
+        for directory in options['music']:
+            self.scan_root(Path(directory), MediaFile.TYPE_ALBUM_TRACK)
+        for directory in options['audiobooks']:
+            self.scan_root(Path(directory), MediaFile.TYPE_AUDIOBOOK_CHAPTER)
+
+    def write_error(self, message):
+        self.stderr.write(self.style.ERROR(message))
+
+    def scan_root(self, root: Path, type_: str) -> None:
+        if not root.is_dir():
+            self.write_error(f'Directory {root} does not exist')
+            return
+
+        root = root.resolve()
+        start_time = monotonic()
+        source, _ = LibrarySource.objects.get_or_create(path=str(root))
+        stored_files = self.get_stored_files(root)
+
+        new_files: List[ScannedFile] = []
+        changed_files: List[MediaFile] = []
+        seen_paths: Set[str] = set()
+        created_count = 0
+        updated_count = 0
+        for scanned_file in scan_tree(str(root), self.threads):
+            seen_paths.add(scanned_file.path)
+            stored_file = stored_files.get(scanned_file.path)
+            if stored_file is None:
+                new_files.append(scanned_file)
+            elif (
+                    (stored_file.size, stored_file.mtime, stored_file.missing)
+                    != (scanned_file.size, scanned_file.mtime, False)
+            ):
+                changed_files.append(
+                    MediaFile(
+                        pk=stored_file.pk,
+                        file_path=scanned_file.path,
+                        file_size=scanned_file.size,
+                        file_mtime=scanned_file.mtime,
+                        missing_since=None,
+                    )
+                )
+
+            if len(new_files) + len(changed_files) >= BATCH_SIZE:
+                self.save_batch(source, type_, new_files, changed_files)
+                created_count += len(new_files)
+                updated_count += len(changed_files)
+                new_files = []
+                changed_files = []
+
+        self.save_batch(source, type_, new_files, changed_files)
+        created_count += len(new_files)
+        updated_count += len(changed_files)
+
+        missing_pks = [
+            stored_file.pk
+            for path, stored_file in stored_files.items()
+            if stored_file.source_id == source.pk
+            and not stored_file.missing
+            and path not in seen_paths
+        ]
+        with atomic():
+            self.number_chapters()
+            for start in range(0, len(missing_pks), BATCH_SIZE):
+                MediaFile.objects.filter(
+                    pk__in=missing_pks[start:start + BATCH_SIZE],
+                ).update(
+                    missing_since=now(),
+                )
+            source.synced = now()
+            source.save(update_fields=['synced'])
+
+        self.stdout.write(
+            f'{root}: {len(seen_paths)} files in '
+            f'{monotonic() - start_time:.1f}s, {created_count} created, '
+            f'{updated_count} updated, {len(missing_pks)} missing'
+        )
+
+    @staticmethod
+    def get_stored_files(root: Path) -> Dict[str, StoredFile]:
+        return {
+            file_path: StoredFile(*values, missing_since is not None)
+            for file_path, missing_since, *values
+            in MediaFile.objects.filter(
+                file_path__startswith=f'{root}{sep}',
+            ).values_list(
+                'file_path',
+                'missing_since',
+                'pk',
+                'file_size',
+                'file_mtime',
+                'source_id',
+            )
+        }
+
+    def save_batch(
+            self,
+            source: LibrarySource,
+            type_: str,
+            new_files: List[ScannedFile],
+            changed_files: List[MediaFile],
+    ) -> None:
+        """Writes a batch of new and changed files.  Their durations are
+        read from their headers first, outside of the transaction."""
+        audio_infos = probe_audio_files(
+            [scanned_file.path for scanned_file in new_files]
+            + [media_file.file_path for media_file in changed_files],
+            self.threads,
+        )
+        for media_file in changed_files:
+            media_file.duration, media_file.bitrate = self.get_audio_values(
+                audio_infos.get(media_file.file_path)
+            )
+
+        with atomic():
+            if type_ == MediaFile.TYPE_ALBUM_TRACK:
+                self.create_tracks(source, new_files, audio_infos)
+            else:
+                self.create_chapters(source, new_files, audio_infos)
+            MediaFile.objects.bulk_update(
+                changed_files,
+                [
+                    'file_size',
+                    'file_mtime',
+                    'missing_since',
+                    'duration',
+                    'bitrate',
+                ],
+                batch_size=BATCH_SIZE,
+            )
+
+    @staticmethod
+    def get_audio_values(
+            audio_info: Optional[AudioInfo],
+    ) -> Tuple[Optional[float], Optional[int]]:
+        if audio_info is None:
+            return None, None
+        return audio_info.duration, audio_info.bitrate
+
+    def create_tracks(
+            self,
+            source: LibrarySource,
+            new_files: List[ScannedFile],
+            audio_infos: Dict[str, Optional[AudioInfo]],
+    ) -> None:
+        track_fields = [
+            get_track_fields(Path(scanned_file.path))
+            for scanned_file in new_files
+        ]
+        new_albums = [
+            Album(title=title)
+            for title in sorted({
+                fields['album_title']
+                for fields in track_fields
+            } - self.albums.keys())
+        ]
+        Album.objects.bulk_create(new_albums, batch_size=BATCH_SIZE)
+        for album in new_albums:
+            self.albums[album.title] = album
+
+        tracks: List[AlbumTrack] = []
+        for scanned_file, fields in zip(new_files, track_fields):
+            duration, bitrate = self.get_audio_values(
+                audio_infos.get(scanned_file.path)
+            )
+            tracks.append(
+                AlbumTrack(
+                    title=fields['title'],
+                    file_path=scanned_file.path,
+                    file_size=scanned_file.size,
+                    file_mtime=scanned_file.mtime,
+                    duration=duration,
+                    bitrate=bitrate,
+                    source=source,
+                    album=self.albums[fields['album_title']],
+                    disc=fields['disc'],
+                    track=fields['track'],
+                )
+            )
+        AlbumTrack.objects.bulk_create(tracks, batch_size=BATCH_SIZE)
+
+    def create_chapters(
+            self,
+            source: LibrarySource,
+            new_files: List[ScannedFile],
+            audio_infos: Dict[str, Optional[AudioInfo]],
+    ) -> None:
+        """Each directory is an audiobook.  The new chapters get negative
+        placeholder numbers until number_chapters() is called."""
+        files_by_title: Dict[str, List[ScannedFile]] = defaultdict(list)
+        for scanned_file in new_files:
+            title = Path(scanned_file.path).parent.name
+            files_by_title[title].append(scanned_file)
+
+        new_audiobooks = [
+            Audiobook(title=title)
+            for title in sorted(files_by_title.keys() - self.audiobooks.keys())
+        ]
+        Audiobook.objects.bulk_create(new_audiobooks, batch_size=BATCH_SIZE)
+        for audiobook in new_audiobooks:
+            self.audiobooks[audiobook.title] = audiobook
+
+        chapters: List[AudiobookChapter] = []
+        for title, scanned_files in files_by_title.items():
+            audiobook = self.audiobooks[title]
+            for scanned_file in scanned_files:
+                self.unnumbered_counts[audiobook.pk] += 1
+                duration, bitrate = self.get_audio_values(
+                    audio_infos.get(scanned_file.path)
+                )
+                chapters.append(
+                    AudiobookChapter(
+                        title=Path(scanned_file.path).stem,
+                        file_path=scanned_file.path,
+                        file_size=scanned_file.size,
+                        file_mtime=scanned_file.mtime,
+                        duration=duration,
+                        bitrate=bitrate,
+                        source=source,
+                        audiobook=audiobook,
+                        chapter=-self.unnumbered_counts[audiobook.pk],
+                    )
+                )
+        AudiobookChapter.objects.bulk_create(chapters, batch_size=BATCH_SIZE)
+
+    def number_chapters(self) -> None:
+        """Numbers the chapters written by the scan after their audiobook's
+        existing chapters in file name order.  This waits until the scan is
+        done since a book's files can be spread over several batches in
+        the order the threads found them."""
+        chapters = list(
+            AudiobookChapter.objects.filter(
+                audiobook_id__in=list(self.unnumbered_counts),
+                chapter__lt=0,
+            ).order_by(
+                'audiobook_id',
+                'file_path',
+            ).only(
+                'audiobook_id',
+                'chapter',
+            )
+        )
+        for chapter in chapters:
+            self.chapter_numbers[chapter.audiobook_id] += 1
+            chapter.chapter = self.chapter_numbers[chapter.audiobook_id]
+        AudiobookChapter.objects.bulk_update(
+            chapters,
+            ['chapter'],
+            batch_size=BATCH_SIZE,
+        )
+        self.unnumbered_counts.clear()
+
+
+Command = ScanLibraryCommand
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='playlist',
+            name='contents',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='now_playing',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='queue',
+        ),
+        migrations.AddField(
+            model_name='albumtrack',
+            name='disc',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='albumtrack',
+            name='track',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='podcast',
+            name='rss_checked',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='podcast',
+            name='rss_etag',
+            field=models.CharField(blank=True, default='', max_length=250),
+        ),
+        migrations.AddField(
+            model_name='podcast',
+            name='rss_final_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='podcast',
+            name='rss_last_modified',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='podcast',
+            name='rss_status',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PlayListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_number', models.PositiveIntegerField(default=1, null=True)),
+                ('media_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='play_list_items', to='h5media.mediafile')),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='h5media.playlist')),
+            ],
+            options={
+                'unique_together': {('playlist', 'item_number')},
+            },
+        ),
+        migrations.CreateModel(
+            name='QueueItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.IntegerField(default=0)),
+                ('media_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='h5media.mediafile')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue', to='h5media.profile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('profile', 'order'), name='unique_profile_media_file')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0002_podcast_rss_fetch_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='podcast',
+            name='rss_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
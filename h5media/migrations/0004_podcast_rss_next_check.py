@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0003_podcast_rss_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='podcast',
+            name='rss_next_check',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='podcast',
+            name='rss_unchanged_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
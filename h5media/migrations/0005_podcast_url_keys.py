@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0004_podcast_rss_next_check'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='podcast',
+            name='rss_key',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='podcastepisode',
+            name='url_key',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True, unique=True),
+        ),
+    ]
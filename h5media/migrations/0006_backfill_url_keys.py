@@ -0,0 +1,97 @@
+from logging import getLogger
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db import migrations
+
+
+logger = getLogger('web')
+
+BATCH_SIZE = 1000
+
+DEFAULT_PORTS = {
+    'http': 80,
+    'https': 443,
+}
+
+
+def normalize_url(url: str) -> str:
+    """Copy of h5media.url_keys.normalize_url() as it was when the keys were
+    added, so that later changes to it don't change this migration"""
+    url = (url or '').strip()
+    if not url:
+        return ''
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+
+    if scheme in DEFAULT_PORTS:
+        scheme = 'https'
+
+    path = parts.path.rstrip('/')
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def backfill_keys(model, url_field: str, key_field: str):
+    """Sets the key of every row.  Rows whose urls normalize to the key of an
+    earlier row keep a null key rather than failing the unique index.  They
+    are logged as they won't be found by key and have to be merged by hand
+    with the row holding the key."""
+    key_pks = {}
+    duplicate_count = 0
+    changed = []
+    for instance in model.objects.order_by('pk').only(url_field).iterator(
+        chunk_size=BATCH_SIZE,
+    ):
+        url = getattr(instance, url_field)
+        key = normalize_url(url) or None
+        if key in key_pks:
+            logger.warning(
+                f"{model.__name__} {instance.pk} {url_field} {url} has the "
+                f"same key as {model.__name__} {key_pks[key]}, "
+                f"its {key_field} is left null"
+            )
+            duplicate_count += 1
+            key = None
+        if key:
+            key_pks[key] = instance.pk
+        setattr(instance, key_field, key)
+        changed.append(instance)
+        if len(changed) >= BATCH_SIZE:
+            model.objects.bulk_update(changed, [key_field])
+            changed = []
+    if changed:
+        model.objects.bulk_update(changed, [key_field])
+    if duplicate_count:
+        logger.warning(
+            f"{duplicate_count} {model.__name__} rows have a duplicate "
+            f"{url_field} and no {key_field}"
+        )
+
+
+def forwards(apps, schema_editor):
+    backfill_keys(apps.get_model('h5media', 'Podcast'), 'rss', 'rss_key')
+    backfill_keys(
+        apps.get_model('h5media', 'PodcastEpisode'),
+        'url',
+        'url_key',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0005_podcast_url_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0007_library_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='file_mtime',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='file_path',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0008_mediafile_file_stat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
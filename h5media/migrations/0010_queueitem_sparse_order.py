@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:22
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+# h5media.models.QUEUE_ORDER_GAP when this migration was written
+QUEUE_ORDER_GAP = 1 << 20
+
+
+def spread_orders(apps, schema_editor):
+    """Spaces the existing dense orders apart.  The orders are first moved
+    below zero and below their current values so the unique constraint holds
+    after every row update."""
+    QueueItem = apps.get_model('h5media', 'QueueItem')
+    items = QueueItem.objects.all()
+    orders = items.aggregate(
+        min_order=models.Min('order'),
+        max_order=models.Max('order'),
+    )
+    if orders['min_order'] is None:
+        return
+    shift = orders['max_order'] + 1 - min(orders['min_order'], 0)
+    items.update(order=F('order') - shift)
+    items.update(
+        order=(F('order') + shift - orders['min_order']) * QUEUE_ORDER_GAP,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0009_mediafile_duration_bitrate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='queueitem',
+            name='order',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(spread_orders, migrations.RunPython.noop),
+    ]
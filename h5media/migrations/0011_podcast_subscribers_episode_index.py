@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0010_queueitem_sparse_order'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='podcast',
+            name='subscribers',
+            field=models.ManyToManyField(blank=True, related_name='podcasts_subscribed_to', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='podcastepisode',
+            index=models.Index(fields=['podcast', 'pub_date', 'mediafile_ptr'], name='episode_podcast_pub_date'),
+        ),
+    ]
@@ -0,0 +1,141 @@
+from django.db import migrations
+
+
+# Full-text indexes of podcasts and episodes used by h5media.actions.search.
+# The rowids of the indexes are the primary keys of the podcasts and
+# episodes, and triggers keep the indexes in sync.  An episode's title is
+# in h5media_mediafile and its description in h5media_podcastepisode.
+CREATE_STATEMENTS = (
+    """
+    CREATE VIRTUAL TABLE h5media_podcast_fts USING fts5(
+        title,
+        description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE h5media_episode_fts USING fts5(
+        title,
+        description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO h5media_podcast_fts(rowid, title, description)
+    SELECT id, title, description FROM h5media_podcast
+    """,
+    """
+    INSERT INTO h5media_episode_fts(rowid, title, description)
+    SELECT episode.mediafile_ptr_id, media_file.title, episode.description
+    FROM h5media_podcastepisode episode
+    JOIN h5media_mediafile media_file
+        ON media_file.id = episode.mediafile_ptr_id
+    """,
+    """
+    CREATE TRIGGER h5media_podcast_fts_insert
+    AFTER INSERT ON h5media_podcast
+    BEGIN
+        INSERT INTO h5media_podcast_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER h5media_podcast_fts_update
+    AFTER UPDATE OF title, description ON h5media_podcast
+    BEGIN
+        UPDATE h5media_podcast_fts
+        SET title = new.title, description = new.description
+        WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER h5media_podcast_fts_delete
+    AFTER DELETE ON h5media_podcast
+    BEGIN
+        DELETE FROM h5media_podcast_fts WHERE rowid = old.id;
+    END
+    """,
+    # The MediaFile row is inserted before the PodcastEpisode row
+    """
+    CREATE TRIGGER h5media_episode_fts_insert
+    AFTER INSERT ON h5media_podcastepisode
+    BEGIN
+        INSERT INTO h5media_episode_fts(rowid, title, description)
+        SELECT new.mediafile_ptr_id, title, new.description
+        FROM h5media_mediafile
+        WHERE id = new.mediafile_ptr_id;
+    END
+    """,
+    """
+    CREATE TRIGGER h5media_episode_fts_update
+    AFTER UPDATE OF description ON h5media_podcastepisode
+    BEGIN
+        UPDATE h5media_episode_fts
+        SET description = new.description
+        WHERE rowid = old.mediafile_ptr_id;
+    END
+    """,
+    # Does nothing for media files that aren't episodes
+    """
+    CREATE TRIGGER h5media_episode_fts_title
+    AFTER UPDATE OF title ON h5media_mediafile
+    BEGIN
+        UPDATE h5media_episode_fts SET title = new.title WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER h5media_episode_fts_delete
+    AFTER DELETE ON h5media_podcastepisode
+    BEGIN
+        DELETE FROM h5media_episode_fts WHERE rowid = old.mediafile_ptr_id;
+    END
+    """,
+)
+
+DROP_STATEMENTS = (
+    'DROP TRIGGER IF EXISTS h5media_podcast_fts_insert',
+    'DROP TRIGGER IF EXISTS h5media_podcast_fts_update',
+    'DROP TRIGGER IF EXISTS h5media_podcast_fts_delete',
+    'DROP TRIGGER IF EXISTS h5media_episode_fts_insert',
+    'DROP TRIGGER IF EXISTS h5media_episode_fts_update',
+    'DROP TRIGGER IF EXISTS h5media_episode_fts_title',
+    'DROP TRIGGER IF EXISTS h5media_episode_fts_delete',
+    'DROP TABLE IF EXISTS h5media_podcast_fts',
+    'DROP TABLE IF EXISTS h5media_episode_fts',
+)
+
+
+def has_fts5(connection) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def execute(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def forwards(apps, schema_editor):
+    """Other databases are searched with LIKE"""
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and has_fts5(connection):
+        execute(schema_editor, CREATE_STATEMENTS)
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        execute(schema_editor, DROP_STATEMENTS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('h5media', '0011_podcast_subscribers_episode_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
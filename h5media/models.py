@@ -1,18 +1,28 @@
 
-from collections.abc import Iterable
-from typing import Optional, Tuple
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from copy import deepcopy
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from django.contrib.auth.models import User
 from django.core.exceptions import (
     MultipleObjectsReturned,
     ObjectDoesNotExist,
 )
+from django.db import IntegrityError, NotSupportedError, connections
 from django.db.models import (
     Model,
     CASCADE,
+    SET_NULL,
+    BigIntegerField,
     CharField,
     DateTimeField,
+    F,
+    FloatField,
     ForeignKey,
+    Index,
     IntegerField,
     JSONField,
     Manager,
@@ -20,12 +30,18 @@ from django.db.models import (
     Max,
     OneToOneField,
     PositiveIntegerField,
+    QuerySet,
+    Subquery,
     TextField,
     UniqueConstraint,
     URLField,
+    Window,
 )
+from django.db.models.functions import RowNumber
 from django.db.transaction import atomic
 
+from h5media.url_keys import normalize_url
+
 
 def build_title_field() -> CharField:
     return CharField(
@@ -36,20 +52,119 @@ def build_title_field() -> CharField:
     )
 
 
+def build_url_key_field() -> CharField:
+    """Field holding the normalize_url() key of a url field.  Null rather
+    than blank for urls that aren't set so they don't collide in the unique
+    index."""
+    return CharField(
+        max_length=500,
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+    )
+
+
 class DatabaseError(RuntimeError):
     pass
 
 
+class SkippedSaves:
+    """Number of saves BaseModel skipped because nothing had changed"""
+
+    def __init__(self):
+        self.count = 0
+
+
+# Tally of the current count_skipped_saves() block.  A context variable so
+# that commands counting in one thread don't see saves made in another.
+skipped_saves: ContextVar[Optional[SkippedSaves]] = ContextVar(
+    'skipped_saves',
+    default=None,
+)
+
+
+@contextmanager
+def count_skipped_saves() -> Iterator[SkippedSaves]:
+    """Counts the saves skipped in the current thread within the block.
+    Saves skipped in a nested block are added to the outer tally too."""
+    tally = SkippedSaves()
+    token = skipped_saves.set(tally)
+    try:
+        yield tally
+    finally:
+        skipped_saves.reset(token)
+        outer = skipped_saves.get()
+        if outer is not None:
+            outer.count += tally.count
+
+
 
 
 
 class BaseModel(Model):
+    """Instances loaded from the database keep a snapshot of the loaded
+    values.  save() only writes the fields that differ from the snapshot and
+    skips the write altogether when nothing changed.  An instance whose pk
+    was changed or cleared is saved in full."""
 
     update_fields = tuple()
 
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.take_snapshot()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self.take_snapshot(fields)
+
+    def take_snapshot(self, field_names: Optional[Iterable] = None) -> None:
+        """Records the current values of the loaded fields, or only of
+        field_names, as the values in the database.  Expressions like F()
+        aren't recorded since the value they saved isn't known."""
+        snapshot = self.__dict__.setdefault('_snapshot', {})
+        self.__dict__['_snapshot_pk'] = self.pk
+        deferred_fields = self.get_deferred_fields()
+        if field_names is not None:
+            field_names = set(field_names)
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname in deferred_fields:
+                continue
+            if field_names is not None and not (
+                    field.name in field_names or field.attname in field_names
+            ):
+                continue
+            value = getattr(self, field.attname)
+            if hasattr(value, 'resolve_expression'):
+                snapshot.pop(field.attname, None)
+                continue
+            if isinstance(value, (dict, list)):
+                value = deepcopy(value)
+            snapshot[field.attname] = value
+
+    def get_changed_fields(self) -> Set[str]:
+        """Names of the fields whose values differ from the snapshot.  Every
+        field is changed on an instance that wasn't loaded from the
+        database.  Deferred fields that were never loaded are unchanged."""
+        snapshot = self.__dict__.get('_snapshot')
+        deferred_fields = self.get_deferred_fields()
+        return {
+            field.name
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname not in deferred_fields
+            and (
+                snapshot is None
+                or field.attname not in snapshot
+                or snapshot[field.attname] != getattr(self, field.attname)
+            )
+        }
+
     def fetch(self) -> Optional[Model]:
         """When this method is invoked on an unsaved instance of BaseModel,
         an attempt will be made to find a matching record in the database.
@@ -72,6 +187,80 @@ class BaseModel(Model):
             return
         self.save()
 
+    def set_keys(self) -> Tuple[str, ...]:
+        """Sets the fields derived from other fields for lookups and returns
+        their names.  Called before every save, bulk inserts and updates have
+        to call it themselves."""
+        return tuple()
+
+    def save(self, *args, **kwargs):
+        key_fields = self.set_keys()
+        update_fields = kwargs.get('update_fields')
+        if key_fields and update_fields is not None:
+            update_fields = {*update_fields, *key_fields}
+
+        if (
+                not self._state.adding
+                and '_snapshot' in self.__dict__
+                and self.pk is not None
+                and self.pk == self.__dict__.get('_snapshot_pk')
+                and not args
+                and not kwargs.get('force_insert')
+                and not kwargs.get('force_update')
+        ):
+            changed_fields = self.get_changed_fields()
+            if update_fields is None:
+                if not changed_fields:
+                    self.count_skipped_save()
+                    return
+                # Limited in _do_update() rather than passed on as
+                # update_fields so that a row deleted since the instance was
+                # loaded is inserted again like a regular save() would
+                self.__dict__['_save_fields'] = changed_fields
+            else:
+                update_fields = {
+                    name
+                    for name in update_fields
+                    if self._meta.get_field(name).name in changed_fields
+                }
+                if not update_fields:
+                    self.count_skipped_save()
+                    return
+
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self.__dict__.pop('_save_fields', None)
+        self.take_snapshot(update_fields)
+
+    @staticmethod
+    def count_skipped_save() -> None:
+        """Adds a write skipped because nothing changed to the current
+        count_skipped_saves() tally.  Bulk updates that leave out unchanged
+        instances call it themselves."""
+        tally = skipped_saves.get()
+        if tally is not None:
+            tally.count += 1
+
+    def _do_update(self, base_qs, using, pk_val, values, *args, **kwargs):
+        save_fields = self.__dict__.get('_save_fields')
+        if save_fields is not None:
+            values = [
+                (field, model, value)
+                for field, model, value in values
+                if field.name in save_fields
+            ]
+        return super()._do_update(
+            base_qs,
+            using,
+            pk_val,
+            values,
+            *args,
+            **kwargs,
+        )
+
 
 def profile_queue_default():
     return []
@@ -88,13 +277,43 @@ class Profile(BaseModel):
         return self.user.username
 
 
+class LibrarySource(BaseModel):
+    """A file or directory media files are imported from, such as a
+    rhythmdb.xml file.  Records how far the last import got so the next one
+    only has to look at what changed."""
+
+    path = CharField(max_length=500, unique=True)
+
+    # Modification time of the file when it was last imported
+    file_mtime = FloatField(null=True, blank=True)
+
+    # Newest modification time (seconds since the epoch) of the entries seen
+    # by the last import
+    watermark = BigIntegerField(default=0)
+
+    synced = DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.path
+
+
+class MediaFileQuerySet(QuerySet):
+
+    def as_subclasses(self) -> List['MediaFile']:
+        """Evaluates the queryset and returns the rows as instances of their
+        subclasses.  See MediaFile.load_subclasses()"""
+        return MediaFile.load_subclasses(self)
+
+
 class MediaFile(BaseModel):
     """Audio or visual file"""
 
+    objects = MediaFileQuerySet.as_manager()
+
     title = build_title_field()
 
     file_path = CharField(
-        max_length=250,
+        max_length=500,
         null=False,
         blank=True,
     )
@@ -116,19 +335,387 @@ class MediaFile(BaseModel):
         choices=TYPE_CHOICES,
     )
 
+    # type of the instances of a subclass
+    default_type = ''
+
+    source = ForeignKey(
+        LibrarySource,
+        null=True,
+        blank=True,
+        related_name='media_files',
+        on_delete=SET_NULL,
+    )
+
+    # Set when the file is no longer in its source
+    missing_since = DateTimeField(null=True, blank=True)
+
+    # Size and modification time of the file when it was last scanned
+    file_size = BigIntegerField(null=True, blank=True)
+
+    file_mtime = FloatField(null=True, blank=True)
+
+    # Read from the file's headers by h5media.actions.audio_probe.  Seconds
+    # and kilobits per second.
+    duration = FloatField(null=True, blank=True)
+
+    bitrate = PositiveIntegerField(null=True, blank=True)
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.type = self.type or self.default_type
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_subclasses() -> Dict[str, Tuple[type, Tuple[str, ...]]]:
+        """Subclass and the relations loaded with it keyed by type"""
+        return {
+            MediaFile.TYPE_PODCAST_EPISODE: (PodcastEpisode, ('podcast',)),
+            MediaFile.TYPE_AUDIOBOOK_CHAPTER: (
+                AudiobookChapter,
+                ('audiobook',),
+            ),
+            MediaFile.TYPE_ALBUM_TRACK: (AlbumTrack, ('album',)),
+        }
+
+    @staticmethod
+    def load_subclasses(media_files: Iterable) -> List['MediaFile']:
+        """Returns media_files as instances of their subclasses, in the same
+        order.  The rows are grouped by type and each subclass is loaded
+        together with its podcast, audiobook or album in one query, so the
+        number of queries doesn't grow with the number of rows.  Rows of an
+        unknown type, or whose subclass row is missing, are returned as
+        they are."""
+        media_files = list(media_files)
+        pks_by_type: Dict[str, List[int]] = defaultdict(list)
+        for media_file in media_files:
+            pks_by_type[media_file.type].append(media_file.pk)
+
+        subclasses = MediaFile.get_subclasses()
+        loaded: Dict[int, MediaFile] = {}
+        for type_, pks in pks_by_type.items():
+            if type_ not in subclasses:
+                continue
+            model, relations = subclasses[type_]
+            for instance in model.objects.select_related(
+                    *relations,
+            ).filter(pk__in=pks):
+                loaded[instance.pk] = instance
+
+        return [
+            loaded.get(media_file.pk, media_file)
+            for media_file in media_files
+        ]
+
+    @staticmethod
+    def attach_subclasses(items: Iterable) -> List:
+        """Replaces the media_file of queue or playlist items with an
+        instance of its subclass.  The items should be loaded with
+        select_related('media_file')."""
+        items = list(items)
+        media_files = MediaFile.load_subclasses(
+            item.media_file for item in items
+        )
+        for item, media_file in zip(items, media_files):
+            item.media_file = media_file
+        return items
+
+
+class MediaFileSubclassManager(Manager):
+    """Manager for the multi-table subclasses of MediaFile.  Django's
+    bulk_create() refuses multi-table inherited models, so the MediaFile rows
+    are inserted in bulk first and the subclass rows are then inserted in bulk
+    using the new primary keys.
+
+    This relies on the database returning the primary keys of bulk inserted
+    rows, which SQLite and PostgreSQL do but MySQL and Oracle don't."""
+
+    def bulk_create(self, objs, batch_size=None, **kwargs):
+        """Only batch_size is supported.  Conflict handling can't be split
+        between the MediaFile and the subclass inserts, so keywords like
+        ignore_conflicts raise TypeError rather than being ignored."""
+        model = self.model
+        if kwargs:
+            raise TypeError(
+                f"{model.__name__}.objects.bulk_create() doesn't support "
+                f"{', '.join(sorted(kwargs))}"
+            )
+        if not connections[self.db].features.can_return_rows_from_bulk_insert:
+            raise NotSupportedError(
+                f"{model.__name__}.objects.bulk_create() needs a database "
+                f"that returns the primary keys of bulk inserts"
+            )
+
+        objs = list(objs)
+        if not objs:
+            return objs
+
+        with atomic(using=self.db):
+            parents = []
+            for obj in objs:
+                obj.type = obj.type or model.default_type
+                obj.set_keys()
+                parents.append(
+                    MediaFile(**{
+                        field.attname: getattr(obj, field.attname)
+                        for field in MediaFile._meta.concrete_fields
+                        if not field.primary_key
+                    })
+                )
+            MediaFile.objects.using(self.db).bulk_create(
+                parents,
+                batch_size=batch_size,
+            )
+
+            for obj, parent in zip(objs, parents):
+                obj.id = parent.pk
+                obj.mediafile_ptr_id = parent.pk
+                obj._state.adding = False
+                obj._state.db = self.db
+
+            fields = model._meta.local_concrete_fields
+            ops = connections[self.db].ops
+            batch_size = min(
+                batch_size or len(objs),
+                ops.bulk_batch_size(fields, objs) or len(objs),
+            )
+            for start in range(0, len(objs), batch_size):
+                self._insert(
+                    objs[start:start + batch_size],
+                    fields=fields,
+                    using=self.db,
+                )
+        return objs
+
+
+# Distance between the orders of neighbouring queue items.  Items are placed
+# halfway between their neighbours, so about 20 items can be inserted at the
+# same spot before the queue has to be renumbered.
+QUEUE_ORDER_GAP = 1 << 20
+
+# Number of times an insert into a queue is tried when it collides with an
+# insert made at the same time
+QUEUE_INSERT_ATTEMPTS = 3
+
+
+class QueueManager(Manager):
+    """Operations on a profile's queue, used through Profile.queue.  The
+    orders of the items are spaced QUEUE_ORDER_GAP apart so inserting,
+    moving or removing an item only writes that item.  The queue is
+    renumbered when there's no room left between two items.
+
+    Changes to a queue lock the profile's row so the orders of changes made
+    at the same time, e.g. from desktop and mobile, are allocated one after
+    the other.  SQLite has no row locks and relies on the IMMEDIATE
+    transaction mode set in DATABASES instead, which makes each transaction
+    take the database's write lock when it starts.  An insert that still
+    breaks the unique constraint is tried again."""
+
+    def get_profile(self) -> 'Profile':
+        profile = getattr(self, 'instance', None)
+        if not isinstance(profile, Profile):
+            raise TypeError('Queue operations are used through Profile.queue')
+        return profile
+
+    def lock(self):
+        """Locks the profile's row until the end of the transaction"""
+        list(
+            Profile.objects.using(self.db).select_for_update().filter(
+                pk=self.get_profile().pk,
+            ).values_list('pk', flat=True)
+        )
+
+    def get_order_before(self, before: Optional['QueueItem']) -> Optional[int]:
+        """Returns an unused order for an item placed before the item
+        `before`, or at the end of the queue if before is None.  Returns
+        None if there's no room before `before`."""
+        orders = self.order_by('order').values_list('order', flat=True)
+        if before is None:
+            last = orders.last()
+            return 0 if last is None else last + QUEUE_ORDER_GAP
+
+        previous = orders.filter(order__lt=before.order).last()
+        if previous is None:
+            return before.order - QUEUE_ORDER_GAP
+        if before.order - previous < 2:
+            return None
+        return (previous + before.order) // 2
+
+    def get_free_order(
+            self,
+            before: Optional['QueueItem'],
+            *items: 'QueueItem',
+    ) -> int:
+        order = self.get_order_before(before)
+        if order is None:
+            self.rebalance()
+            for item in (before, *items):
+                item.refresh_from_db(fields=['order'])
+            order = self.get_order_before(before)
+        return order
+
+    def write(
+            self,
+            operation: Callable[[], Any],
+            *items: Optional['QueueItem'],
+    ) -> Any:
+        """Runs operation in a transaction with the profile locked.  If it
+        collides with a change made at the same time, the orders of items are
+        reloaded and it is run again."""
+        for attempt in range(1, QUEUE_INSERT_ATTEMPTS + 1):
+            try:
+                with atomic(using=self.db):
+                    self.lock()
+                    return operation()
+            except IntegrityError:
+                if attempt == QUEUE_INSERT_ATTEMPTS:
+                    raise
+                for item in items:
+                    if item is not None:
+                        item.refresh_from_db(fields=['order'])
+
+    def insert(
+            self,
+            media_file: 'MediaFile',
+            before: Optional['QueueItem'] = None,
+    ) -> 'QueueItem':
+        """Adds media_file to the queue before the item `before`, or at the
+        end of the queue if before is None.  Only the neighbouring orders are
+        read and one row is written, however long the queue is.
+
+        Like extend(), a media file that's already in the queue isn't added
+        again.  Its item is returned and stays where it is."""
+        self.get_profile()
+
+        def add() -> 'QueueItem':
+            item = self.filter(media_file=media_file).first()
+            if item is None:
+                item = self.create(
+                    media_file=media_file,
+                    order=self.get_free_order(before),
+                )
+            return item
+
+        return self.write(add, before)
+
+    def extend(self, media_files: QuerySet) -> int:
+        """Adds media_files to the end of the queue in the order of the
+        queryset with a single INSERT ... SELECT, so the media files are
+        never loaded.  Media files already in the queue are skipped, as in
+        insert().
+        Returns the number of items added."""
+        self.get_profile()
+        rows = media_files.exclude(
+            pk__in=self.values('media_file_id'),
+        ).order_by().annotate(
+            queue_media_file_id=F('pk'),
+            queue_position=Window(
+                RowNumber(),
+                order_by=list(media_files.query.order_by or ['pk']),
+            ),
+        ).values_list('queue_media_file_id', 'queue_position')
+        return self.write(lambda: self.insert_rows(rows))
+
+    def insert_rows(self, rows: QuerySet) -> int:
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        select_sql, params = rows.query.get_compiler(self.db).as_sql()
+        columns = ', '.join(
+            quote_name(QueueItem._meta.get_field(name).column)
+            for name in ('profile', 'order', 'media_file')
+        )
+        sql = (
+            f'INSERT INTO {quote_name(QueueItem._meta.db_table)} '
+            f'({columns}) '
+            f'SELECT %s, %s + ({quote_name("queue_position")} - 1) * %s, '
+            f'{quote_name("queue_media_file_id")} '
+            f'FROM ({select_sql}) {quote_name("media_files")}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql,
+                (
+                    self.get_profile().pk,
+                    self.get_order_before(None),
+                    QUEUE_ORDER_GAP,
+                    *params,
+                ),
+            )
+            return cursor.rowcount
+
+    def move(
+            self,
+            item: 'QueueItem',
+            before: Optional['QueueItem'] = None,
+    ) -> 'QueueItem':
+        """Moves item before the item `before`, or to the end of the queue if
+        before is None"""
+        self.get_profile()
+        if before is not None and before.pk == item.pk:
+            return item
+        with atomic(using=self.db):
+            self.lock()
+            item.order = self.get_free_order(before, item)
+            item.save(update_fields=['order'])
+        return item
+
+    def remove(self, item: 'QueueItem'):
+        """Removes item from the queue.  The other items keep their orders."""
+        self.get_profile()
+        self.filter(pk=item.pk).delete()
+
+    def clear(self) -> int:
+        """Removes every item from the queue.  Returns the number removed."""
+        self.get_profile()
+        return self.all().delete()[0]
+
+    def trim(self, length: int) -> int:
+        """Removes the items after the first length items with one DELETE.
+        Returns the number removed."""
+        self.get_profile()
+        if length <= 0:
+            return self.clear()
+        last_order = self.order_by('order').values('order')[
+            length - 1:length
+        ]
+        return self.filter(order__gt=Subquery(last_order)).delete()[0]
+
+    def rebalance(self):
+        """Spaces the orders of the items QUEUE_ORDER_GAP apart again without
+        changing their order"""
+        with atomic(using=self.db):
+            self.lock()
+            items = list(
+                self.select_for_update().order_by('order').only('order')
+            )
+            if not items:
+                return
+            # The items are first moved past both the old and the new orders
+            # so no row update breaks the unique constraint on the way
+            shift = (
+                max(items[-1].order, len(items) * QUEUE_ORDER_GAP)
+                - items[0].order
+                + QUEUE_ORDER_GAP
+            )
+            self.update(order=F('order') + shift)
+            for i, item in enumerate(items):
+                item.order = i * QUEUE_ORDER_GAP
+            self.bulk_update(items, ['order'])
+
 
 class QueueItem(BaseModel):
 
+    objects = QueueManager()
+
     profile = ForeignKey(
         Profile,
         on_delete=CASCADE,
         related_name='queue',
     )
 
-    order = IntegerField(
+    # Sparse, see QueueManager
+    order = BigIntegerField(
         null=False,
         blank=False,
         default=0,
@@ -162,6 +749,12 @@ class PlayList(BaseModel):
         related_name='playlists',
     )
 
+    def get_items(self) -> List['PlayListItem']:
+        """Items in order with the subclass of their media files loaded"""
+        return MediaFile.attach_subclasses(
+            self.items.select_related('media_file').order_by('item_number')
+        )
+
 
 class PlayListItem(BaseModel):
 
@@ -198,14 +791,52 @@ class Podcast(BaseModel):
     
     rss = URLField(max_length=500, default='', unique=True)
 
+    rss_key = build_url_key_field()
+
     description = TextField(default='')
 
+    subscribers = ManyToManyField(
+        User,
+        blank=True,
+        related_name='podcasts_subscribed_to',
+    )
+
+    # State from the last download of the rss file.  The validators are sent
+    # back with the next download so unchanged feeds return 304.
+    rss_etag = CharField(max_length=250, blank=True, default='')
+
+    rss_last_modified = CharField(max_length=50, blank=True, default='')
+
+    rss_final_url = URLField(max_length=500, blank=True, default='')
+
+    rss_status = PositiveIntegerField(null=True, blank=True)
+
+    rss_checked = DateTimeField(null=True, blank=True)
+
+    # Digest of the last rss file loaded.  Used to skip parsing when a feed
+    # returns the same file without honoring the validators.
+    rss_hash = CharField(max_length=64, blank=True, default='')
+
+    # Number of refreshes in a row that found the rss file unchanged
+    rss_unchanged_count = PositiveIntegerField(default=0)
+
+    # When the rss file is next due to be refreshed.  Set by
+    # h5media.actions.podcast_schedule
+    rss_next_check = DateTimeField(null=True, blank=True, db_index=True)
+
     def __str__(self):
         return self.title
 
+    def set_keys(self) -> Tuple[str, ...]:
+        self.rss_key = normalize_url(self.rss) or None
+        return ('rss_key',)
+
     def fetch(self) -> Optional[Model]:
+        rss_key = normalize_url(self.rss)
+        if not rss_key:
+            return None
         try:
-            podcast = Podcast.objects.get(rss__iexact=self.rss)
+            podcast = Podcast.objects.get(rss_key=rss_key)
         except ObjectDoesNotExist:
             return None
         else:
@@ -214,6 +845,10 @@ class Podcast(BaseModel):
 
 class PodcastEpisode(MediaFile):
 
+    objects = MediaFileSubclassManager()
+
+    default_type = MediaFile.TYPE_PODCAST_EPISODE
+
     update_fields = (
         'podcast', 'title', 'url',
         'pub_date', 'description',
@@ -227,6 +862,8 @@ class PodcastEpisode(MediaFile):
 
     url = URLField(max_length=500, default='', unique=True)
 
+    url_key = build_url_key_field()
+
     pub_date = DateTimeField(
         null=True,
         blank=True,
@@ -234,9 +871,27 @@ class PodcastEpisode(MediaFile):
 
     description = TextField(default='')
 
+    class Meta:
+        indexes = [
+            # Reads a podcast's episodes newest first, see
+            # h5media.actions.inbox.  The primary key breaks ties between
+            # episodes published at the same time.
+            Index(
+                fields=['podcast', 'pub_date', 'mediafile_ptr'],
+                name='episode_podcast_pub_date',
+            ),
+        ]
+
+    def set_keys(self) -> Tuple[str, ...]:
+        self.url_key = normalize_url(self.url) or None
+        return ('url_key',)
+
     def fetch(self) -> Optional[Model]:
+        url_key = normalize_url(self.url)
+        if not url_key:
+            return None
         try:
-            episode = PodcastEpisode.objects.get(url__iexact=self.url)
+            episode = PodcastEpisode.objects.get(url_key=url_key)
         except ObjectDoesNotExist:
             return None
         else:
@@ -249,6 +904,11 @@ class Audiobook(BaseModel):
 
 
 class AudiobookChapter(MediaFile):
+
+    objects = MediaFileSubclassManager()
+
+    default_type = MediaFile.TYPE_AUDIOBOOK_CHAPTER
+
     audiobook = ForeignKey(
         Audiobook,
         related_name='chapters',
@@ -276,7 +936,7 @@ class Album(BaseModel):
         return self.title
 
 
-class AlbumTrackManager(Manager):
+class AlbumTrackManager(MediaFileSubclassManager):
 
     def create(self, **kwargs):
         kwargs['type'] = AlbumTrack.TYPE_ALBUM_TRACK
@@ -287,6 +947,8 @@ class AlbumTrack(MediaFile):
 
     objects = AlbumTrackManager()
 
+    default_type = MediaFile.TYPE_ALBUM_TRACK
+
     album = ForeignKey(
         Album,
         null=True,
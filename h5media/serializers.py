@@ -31,5 +31,13 @@ class PodcastEpisodeSerializer(ModelSerializer):
         if not podcast:
             return ''
         return podcast.title
-            
 
+
+class InboxEpisodeSerializer(PodcastEpisodeSerializer):
+
+    class Meta(PodcastEpisodeSerializer.Meta):
+        fields = PodcastEpisodeSerializer.Meta.fields + (
+            'podcast',
+            'pub_date',
+            'url',
+        )
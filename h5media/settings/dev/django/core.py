@@ -85,6 +85,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Transactions take the write lock when they start, so writers
+            # wait for each other instead of failing with "database is
+            # locked" when a read lock can't be upgraded
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'TEST': {
+            # A file rather than an in-memory database, which locks tables
+            # differently, so tests can run concurrent writers
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -181,3 +192,25 @@ LOGOUT_REDIRECT_URL = LOGIN_URL
 # CUSTOM SETTINGS #
 # --------------- #
 MAX_RSS_MB = 10
+
+# Podcasts not checked within this many minutes are refreshed by
+# "manage.py refresh_feeds --only-stale"
+RSS_STALE_MINUTES = 60
+
+# When True elements like lastBuildDate are ignored when comparing a
+# downloaded rss file with the last one loaded
+RSS_HASH_STRIP_VOLATILE = False
+
+# Refreshing a feed stops reading it after this many consecutive items for
+# episodes that are already in the database.  0 always reads the whole feed.
+RSS_STOP_AFTER_KNOWN_ITEMS = 10
+
+# Directory of the on-disk cache of downloaded rss files (see
+# h5media.actions.feed_cache).  None disables the cache.
+RSS_CACHE_DIR = None
+
+RSS_CACHE_MAX_MB = 200
+
+# Cached rss files younger than this are used without contacting the server.
+# 0 always revalidates them.
+RSS_CACHE_MAX_AGE_MINUTES = 0
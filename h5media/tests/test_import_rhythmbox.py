@@ -0,0 +1,277 @@
+from datetime import datetime, timezone
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from h5media.management.commands.import_rhythmbox import (
+    ImportRhythmBoxCommand,
+    SongEntry,
+)
+from h5media.models import (
+    Album,
+    AlbumTrack,
+    Podcast,
+    PodcastEpisode,
+)
+
+
+SAMPLE_RHYTHMDB_XML = Path(settings.BASE_DIR) / 'sample_rhythmdb.xml'
+
+
+class ImportRhythmBoxCommandTest(TestCase):
+
+    def test_get_song_entries(self):
+        command = ImportRhythmBoxCommand(stdout=StringIO())
+        self.assertEqual(
+            [
+                SongEntry(
+                    'Test Track 1',
+                    'Album One',
+                    Path('/home/user/Music/ArtistA/AlbumOne/Track01.mp3'),
+                    1,
+                    1,
+                    1600000000,
+                    1600000000,
+                ),
+                SongEntry(
+                    'Test Track 2',
+                    'Album One',
+                    Path('/home/user/Music/ArtistA/AlbumOne/Track02.mp3'),
+                    1,
+                    2,
+                    1600000000,
+                    1600000000,
+                ),
+                SongEntry(
+                    'Single Track',
+                    'Single',
+                    Path('/home/user/Music/ArtistB/Single/Track01.mp3'),
+                    1,
+                    1,
+                    1600000000,
+                    1600000000,
+                ),
+            ],
+            list(command.get_song_entries(SAMPLE_RHYTHMDB_XML)),
+        )
+
+    def test_get_song_entries_invalid_xml(self):
+        stderr = StringIO()
+        command = ImportRhythmBoxCommand(stdout=StringIO(), stderr=stderr)
+        with TemporaryDirectory() as directory:
+            rhythmdb_xml = Path(directory) / 'rhythmdb.xml'
+            rhythmdb_xml.write_text(
+                '<rhythmdb><entry type="song"><title>A</title></entry>'
+            )
+            self.assertEqual(
+                1,
+                len(list(command.get_song_entries(rhythmdb_xml))),
+            )
+        self.assertIn('Error parsing XML', stderr.getvalue())
+
+    def test_handle(self):
+        stdout = StringIO()
+        call_command(
+            'import_rhythmbox',
+            rhythmdb_xml=str(SAMPLE_RHYTHMDB_XML),
+            stdout=stdout,
+        )
+        self.assertEqual(3, AlbumTrack.objects.count())
+        self.assertIn('3 songs in', stdout.getvalue())
+
+    def test_reimport(self):
+        call_command(
+            'import_rhythmbox',
+            rhythmdb_xml=str(SAMPLE_RHYTHMDB_XML),
+            stdout=StringIO(),
+        )
+        track = AlbumTrack.objects.get(title='Single Track')
+        track.title = 'Renamed'
+        track.disc = 2
+        track.save()
+
+        stdout = StringIO()
+        call_command(
+            'import_rhythmbox',
+            rhythmdb_xml=str(SAMPLE_RHYTHMDB_XML),
+            stdout=stdout,
+        )
+        self.assertIn(
+            '0 tracks created, 1 updated, 2 unchanged',
+            stdout.getvalue(),
+        )
+        track.refresh_from_db()
+        self.assertEqual(('Single Track', 1), (track.title, track.disc))
+        self.assertEqual(2, Album.objects.count())
+        self.assertEqual(3, AlbumTrack.objects.count())
+
+        # Only the import's own bookkeeping is written when the library
+        # hasn't changed
+        with CaptureQueriesContext(connection) as context:
+            call_command(
+                'import_rhythmbox',
+                rhythmdb_xml=str(SAMPLE_RHYTHMDB_XML),
+                stdout=StringIO(),
+            )
+        self.assertEqual(
+            [],
+            [
+                query['sql']
+                for query in context.captured_queries
+                if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+                and 'h5media_librarysource' not in query['sql']
+            ],
+        )
+
+    def test_sync(self):
+        with TemporaryDirectory() as directory:
+            rhythmdb_xml = Path(directory) / 'rhythmdb.xml'
+            content = SAMPLE_RHYTHMDB_XML.read_text()
+            rhythmdb_xml.write_text(content)
+            call_command(
+                'import_rhythmbox',
+                rhythmdb_xml=str(rhythmdb_xml),
+                stdout=StringIO(),
+            )
+
+            stdout = StringIO()
+            call_command(
+                'import_rhythmbox',
+                rhythmdb_xml=str(rhythmdb_xml),
+                sync=True,
+                stdout=stdout,
+            )
+            self.assertIn('unchanged since last sync', stdout.getvalue())
+
+            # Track 2 is removed and Track 1 is renamed, only Track 1 is
+            # newer than the last import
+            start = content.index(
+                '  <entry type="song">\n    <title>Test Track 2',
+            )
+            end = content.index('</entry>', start) + len('</entry>\n')
+            content = content[:start] + content[end:]
+            content = content.replace(
+                '<title>Test Track 1</title>',
+                '<title>Renamed</title>',
+            ).replace(
+                '<mtime>1600000000</mtime>',
+                '<mtime>1700000000</mtime>',
+                1,
+            )
+            rhythmdb_xml.write_text(content)
+
+            stdout = StringIO()
+            call_command(
+                'import_rhythmbox',
+                rhythmdb_xml=str(rhythmdb_xml),
+                sync=True,
+                stdout=stdout,
+            )
+            # Entries from the second of the last import are read again
+            self.assertIn(
+                '0 tracks created, 1 updated, 1 unchanged, 0 skipped, '
+                '1 missing',
+                stdout.getvalue(),
+            )
+
+            # Modified again in the same second as the last import
+            rhythmdb_xml.write_text(
+                content.replace(
+                    '<title>Renamed</title>',
+                    '<title>Again</title>',
+                )
+            )
+            stdout = StringIO()
+            call_command(
+                'import_rhythmbox',
+                rhythmdb_xml=str(rhythmdb_xml),
+                sync=True,
+                stdout=stdout,
+            )
+
+        self.assertIn(
+            '0 tracks created, 1 updated, 0 unchanged, 1 skipped, 0 missing',
+            stdout.getvalue(),
+        )
+        self.assertEqual(
+            [
+                ('Again', False),
+                ('Single Track', False),
+                ('Test Track 2', True),
+            ],
+            [
+                (title, missing_since is not None)
+                for title, missing_since in AlbumTrack.objects.order_by(
+                    'title',
+                ).values_list(
+                    'title',
+                    'missing_since',
+                )
+            ],
+        )
+
+    def test_podcasts(self):
+        # A podcast already loaded from its feed over https
+        podcast = Podcast.objects.create(
+            title='Old title',
+            rss='https://example.com/podcast/feed.rss',
+        )
+        PodcastEpisode.objects.create(
+            podcast=podcast,
+            title='Episode 1',
+            url='http://EXAMPLE.com/podcast/episode1.mp3',
+        )
+
+        stdout = StringIO()
+        call_command(
+            'import_rhythmbox',
+            rhythmdb_xml=str(SAMPLE_RHYTHMDB_XML),
+            podcasts=True,
+            stdout=stdout,
+        )
+        self.assertIn(
+            '1 podcasts, 1 episodes created, 1 updated',
+            stdout.getvalue(),
+        )
+        podcast.refresh_from_db()
+        self.assertEqual('Example Podcast', podcast.title)
+        self.assertEqual(
+            [
+                (
+                    'Episode 1',
+                    datetime(2020, 9, 13, 12, 26, 40, tzinfo=timezone.utc),
+                    '/home/user/Podcasts/Example Podcast/episode1.mp3',
+                ),
+                (
+                    'Episode 2',
+                    datetime(2020, 9, 20, 11, 6, 40, tzinfo=timezone.utc),
+                    '',
+                ),
+            ],
+            list(
+                podcast.episodes.order_by('title').values_list(
+                    'title',
+                    'pub_date',
+                    'file_path',
+                )
+            ),
+        )
+
+        stdout = StringIO()
+        call_command(
+            'import_rhythmbox',
+            rhythmdb_xml=str(SAMPLE_RHYTHMDB_XML),
+            podcasts=True,
+            stdout=stdout,
+        )
+        self.assertIn(
+            '1 podcasts, 0 episodes created, 0 updated',
+            stdout.getvalue(),
+        )
+        self.assertIn('3 unchanged saves skipped', stdout.getvalue())
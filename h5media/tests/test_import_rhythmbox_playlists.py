@@ -0,0 +1,81 @@
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+from h5media.models import PlayList
+from h5media.tests.test_import_rhythmbox import SAMPLE_RHYTHMDB_XML
+from h5media.tests.test_utilities import create_user
+
+
+SAMPLE_PLAYLISTS_XML = Path(settings.BASE_DIR) / 'sample_playlists.xml'
+
+
+class ImportRhythmBoxPlayListsCommandTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        call_command(
+            'import_rhythmbox',
+            rhythmdb_xml=str(SAMPLE_RHYTHMDB_XML),
+            stdout=StringIO(),
+        )
+
+    def import_playlists(self) -> str:
+        stdout = StringIO()
+        call_command(
+            'import_rhythmbox_playlists',
+            playlists_xml=str(SAMPLE_PLAYLISTS_XML),
+            owner=self.user.username,
+            stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def get_playlists(self) -> dict:
+        return {
+            playlist.title: [
+                item.media_file.title
+                for item in playlist.items.order_by('item_number')
+            ]
+            for playlist in PlayList.objects.filter(owner=self.user)
+        }
+
+    def test_import(self):
+        output = self.import_playlists()
+        self.assertIn('2 playlists with 3 items imported', output)
+        expected = {
+            'Favorites': ['Test Track 1', 'Single Track'],
+            'Recent': ['Test Track 2'],
+        }
+        self.assertEqual(expected, self.get_playlists())
+
+        # Importing again replaces the items rather than adding to them
+        self.import_playlists()
+        self.assertEqual(expected, self.get_playlists())
+
+    def test_duplicate_titles(self):
+        for _ in range(2):
+            PlayList.objects.create(owner=self.user, title='Favorites')
+        self.import_playlists()
+
+        favorites = PlayList.objects.filter(
+            owner=self.user,
+            title='Favorites',
+        ).order_by('pk')
+        self.assertEqual(2, favorites.count())
+        self.assertEqual(2, favorites[0].items.count())
+        self.assertFalse(favorites[1].items.exists())
+
+    def test_unknown_owner(self):
+        stderr = StringIO()
+        call_command(
+            'import_rhythmbox_playlists',
+            playlists_xml=str(SAMPLE_PLAYLISTS_XML),
+            owner='nobody',
+            stdout=StringIO(),
+            stderr=stderr,
+        )
+        self.assertIn('User nobody does not exist', stderr.getvalue())
+        self.assertFalse(PlayList.objects.exists())
@@ -1,12 +1,328 @@
 
+from importlib import import_module
+from threading import Thread
+
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from h5media.models import MediaFile, Profile
+from h5media.models import (
+    Album,
+    AlbumTrack,
+    Audiobook,
+    AudiobookChapter,
+    MediaFile,
+    PlayList,
+    PlayListItem,
+    Podcast,
+    PodcastEpisode,
+    Profile,
+    QueueItem,
+    count_skipped_saves,
+)
 from h5media.tests.test_utilities import create_user
 
 
+class UrlKeyTest(TestCase):
+
+    def test_keys_set_on_save(self):
+        podcast = Podcast.objects.create(
+            title='Podcast',
+            rss='HTTP://Example.COM/feed/',
+        )
+        self.assertEqual('https://example.com/feed', podcast.rss_key)
+
+        podcast.rss = 'https://example.com/other'
+        podcast.save(update_fields=['rss'])
+        podcast.refresh_from_db()
+        self.assertEqual('https://example.com/other', podcast.rss_key)
+
+        self.assertIsNone(Podcast.objects.create(title='No rss').rss_key)
+
+    def test_fetch(self):
+        podcast = Podcast.objects.create(
+            title='Podcast',
+            rss='https://example.com/feed',
+        )
+        episode = PodcastEpisode.objects.create(
+            podcast=podcast,
+            url='https://example.com/1.mp3',
+        )
+
+        for rss in (
+                'https://example.com/feed',
+                'http://EXAMPLE.com:80/feed/',
+        ):
+            with self.subTest(rss=rss):
+                self.assertEqual(podcast, Podcast(rss=rss).fetch())
+        self.assertIsNone(Podcast(rss='https://example.com/x').fetch())
+        self.assertIsNone(Podcast(rss='').fetch())
+
+        self.assertEqual(
+            episode.pk,
+            PodcastEpisode(url='http://Example.com/1.mp3').fetch().pk,
+        )
+
+    def test_backfill_logs_duplicate_keys(self):
+        backfill_keys = import_module(
+            'h5media.migrations.0006_backfill_url_keys',
+        ).backfill_keys
+        urls = (
+            'https://example.com/feed',
+            'HTTP://example.com/feed/',
+            'https://example.com/other',
+        )
+        for i, url in enumerate(urls):
+            podcast = Podcast.objects.create(title=f'Podcast {i}')
+            # Rows from before the keys were added
+            Podcast.objects.filter(pk=podcast.pk).update(
+                rss=url,
+                rss_key=None,
+            )
+
+        with self.assertLogs('web', 'WARNING') as logs:
+            backfill_keys(Podcast, 'rss', 'rss_key')
+        self.assertEqual(2, len(logs.records))
+        self.assertIn('HTTP://example.com/feed/', logs.records[0].getMessage())
+        self.assertEqual(
+            [
+                ('https://example.com/feed', 'https://example.com/feed'),
+                ('HTTP://example.com/feed/', None),
+                ('https://example.com/other', 'https://example.com/other'),
+            ],
+            list(Podcast.objects.order_by('pk').values_list('rss', 'rss_key')),
+        )
+
+    def test_bulk_create_unsupported_keywords(self):
+        podcast = Podcast.objects.create(title='Podcast')
+        with self.assertRaises(TypeError):
+            PodcastEpisode.objects.bulk_create(
+                [PodcastEpisode(podcast=podcast, url='https://example.com/1')],
+                ignore_conflicts=True,
+            )
+        self.assertFalse(PodcastEpisode.objects.exists())
+
+    def test_bulk_create_sets_keys(self):
+        podcast = Podcast.objects.create(title='Podcast')
+        PodcastEpisode.objects.bulk_create([
+            PodcastEpisode(podcast=podcast, url='HTTP://example.com/1.mp3'),
+            PodcastEpisode(podcast=podcast, url='https://example.com/2.mp3'),
+        ])
+        self.assertEqual(
+            ['https://example.com/1.mp3', 'https://example.com/2.mp3'],
+            list(
+                PodcastEpisode.objects.order_by('url_key').values_list(
+                    'url_key',
+                    flat=True,
+                )
+            ),
+        )
+
+
+class DirtyFieldTest(TestCase):
+
+    def setUp(self):
+        Podcast.objects.create(
+            title='Podcast',
+            rss='https://example.com/feed',
+            description='About things',
+        )
+        self.podcast = Podcast.objects.get(title='Podcast')
+
+    def test_unchanged_save_skipped(self):
+        with count_skipped_saves() as skipped_saves:
+            with CaptureQueriesContext(connection) as context:
+                self.podcast.save()
+                self.podcast.update(
+                    Podcast(title='Podcast', rss='https://example.com/feed'),
+                )
+                self.podcast.save(update_fields=['title', 'description'])
+                self.podcast.description = 'About other things'
+                self.podcast.save()
+        self.assertEqual(1, len(context.captured_queries))
+        self.assertEqual(3, skipped_saves.count)
+
+    def test_skipped_saves_counted_per_thread(self):
+        with count_skipped_saves() as skipped_saves:
+            with count_skipped_saves() as nested_skipped_saves:
+                self.podcast.save()
+            thread = Thread(target=self.podcast.save)
+            thread.start()
+            thread.join()
+            self.podcast.save()
+        self.assertEqual(1, nested_skipped_saves.count)
+        self.assertEqual(2, skipped_saves.count)
+
+    def test_only_changed_fields_written(self):
+        self.assertEqual(set(), self.podcast.get_changed_fields())
+        self.podcast.description = 'About other things'
+        self.assertEqual({'description'}, self.podcast.get_changed_fields())
+
+        with CaptureQueriesContext(connection) as context:
+            self.podcast.save()
+        self.assertEqual(1, len(context.captured_queries))
+        sql = context.captured_queries[0]['sql']
+        self.assertIn('"description"', sql)
+        self.assertNotIn('"title"', sql)
+
+        # The saved values become the snapshot
+        self.assertEqual(set(), self.podcast.get_changed_fields())
+        self.podcast.refresh_from_db()
+        self.assertEqual('About other things', self.podcast.description)
+
+    def test_unsaved_instance(self):
+        podcast = Podcast(title='New', rss='https://example.com/new')
+        self.assertIn('title', podcast.get_changed_fields())
+        podcast.save()
+        self.assertEqual(set(), podcast.get_changed_fields())
+        self.assertTrue(Podcast.objects.filter(title='New').exists())
+
+    def test_cleared_pk_saves_copy(self):
+        pk = self.podcast.pk
+        self.podcast.pk = None
+        self.podcast.title = 'Copy'
+        self.podcast.rss = 'https://example.com/copy'
+        self.podcast.save()
+        self.assertNotEqual(pk, self.podcast.pk)
+        copy = Podcast.objects.get(pk=self.podcast.pk)
+        self.assertEqual('https://example.com/copy', copy.rss)
+        self.assertEqual('About things', copy.description)
+        self.assertEqual(2, Podcast.objects.count())
+
+    def test_deleted_row_inserted_again(self):
+        Podcast.objects.filter(pk=self.podcast.pk).delete()
+        self.podcast.description = 'About other things'
+        self.podcast.save()
+        podcast = Podcast.objects.get(pk=self.podcast.pk)
+        self.assertEqual('Podcast', podcast.title)
+        self.assertEqual('About other things', podcast.description)
+
+    def test_expression_not_snapshotted(self):
+        self.podcast.rss_status = 0
+        self.podcast.save()
+        for _ in range(2):
+            self.podcast.rss_status = F('rss_status') + 100
+            self.podcast.save()
+        self.assertIn('rss_status', self.podcast.get_changed_fields())
+        self.podcast.refresh_from_db()
+        self.assertEqual(200, self.podcast.rss_status)
+        self.assertEqual(set(), self.podcast.get_changed_fields())
+
+    def test_deferred_fields(self):
+        podcast = Podcast.objects.only('title').get(pk=self.podcast.pk)
+        self.assertEqual(set(), podcast.get_changed_fields())
+        podcast.description = 'Set without loading'
+        podcast.save()
+        self.podcast.refresh_from_db()
+        self.assertEqual('Set without loading', self.podcast.description)
+
+
+class LoadSubclassesTest(TestCase):
+
+    def setUp(self):
+        self.podcast = Podcast.objects.create(
+            title='Podcast',
+            rss='https://example.com/feed',
+        )
+        self.audiobook = Audiobook.objects.create(title='Audiobook')
+        self.album = Album.objects.create(title='Album')
+        self.user = create_user()
+        self.profile = Profile.objects.create(user=self.user)
+        self.playlist = PlayList.objects.create(
+            title='Playlist',
+            owner=self.user,
+        )
 
+    def create_media_files(self, count: int):
+        media_files = []
+        start = MediaFile.objects.count()
+        for i in range(start, start + count):
+            media_files.append(PodcastEpisode.objects.create(
+                podcast=self.podcast,
+                title=f'Episode {i}',
+                url=f'https://example.com/{i}.mp3',
+            ))
+            media_files.append(AudiobookChapter.objects.create(
+                audiobook=self.audiobook,
+                title=f'Chapter {i}',
+                chapter=i,
+            ))
+            track = AlbumTrack(album=self.album, title=f'Track {i}', track=i)
+            track.save()
+            media_files.append(track)
+        return media_files
 
+    def add_items(self, media_files):
+        start = self.playlist.items.count()
+        for i, media_file in enumerate(media_files, start + 1):
+            QueueItem.objects.create(
+                profile=self.profile,
+                order=i,
+                media_file=media_file,
+            )
+            PlayListItem.objects.create(
+                playlist=self.playlist,
+                item_number=i,
+                media_file=media_file,
+            )
 
+    def test_as_subclasses(self):
+        media_files = self.create_media_files(2)
+        with CaptureQueriesContext(connection) as context:
+            loaded = MediaFile.objects.order_by('-pk').as_subclasses()
+            parent_titles = [
+                getattr(media_file, name).title
+                for media_file, name in zip(
+                    loaded,
+                    ('album', 'audiobook', 'podcast') * 2,
+                )
+            ]
+        # One query for the page and one per type
+        self.assertEqual(4, len(context.captured_queries))
+        self.assertEqual(
+            [media_file.pk for media_file in reversed(media_files)],
+            [media_file.pk for media_file in loaded],
+        )
+        self.assertEqual(
+            [AlbumTrack, AudiobookChapter, PodcastEpisode] * 2,
+            [type(media_file) for media_file in loaded],
+        )
+        self.assertEqual(['Album', 'Audiobook', 'Podcast'] * 2, parent_titles)
 
+    def test_unknown_type(self):
+        media_file = MediaFile.objects.create(title='Untyped')
+        self.assertEqual(
+            [media_file],
+            MediaFile.objects.filter(pk=media_file.pk).as_subclasses(),
+        )
+        self.assertEqual([], MediaFile.load_subclasses([]))
 
+    def test_queries_independent_of_length(self):
+        query_counts = []
+        for count in (1, 10):
+            self.add_items(self.create_media_files(count))
+            with CaptureQueriesContext(connection) as context:
+                queue = MediaFile.attach_subclasses(
+                    self.profile.queue.select_related(
+                        'media_file',
+                    ).order_by('order')
+                )
+                items = self.playlist.get_items()
+                for item in queue + items:
+                    str(item.media_file)
+                    if isinstance(item.media_file, PodcastEpisode):
+                        str(item.media_file.podcast)
+                    elif isinstance(item.media_file, AlbumTrack):
+                        str(item.media_file.album)
+            query_counts.append(len(context.captured_queries))
+            self.assertEqual(
+                self.playlist.items.count(),
+                len(items),
+            )
+            self.assertEqual(
+                list(range(1, len(items) + 1)),
+                [item.item_number for item in items],
+            )
+        self.assertEqual(8, query_counts[0])
+        self.assertEqual(query_counts[0], query_counts[1])
@@ -0,0 +1,36 @@
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from h5media.actions.tests.test_audio_probe import build_mp3
+from h5media.models import Album, AlbumTrack
+
+
+class ProbeMediaCommandTest(TestCase):
+
+    def test_probe_media(self):
+        album = Album.objects.create(title='Album')
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'song.mp3'
+            path.write_bytes(build_mp3(100))
+            for title, file_path in (
+                    ('Song', str(path)),
+                    ('Deleted', str(Path(directory) / 'deleted.mp3')),
+            ):
+                AlbumTrack.objects.create(
+                    title=title,
+                    album=album,
+                    file_path=file_path,
+                )
+
+            stdout = StringIO()
+            call_command('probe_media', stdout=stdout)
+
+        self.assertIn('1 updated, 1 could not be read', stdout.getvalue())
+        track = AlbumTrack.objects.get(title='Song')
+        self.assertAlmostEqual(100 * 417 * 8 / 128_000, track.duration)
+        self.assertEqual(128, track.bitrate)
+        self.assertEqual(20 + 100 * 417, track.file_size)
@@ -0,0 +1,199 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from h5media.models import (
+    QUEUE_ORDER_GAP,
+    MediaFile,
+    Profile,
+    QueueItem,
+)
+from h5media.tests.test_utilities import create_user
+
+
+def get_write_queries(context: CaptureQueriesContext):
+    return [
+        query['sql']
+        for query in context.captured_queries
+        if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+    ]
+
+
+class QueueTest(TestCase):
+
+    def setUp(self):
+        self.profile = Profile.objects.create(user=create_user())
+        self.media_files = [
+            MediaFile.objects.create(title=f'File {i}')
+            for i in range(5)
+        ]
+
+    def get_titles(self):
+        return [
+            item.media_file.title
+            for item in self.profile.queue.select_related(
+                'media_file',
+            ).order_by('order')
+        ]
+
+    def fill_queue(self):
+        return [
+            self.profile.queue.insert(media_file)
+            for media_file in self.media_files[:3]
+        ]
+
+    def test_append(self):
+        items = self.fill_queue()
+        self.assertEqual(
+            [0, QUEUE_ORDER_GAP, 2 * QUEUE_ORDER_GAP],
+            [item.order for item in items],
+        )
+        self.assertEqual(['File 0', 'File 1', 'File 2'], self.get_titles())
+
+    def test_operations_write_one_row(self):
+        items = self.fill_queue()
+
+        with CaptureQueriesContext(connection) as context:
+            self.profile.queue.insert(self.media_files[3], before=items[0])
+        self.assertEqual(1, len(get_write_queries(context)))
+
+        with CaptureQueriesContext(connection) as context:
+            self.profile.queue.insert(self.media_files[4], before=items[2])
+        self.assertEqual(1, len(get_write_queries(context)))
+
+        with CaptureQueriesContext(connection) as context:
+            self.profile.queue.move(items[2], before=items[0])
+        self.assertEqual(1, len(get_write_queries(context)))
+
+        with CaptureQueriesContext(connection) as context:
+            self.profile.queue.remove(items[1])
+        self.assertEqual(1, len(get_write_queries(context)))
+
+        self.assertEqual(
+            ['File 3', 'File 2', 'File 0', 'File 4'],
+            self.get_titles(),
+        )
+
+    def test_insert_skips_queued(self):
+        items = self.fill_queue()
+        with CaptureQueriesContext(connection) as context:
+            item = self.profile.queue.insert(
+                self.media_files[2],
+                before=items[0],
+            )
+        self.assertEqual([], get_write_queries(context))
+        self.assertEqual(items[2].pk, item.pk)
+        self.assertEqual(['File 0', 'File 1', 'File 2'], self.get_titles())
+
+    def test_move_to_end(self):
+        items = self.fill_queue()
+        self.profile.queue.move(items[0])
+        self.assertEqual(['File 1', 'File 2', 'File 0'], self.get_titles())
+
+    def test_rebalance_when_crowded(self):
+        items = self.fill_queue()
+        # Keep inserting right before the second item until there's no room
+        # left between it and the first
+        for i in range(25):
+            media_file = MediaFile.objects.create(title=f'Inserted {i}')
+            self.profile.queue.insert(media_file, before=items[1])
+
+        titles = self.get_titles()
+        self.assertEqual(
+            ['File 0']
+            + [f'Inserted {i}' for i in range(25)]
+            + ['File 1', 'File 2'],
+            titles,
+        )
+        orders = list(
+            self.profile.queue.order_by('order').values_list(
+                'order',
+                flat=True,
+            )
+        )
+        self.assertEqual(len(titles), len(set(orders)))
+
+    def test_rebalance(self):
+        items = self.fill_queue()
+        QueueItem.objects.filter(pk=items[0].pk).update(order=-5)
+        QueueItem.objects.filter(pk=items[2].pk).update(order=3)
+        self.profile.queue.rebalance()
+        self.assertEqual(
+            [0, QUEUE_ORDER_GAP, 2 * QUEUE_ORDER_GAP],
+            list(
+                self.profile.queue.order_by('order').values_list(
+                    'order',
+                    flat=True,
+                )
+            ),
+        )
+        self.assertEqual(['File 0', 'File 2', 'File 1'], self.get_titles())
+
+    def test_extend(self):
+        self.profile.queue.insert(self.media_files[1])
+        with CaptureQueriesContext(connection) as context:
+            added_count = self.profile.queue.extend(
+                MediaFile.objects.order_by('-title')
+            )
+        self.assertEqual(4, added_count)
+        self.assertEqual(1, len(get_write_queries(context)))
+        self.assertTrue(
+            get_write_queries(context)[0].startswith('INSERT INTO')
+        )
+        self.assertEqual(
+            ['File 1', 'File 4', 'File 3', 'File 2', 'File 0'],
+            self.get_titles(),
+        )
+        self.assertEqual(
+            [i * QUEUE_ORDER_GAP for i in range(5)],
+            list(
+                self.profile.queue.order_by('order').values_list(
+                    'order',
+                    flat=True,
+                )
+            ),
+        )
+        self.assertEqual(
+            0,
+            self.profile.queue.extend(MediaFile.objects.all()),
+        )
+
+    def test_clear_and_trim(self):
+        self.profile.queue.extend(MediaFile.objects.order_by('pk'))
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(3, self.profile.queue.trim(2))
+        self.assertEqual(1, len(get_write_queries(context)))
+        self.assertEqual(['File 0', 'File 1'], self.get_titles())
+
+        self.assertEqual(0, self.profile.queue.trim(5))
+        self.assertEqual(2, self.profile.queue.clear())
+        self.assertEqual([], self.get_titles())
+
+    def test_requires_profile(self):
+        with self.assertRaises(TypeError):
+            QueueItem.objects.insert(self.media_files[0])
+
+    def test_rebalance_queues_command(self):
+        items = self.fill_queue()
+        crowded = Profile.objects.create(user=create_user())
+        crowded.queue.insert(self.media_files[0])
+        crowded.queue.insert(self.media_files[1])
+        QueueItem.objects.filter(profile=crowded, order=0).update(
+            order=QUEUE_ORDER_GAP - 1,
+        )
+
+        stdout = StringIO()
+        call_command('rebalance_queues', stdout=stdout)
+        self.assertIn('1 of 2 queues rebalanced', stdout.getvalue())
+        self.assertEqual(
+            [0, QUEUE_ORDER_GAP],
+            list(
+                crowded.queue.order_by('order').values_list('order', flat=True)
+            ),
+        )
+        items[1].refresh_from_db()
+        self.assertEqual(QUEUE_ORDER_GAP, items[1].order)
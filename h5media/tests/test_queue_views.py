@@ -0,0 +1,123 @@
+from datetime import datetime, timezone
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from h5media.models import (
+    Album,
+    AlbumTrack,
+    Audiobook,
+    AudiobookChapter,
+    Podcast,
+    PodcastEpisode,
+    Profile,
+)
+from h5media.tests.test_utilities import create_user
+
+
+class QueueViewTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        self.profile = Profile.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def get_queue(self):
+        return list(
+            self.profile.queue.order_by('order').values_list(
+                'media_file__title',
+                flat=True,
+            )
+        )
+
+    def test_podcast(self):
+        podcast = Podcast.objects.create(
+            title='Podcast',
+            rss='https://example.com/feed',
+        )
+        PodcastEpisode.objects.bulk_create(
+            PodcastEpisode(
+                podcast=podcast,
+                title=f'Episode {day}',
+                url=f'https://example.com/{day}.mp3',
+                pub_date=datetime(2024, 1, day, tzinfo=timezone.utc),
+            )
+            for day in (3, 1, 4, 2)
+        )
+        url = reverse('podcast_add_to_queue', args=[podcast.pk])
+
+        response = self.client.post(url, {'since': '2024-01-02'})
+        self.assertContains(response, '2 added, 2 in queue')
+        self.assertEqual(['Episode 3', 'Episode 4'], self.get_queue())
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url)
+        self.assertContains(response, '2 added, 4 in queue')
+        self.assertEqual(
+            ['Episode 3', 'Episode 4', 'Episode 1', 'Episode 2'],
+            self.get_queue(),
+        )
+        inserts = [
+            query['sql']
+            for query in context.captured_queries
+            if query['sql'].startswith('INSERT INTO "h5media_queueitem"')
+        ]
+        self.assertEqual(1, len(inserts))
+
+        response = self.client.post(url, {'since': 'yesterday'})
+        self.assertEqual(400, response.status_code)
+
+        response = self.client.post(
+            reverse('podcast_add_to_queue', args=[podcast.pk + 1]),
+        )
+        self.assertEqual(404, response.status_code)
+
+    def test_album(self):
+        album = Album.objects.create(title='Album')
+        AlbumTrack.objects.bulk_create(
+            AlbumTrack(
+                album=album,
+                title=f'{disc}-{track}',
+                disc=disc,
+                track=track,
+            )
+            for disc, track in ((2, 1), (1, 2), (2, 2), (1, 1))
+        )
+        response = self.client.post(
+            reverse('album_add_to_queue', args=[album.pk]),
+        )
+        self.assertContains(response, '4 added, 4 in queue')
+        self.assertEqual(['1-1', '1-2', '2-1', '2-2'], self.get_queue())
+
+    def test_audiobook_clear_and_trim(self):
+        audiobook = Audiobook.objects.create(title='Audiobook')
+        AudiobookChapter.objects.bulk_create(
+            AudiobookChapter(
+                audiobook=audiobook,
+                title=f'Chapter {chapter}',
+                chapter=chapter,
+            )
+            for chapter in range(1, 6)
+        )
+        response = self.client.post(
+            reverse('audiobook_add_to_queue', args=[audiobook.pk]),
+            {'chapter': '3'},
+        )
+        self.assertContains(response, '3 added, 3 in queue')
+        self.assertEqual(
+            ['Chapter 3', 'Chapter 4', 'Chapter 5'],
+            self.get_queue(),
+        )
+
+        response = self.client.post(reverse('queue_trim'), {'length': '1'})
+        self.assertContains(response, '2 removed, 1 in queue')
+        self.assertEqual(['Chapter 3'], self.get_queue())
+
+        response = self.client.post(reverse('queue_trim'))
+        self.assertEqual(400, response.status_code)
+
+        response = self.client.post(reverse('queue_clear'))
+        self.assertContains(response, '1 removed, 0 in queue')
+        self.assertEqual([], self.get_queue())
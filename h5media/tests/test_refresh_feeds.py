@@ -0,0 +1,64 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from h5media.actions.podcast_actions import DownloadException, FeedResponse
+from h5media.management.commands.refresh_feeds import RefreshFeedsCommand
+from h5media.models import Podcast
+
+
+class RefreshFeedsCommandTest(TestCase):
+
+    def setUp(self):
+        for i, host in enumerate(('a.com', 'a.com', 'a.com', 'b.com')):
+            Podcast.objects.create(
+                title=f'Podcast {i}',
+                rss=f'https://{host}/{i}.rss',
+            )
+
+    def test_interleave_hosts(self):
+        podcasts = RefreshFeedsCommand.interleave_hosts(
+            Podcast.objects.order_by('pk')
+        )
+        self.assertEqual(
+            [
+                'https://a.com/0.rss',
+                'https://b.com/3.rss',
+                'https://a.com/1.rss',
+                'https://a.com/2.rss',
+            ],
+            [podcast.rss for podcast in podcasts],
+        )
+
+    def test_refresh(self):
+
+        def download_rss(rss_url, **kwargs):
+            if rss_url.endswith('0.rss'):
+                raise DownloadException(f'{rss_url} returned status 500')
+            return FeedResponse(url=rss_url, status=304, etag='"abc"')
+
+        stdout = StringIO()
+        with patch(
+                'h5media.management.commands.refresh_feeds.download_rss',
+                side_effect=download_rss,
+        ):
+            call_command(
+                'refresh_feeds',
+                '--host-delay=0',
+                # Fewer pending downloads than podcasts
+                '--concurrency=1',
+                stdout=stdout,
+                stderr=StringIO(),
+            )
+
+        self.assertIn('0 updated, 3 not modified, 0 unchanged (parsing skipped), 1 failed', stdout.getvalue())
+        self.assertEqual(
+            3,
+            Podcast.objects.filter(rss_etag='"abc"', rss_status=304).count(),
+        )
+
+        stdout = StringIO()
+        call_command('refresh_feeds', '--only-stale', '--dry-run', stdout=stdout)
+        self.assertIn('1 podcasts would be refreshed', stdout.getvalue())
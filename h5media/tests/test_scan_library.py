@@ -0,0 +1,173 @@
+from io import StringIO
+from os import utime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from h5media.actions.tests.test_audio_probe import build_mp3
+from h5media.management.commands.scan_library import (
+    get_track_fields,
+    scan_tree,
+)
+from h5media.models import AlbumTrack, AudiobookChapter
+
+
+class GetTrackFieldsTest(SimpleTestCase):
+
+    def test_get_track_fields(self):
+        for path, expected in (
+                (
+                    '/music/Album/01 - Intro.mp3',
+                    ('Album', 1, 1, 'Intro'),
+                ),
+                (
+                    '/music/Album/2-03 Song.flac',
+                    ('Album', 2, 3, 'Song'),
+                ),
+                (
+                    '/music/Album/CD2/04. Song.mp3',
+                    ('Album', 2, 4, 'Song'),
+                ),
+                (
+                    '/music/Album/Song.ogg',
+                    ('Album', 1, 1, 'Song'),
+                ),
+        ):
+            with self.subTest(path=path):
+                fields = get_track_fields(Path(path))
+                self.assertEqual(
+                    expected,
+                    (
+                        fields['album_title'],
+                        fields['disc'],
+                        fields['track'],
+                        fields['title'],
+                    ),
+                )
+
+
+class ScanLibraryCommandTest(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        for path in (
+                'music/Album One/01 - First.mp3',
+                'music/Album One/02 - Second.mp3',
+                'music/Album One/cover.jpg',
+                'books/A Book/Part 2.mp3',
+                'books/A Book/Part 1.mp3',
+        ):
+            path = self.root / path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b'audio')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def scan(self) -> str:
+        stdout = StringIO()
+        call_command(
+            'scan_library',
+            music=[str(self.root / 'music')],
+            audiobooks=[str(self.root / 'books')],
+            stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def test_scan(self):
+        output = self.scan()
+        self.assertIn('2 files', output)
+        self.assertEqual(
+            [('Album One', 1, 'First'), ('Album One', 2, 'Second')],
+            [
+                (track.album.title, track.track, track.title)
+                for track in AlbumTrack.objects.order_by('track')
+            ],
+        )
+        self.assertEqual(
+            [('A Book', 1, 'Part 1'), ('A Book', 2, 'Part 2')],
+            [
+                (chapter.audiobook.title, chapter.chapter, chapter.title)
+                for chapter in AudiobookChapter.objects.order_by('chapter')
+            ],
+        )
+        self.assertTrue(
+            all(
+                track.file_size == 5
+                for track in AlbumTrack.objects.all()
+            )
+        )
+
+    def test_rescan(self):
+        self.scan()
+        self.assertEqual(
+            2,
+            self.scan().count('0 created, 0 updated, 0 missing'),
+        )
+
+        (self.root / 'music/Album One/02 - Second.mp3').unlink()
+        changed_path = self.root / 'music/Album One/01 - First.mp3'
+        changed_path.write_bytes(b'longer audio')
+        utime(changed_path, (1_700_000_000, 1_700_000_000))
+        (self.root / 'books/A Book/Part 3.mp3').write_bytes(b'audio')
+
+        output = self.scan()
+        self.assertIn('0 created, 1 updated, 1 missing', output)
+        self.assertIn('1 created, 0 updated, 0 missing', output)
+        self.assertEqual(
+            12,
+            AlbumTrack.objects.get(title='First').file_size,
+        )
+        self.assertIsNotNone(
+            AlbumTrack.objects.get(title='Second').missing_since,
+        )
+        self.assertEqual(
+            3,
+            AudiobookChapter.objects.get(title='Part 3').chapter,
+        )
+
+    def test_chapters_numbered_by_file_name(self):
+        for name in ('Part 3', 'Part 4'):
+            (self.root / f'books/A Book/{name}.mp3').write_bytes(b'audio')
+
+        def scan_tree_reversed(root, threads):
+            return reversed(sorted(scan_tree(root, threads)))
+
+        # The book's files are found out of order and written one at a time
+        with patch(
+                'h5media.management.commands.scan_library.scan_tree',
+                side_effect=scan_tree_reversed,
+        ), patch(
+                'h5media.management.commands.scan_library.BATCH_SIZE',
+                1,
+        ):
+            self.scan()
+
+        self.assertEqual(
+            [(1, 'Part 1'), (2, 'Part 2'), (3, 'Part 3'), (4, 'Part 4')],
+            list(
+                AudiobookChapter.objects.order_by('chapter').values_list(
+                    'chapter',
+                    'title',
+                )
+            ),
+        )
+
+    def test_probe(self):
+        (self.root / 'music/Album One/03 - Third.mp3').write_bytes(
+            build_mp3(100),
+        )
+        self.scan()
+        self.assertEqual(
+            [(None, None), (None, None), (2.60625, 128)],
+            list(
+                AlbumTrack.objects.order_by('track').values_list(
+                    'duration',
+                    'bitrate',
+                )
+            ),
+        )
@@ -0,0 +1,35 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+DEFAULT_PORTS = {
+    'http': 80,
+    'https': 443,
+}
+
+
+def normalize_url(url: str) -> str:
+    """Returns a key for comparing urls.  Urls that differ only in the case
+    of the host, http vs https, a default port, a trailing slash, the order
+    of the query parameters or a fragment have the same key.  The key is
+    only for lookups, it isn't meant to be requested."""
+    url = (url or '').strip()
+    if not url:
+        return ''
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+
+    if scheme in DEFAULT_PORTS:
+        scheme = 'https'
+
+    path = parts.path.rstrip('/')
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
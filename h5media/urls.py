@@ -22,16 +22,23 @@ from django.contrib.auth.views import (
 from django.urls import include, path
 
 from h5media.views import (
+    AlbumAddToQueueView,
+    AudiobookAddToQueueView,
     DevelopmentView,
     HomeView,
+    InboxApiView,
+    InboxView,
     LoginView,
     MenuView,
+    PodcastAddToQueueView,
     PodcastEpisodeAddToQueueView,
     PodcastEpisodeListView,
     PodcastSearchView,
     PodcastToggleSubscription,
     PodcastsView,
     PodcastView,
+    QueueClearView,
+    QueueTrimView,
 )
 
 urlpatterns = [
@@ -61,6 +68,16 @@ urlpatterns = [
         PodcastsView.as_view(),
         name='podcasts',
     ),
+    path(
+        'podcasts/inbox/',
+        InboxView.as_view(),
+        name='inbox',
+    ),
+    path(
+        'api/podcasts/inbox/',
+        InboxApiView.as_view(),
+        name='inbox_api',
+    ),
     path(
         'podcasts/<int:pk>/',
         PodcastView.as_view(),
@@ -84,6 +101,31 @@ urlpatterns = [
         PodcastEpisodeAddToQueueView.as_view(),
         name='podcast_episode_add_to_queue',
     ),
+    path(
+        'podcasts/<int:pk>/queue-add/',
+        PodcastAddToQueueView.as_view(),
+        name='podcast_add_to_queue',
+    ),
+    path(
+        'albums/<int:pk>/queue-add/',
+        AlbumAddToQueueView.as_view(),
+        name='album_add_to_queue',
+    ),
+    path(
+        'audiobooks/<int:pk>/queue-add/',
+        AudiobookAddToQueueView.as_view(),
+        name='audiobook_add_to_queue',
+    ),
+    path(
+        'queue/clear/',
+        QueueClearView.as_view(),
+        name='queue_clear',
+    ),
+    path(
+        'queue/trim/',
+        QueueTrimView.as_view(),
+        name='queue_trim',
+    ),
     path(
         'podcasts/toggle_subscription/',
         PodcastToggleSubscription.as_view(),
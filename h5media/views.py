@@ -11,7 +11,7 @@ from django.core.paginator import Paginator
 from django.core.serializers import serialize
 from django.db.models import BooleanField, Count, Q
 from django.db.models.functions import Cast
-from django.http import HttpRequest
+from django.http import HttpRequest, JsonResponse
 from django.shortcuts import render
 from django.views import View
 from django.views.generic import TemplateView
@@ -19,16 +19,27 @@ from django.views.generic.detail import DetailView
 
 from django.contrib.auth.views import LoginView as DjangoLoginView
 from django.urls import reverse, reverse_lazy
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware
 
+from h5media.actions.inbox import InboxCursor, InboxPage, get_inbox_page
 from h5media.actions.podcast_actions import AddEpisodeToQueueAction
+from h5media.actions.queue_actions import (
+    AddAlbumToQueueAction,
+    AddAudiobookToQueueAction,
+    AddPodcastEpisodesToQueueAction,
+)
+from h5media.actions.search import search_episodes, search_podcasts
 from h5media.forms import BulmaAuthenticationForm
 from h5media.models import (
+    Album,
+    Audiobook,
     MediaFile,
     Podcast,
     PodcastEpisode,
     Profile,
 )
-from h5media.serializers import PodcastEpisodeSerializer
+from h5media.serializers import InboxEpisodeSerializer
 
 
 logger = getLogger('web')
@@ -58,7 +69,7 @@ class ApiError(RuntimeError):
 def error_response(request: HttpRequest, api_error: ApiError):
     return render(
         request,
-        'error.html',
+        'partial/error.html',
         {'api_error': api_error},
         status=api_error.status,
     )
@@ -132,7 +143,9 @@ class HomeView(PageView):
 
         profile = self.get_profile(self.request)
         if profile:
-            queue = profile.queue.order_by('order') or []
+            queue = MediaFile.attach_subclasses(
+                profile.queue.select_related('media_file').order_by('order')
+            )
         else:
             queue = []
 
@@ -171,27 +184,113 @@ class PodcastSearchView(PageView):
             user: User,
     ):
         if search:
-            podcasts = Podcast.objects.annotate(
-                subscribed=Cast(
-                    Count(
-                        'subscribers',
-                        filter=Q(subscribers=user.id)
-                    ),
-                    output_field=BooleanField(),
-                )
-            ).filter(
-                title__icontains=search,
-            ).order_by('title')
+            podcasts = search_podcasts(
+                search,
+                queryset=Podcast.objects.annotate(
+                    subscribed=Cast(
+                        Count(
+                            'subscribers',
+                            filter=Q(subscribers=user.id)
+                        ),
+                        output_field=BooleanField(),
+                    )
+                ),
+            )
+            episodes = search_episodes(search)
         else:
-            podcasts = Podcast.objects.none()
+            podcasts = []
+            episodes = []
 
         context.update(
             search=search,
-            podcasts=list(podcasts),
+            podcasts=podcasts,
+            episodes=episodes,
         )
         return context
 
 
+class InboxMixin:
+    """Reads the page of the subscriptions inbox requested by the before and
+    before_pk parameters"""
+
+    page_size = 25
+
+    def get_inbox_page(self) -> InboxPage:
+        return get_inbox_page(
+            self.request.user,
+            self.page_size,
+            self.get_before(
+                self.request.GET.get('before') or '',
+                self.request.GET.get('before_pk') or '',
+            ),
+        )
+
+    @staticmethod
+    def get_before(before: str, before_pk: str) -> Optional[InboxCursor]:
+        if not before:
+            return None
+        try:
+            pub_date = parse_datetime(before)
+            pk = int(before_pk)
+        except ValueError:
+            pub_date = None
+        if pub_date is None:
+            raise ApiError(
+                f"before {before} {before_pk} is not an inbox position",
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        if is_naive(pub_date):
+            pub_date = make_aware(pub_date)
+        return pub_date, pk
+
+
+class InboxView(InboxMixin, PageView):
+    """The newest episodes of the podcasts the user subscribes to"""
+
+    template_name = 'inbox.html'
+    page_title_suffix = 'Inbox'
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return super().get(request, *args, **kwargs)
+        except ApiError as error:
+            return error_response(request, error)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        inbox_page = self.get_inbox_page()
+        context.update(
+            episodes=inbox_page.episodes,
+            next_cursor=inbox_page.next_cursor,
+        )
+        return context
+
+
+class InboxApiView(InboxMixin, LoginRequiredMixin, View):
+    """JSON version of InboxView"""
+
+    def get(self, request, *args, **kwargs):
+        try:
+            inbox_page = self.get_inbox_page()
+        except ApiError as error:
+            return JsonResponse(
+                {'errors': error.messages},
+                status=error.status,
+            )
+
+        next_cursor = None
+        if inbox_page.next_cursor:
+            pub_date, pk = inbox_page.next_cursor
+            next_cursor = {'before': pub_date.isoformat(), 'before_pk': pk}
+        return JsonResponse({
+            'episodes': InboxEpisodeSerializer(
+                inbox_page.episodes,
+                many=True,
+            ).data,
+            'next': next_cursor,
+        })
+
+
 class PodcastView(BaseDetailView):
     """Displays Podcast title, url, description along with a list of
     episodes"""
@@ -233,27 +332,10 @@ class PodcastEpisodeListView(BaseView):
     @staticmethod
     def get_in_queue_pks(profile: Optional[Profile]) -> Set[int]:
         """Returns a set of the primary keys for MediaFiles that are in
-        Profile.now_playing or in Profile.queue"""
+        Profile.queue"""
         if not profile:
             return set()
-
-        pks = set()
-
-        now_playing: dict = profile.now_playing
-        if now_playing:
-            pk = now_playing.get('pk') or 0
-            if pk:
-                pks.add(pk)
-
-        queue: List[dict] = profile.queue
-        if not queue:
-            return pks
-
-        for item in queue:
-            pk = item.get('pk') or 0
-            if pk:
-                pks.add(pk)
-        return pks
+        return set(profile.queue.values_list('media_file_id', flat=True))
 
 
 class PodcastEpisodeAddToQueueView(BasePostView):
@@ -284,6 +366,142 @@ class PodcastEpisodeAddToQueueView(BasePostView):
         AddEpisodeToQueueAction().run(episode, profile)
         return {}
 
+
+class BaseQueueView(BasePostView):
+    """Abstract class for views that change the user's queue in bulk.
+    Returns html with the number of items changed."""
+
+    template_name = 'partial/queue_count.html'
+
+    # Describes the change in the response, e.g. "3 added"
+    verb = ''
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        profile = self.get_profile(self.request)
+        if not profile:
+            raise ApiError(
+                f"User {self.request.user.username} missing profile",
+            )
+
+        context.update({
+            'changed_count': self.change_queue(profile, **kwargs),
+            'verb': self.verb,
+            'queue_length': profile.queue.count(),
+        })
+        return context
+
+    def change_queue(self, profile: Profile, **kwargs) -> int:
+        """Subclasses override this to change the queue.  Returns the
+        number of items added or removed."""
+        raise NotImplementedError
+
+    @staticmethod
+    def get_object(model, pk: int):
+        try:
+            return model.objects.get(pk=pk)
+        except ObjectDoesNotExist:
+            raise ApiError(
+                f"{model.__name__} (PK={pk}) not found",
+                status=HTTPStatus.NOT_FOUND,
+            )
+
+    def get_int(self, name: str, default: int) -> int:
+        value = self.request.POST.get(name) or ''
+        if not value:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ApiError(
+                f"{name} must be a whole number",
+                status=HTTPStatus.BAD_REQUEST,
+            )
+
+
+class PodcastAddToQueueView(BaseQueueView):
+    """Adds the episodes of a podcast to the queue, oldest first.  The
+    optional since field (a date or date and time) limits the episodes to
+    those published after it."""
+
+    verb = 'added'
+
+    def change_queue(self, profile: Profile, **kwargs) -> int:
+        podcast = self.get_object(Podcast, kwargs.get('pk') or 0)
+        return AddPodcastEpisodesToQueueAction().run(
+            podcast,
+            profile,
+            self.get_since(self.request.POST.get('since') or ''),
+        )
+
+    @staticmethod
+    def get_since(value: str) -> Optional[datetime]:
+        if not value:
+            return None
+        try:
+            since = parse_datetime(value)
+            if since is None:
+                since_date = parse_date(value)
+                if since_date is not None:
+                    since = datetime.combine(since_date, datetime.min.time())
+        except ValueError:
+            since = None
+        if since is None:
+            raise ApiError(
+                f"since {value} is not a date",
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        return make_aware(since) if is_naive(since) else since
+
+
+class AlbumAddToQueueView(BaseQueueView):
+    """Adds the tracks of an album to the queue in disc and track order"""
+
+    verb = 'added'
+
+    def change_queue(self, profile: Profile, **kwargs) -> int:
+        album = self.get_object(Album, kwargs.get('pk') or 0)
+        return AddAlbumToQueueAction().run(album, profile)
+
+
+class AudiobookAddToQueueView(BaseQueueView):
+    """Adds the chapters of an audiobook to the queue starting at the
+    optional chapter field"""
+
+    verb = 'added'
+
+    def change_queue(self, profile: Profile, **kwargs) -> int:
+        audiobook = self.get_object(Audiobook, kwargs.get('pk') or 0)
+        return AddAudiobookToQueueAction().run(
+            audiobook,
+            profile,
+            self.get_int('chapter', 0),
+        )
+
+
+class QueueClearView(BaseQueueView):
+
+    verb = 'removed'
+
+    def change_queue(self, profile: Profile, **kwargs) -> int:
+        return profile.queue.clear()
+
+
+class QueueTrimView(BaseQueueView):
+    """Removes the items after the first length items of the queue"""
+
+    verb = 'removed'
+
+    def change_queue(self, profile: Profile, **kwargs) -> int:
+        length = self.get_int('length', -1)
+        if length < 0:
+            raise ApiError(
+                'missing length',
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        return profile.queue.trim(length)
+
 #
 # class PodcastSearchView(PageView):
 #
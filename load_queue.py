@@ -8,24 +8,14 @@ if True:
 
 def main():
     profile = Profile.objects.get(user__username='john')
-    profile.queue = [
-        {
-            'pk': -1,
-            'title': 'Beautiful World',
-            'type': MediaFile.TYPE_ALBUM_TRACK,
-        },
-        {
-            'pk': -2,
-            'title': 'Django',
-            'type': MediaFile.TYPE_PODCAST_EPISODE,
-        },
-        {
-            'pk': -3,
-            'title': 'Chapter1',
-            'type': MediaFile.TYPE_AUDIOBOOK_CHAPTER,
-        }
-    ]
-    profile.save()
+    for type_ in (
+        MediaFile.TYPE_ALBUM_TRACK,
+        MediaFile.TYPE_PODCAST_EPISODE,
+        MediaFile.TYPE_AUDIOBOOK_CHAPTER,
+    ):
+        media_file = MediaFile.objects.filter(type=type_).first()
+        if media_file:
+            profile.queue.insert(media_file)
 
 
 
@@ -10,7 +10,15 @@ if True:
 
 def main():
     profile = Profile.objects.get(user__username='john')
-    formatted_json = dumps(profile.queue, indent=2)
+    queue = list(
+        profile.queue.order_by('order').values(
+            'order',
+            'media_file_id',
+            'media_file__title',
+            'media_file__type',
+        )
+    )
+    formatted_json = dumps(queue, indent=2)
     print(formatted_json)
 
 
@@ -3,13 +3,14 @@ from django_init import django_init
 django_init()
 
 if True:
+    from datetime import timedelta
     from logging import getLogger
     from pathlib import Path
     from typing import Iterator, Tuple
-    from urllib.parse import urlparse
 
     from django.contrib.auth.models import User
 
+    from h5media.actions.feed_cache import FeedCache
     from h5media.actions.podcast_actions import (
         DownloadException,
         download_rss,
@@ -34,26 +35,19 @@ rss_file_urls = (
 
 
 def get_url_and_rss_bytes() -> Iterator[Tuple[str, bytes]]:
+    # Reuse downloaded files for a year so runs don't hit the servers
+    cache = FeedCache(
+        Path('./rss_cache'),
+        max_bytes=200 * 2**20,
+        max_age=timedelta(days=365),
+    )
     for url in rss_file_urls:
-        url_parts = urlparse(url)
-
-        cached_rss_path = Path('./rss_cache') / f"{url_parts.hostname}.rss"
-        if not cached_rss_path.exists():
-            try:
-                rss_bytes = download_rss(url)
-            except DownloadException as error:
-                logger.error(str(error))
-                continue
-            else:
-                with open(cached_rss_path, 'wb') as out_file:
-                    out_file.write(rss_bytes)
-
-        if not cached_rss_path.exists():
-            logger.error(f"cached file not present for {url}")
+        try:
+            response = download_rss(url, cache=cache)
+        except DownloadException as error:
+            logger.error(str(error))
             continue
-
-        with open(cached_rss_path, 'rb') as in_file:
-            yield url, in_file.read()
+        yield url, response.content
 
 
 def main():